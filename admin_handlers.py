@@ -13,6 +13,9 @@ from aiogram.exceptions import TelegramBadRequest
 
 import database as db
 from config import Config
+from ai_usage import usage_tracker, today as ai_today
+from group_yield import yield_tracker, MODES, MODE_NORMAL, MODE_KEYWORD_ONLY, MODE_THROTTLED
+from utils import extract_order_fields
 
 logger = logging.getLogger("taxi_bot.admin")
 
@@ -61,6 +64,10 @@ class ListGroupsState(StatesGroup):
     page = State()
 
 
+class SearchOrdersState(StatesGroup):
+    waiting_for_query = State()
+
+
 # ============== KEYBOARDS ==============
 
 def main_menu_keyboard() -> InlineKeyboardMarkup:
@@ -85,6 +92,7 @@ def groups_menu_keyboard() -> InlineKeyboardMarkup:
     buttons = [
         [InlineKeyboardButton(text="➕ Guruh qo'shish", callback_data="add_group")],
         [InlineKeyboardButton(text="📝 Guruhlar ro'yxati", callback_data="list_groups")],
+        [InlineKeyboardButton(text="📈 Samaradorlik reytingi", callback_data="yield_rank:0")],
         [InlineKeyboardButton(text="🔙 Orqaga", callback_data="main_menu")],
     ]
     return InlineKeyboardMarkup(inline_keyboard=buttons)
@@ -117,7 +125,7 @@ def cancel_keyboard() -> InlineKeyboardMarkup:
 # ============== MIDDLEWARE ==============
 
 def is_admin(user_id: int) -> bool:
-    """Admin tekshirish"""
+    """Admin tekshirish (xotiradagi keshdan, DB ga ulanmasdan)"""
     # Super admin
     if user_id in Config.SUPER_ADMIN_IDS:
         return True
@@ -132,8 +140,8 @@ async def cmd_start(message: Message):
     """Start buyrug'i"""
     user_id = message.from_user.id
     
-    # Super adminni DB ga qo'shish
-    if user_id in Config.SUPER_ADMIN_IDS:
+    # Super adminni DB ga qo'shish (faqat hali qo'shilmagan bo'lsa)
+    if user_id in Config.SUPER_ADMIN_IDS and not db.is_super_admin(user_id):
         db.add_admin(
             user_id=user_id,
             username=message.from_user.username,
@@ -203,14 +211,13 @@ async def groups_menu(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
-    groups = db.get_source_groups()
-    active = len([g for g in groups if g['is_active']])
+    counts = db.count_source_groups()
     
     await safe_edit_text(
         callback.message,
         f"📋 **Guruhlar boshqaruvi**\n\n"
-        f"Jami guruhlar: {len(groups)}\n"
-        f"Faol: {active}",
+        f"Jami guruhlar: {counts['total']}\n"
+        f"Faol: {counts['active']}",
         reply_markup=groups_menu_keyboard(),
         parse_mode="Markdown"
     )
@@ -277,12 +284,13 @@ async def add_group_finish(message: Message, state: FSMContext):
         )
 
 
+GROUPS_PER_PAGE = 10
+
+
 @router.callback_query(F.data == "list_groups")
 async def list_groups(callback: CallbackQuery, state: FSMContext):
     """Guruhlar ro'yxati (pagination bilan)"""
-    groups = db.get_source_groups()
-    
-    if not groups:
+    if not db.count_source_groups()['total']:
         await safe_edit_text(
             callback.message,
             "📋 Guruhlar ro'yxati bo'sh",
@@ -291,29 +299,43 @@ async def list_groups(callback: CallbackQuery, state: FSMContext):
         return
     
     # Birinchi sahifa
-    page = 0
-    await show_groups_page(callback, groups, page, state)
+    await show_groups_page(callback, state, page=0)
 
 
-async def show_groups_page(callback: CallbackQuery, groups: list, page: int, state: FSMContext):
-    """Guruhlarni sahifa bo'yicha ko'rsatish"""
+async def show_groups_page(callback: CallbackQuery, state: FSMContext, page: int,
+                           after: tuple = None, before: tuple = None, inclusive: bool = False):
+    """Guruhlarni sahifa bo'yicha ko'rsatish (keyset pagination)"""
     
-    items_per_page = 10
-    total_pages = (len(groups) + items_per_page - 1) // items_per_page
+    page_groups = db.get_source_groups_page(
+        after=after, before=before, inclusive=inclusive, limit=GROUPS_PER_PAGE
+    )
     
-    # Sahifa chegarasini tekshirish
-    if page < 0:
+    # Sahifa bo'shab qolgan bo'lsa (oxirgi guruh o'chirildi) - oldingi sahifaga qaytish
+    if not page_groups and after is not None:
+        page_groups = db.get_source_groups_page(before=after, limit=GROUPS_PER_PAGE)
+        page = max(page - 1, 0)
+    if not page_groups:
+        page_groups = db.get_source_groups_page(limit=GROUPS_PER_PAGE)
         page = 0
-    if page >= total_pages:
-        page = total_pages - 1
     
-    # Sahifadagi guruhlar
-    start_idx = page * items_per_page
-    end_idx = start_idx + items_per_page
-    page_groups = groups[start_idx:end_idx]
+    if not page_groups:
+        await state.update_data(groups_page=0, groups_cursor=None)
+        await safe_edit_text(
+            callback.message,
+            "📋 Guruhlar ro'yxati bo'sh",
+            reply_markup=back_keyboard("groups_menu")
+        )
+        return
+    
+    total = db.count_source_groups()['total']
+    total_pages = max((total + GROUPS_PER_PAGE - 1) // GROUPS_PER_PAGE, 1)
+    page = min(page, total_pages - 1)
+    
+    first = (page_groups[0]['is_active'], page_groups[0]['id'])
+    last = (page_groups[-1]['is_active'], page_groups[-1]['id'])
     
     # Matn
-    text = f"📋 **Guruhlar ro'yxati** ({len(groups)} ta)\n\n"
+    text = f"📋 **Guruhlar ro'yxati** ({total} ta)\n\n"
     text += f"Sahifa: {page + 1}/{total_pages}\n\n"
     
     buttons = []
@@ -335,21 +357,27 @@ async def show_groups_page(callback: CallbackQuery, groups: list, page: int, sta
     # Pagination tugmalari
     nav_buttons = []
     
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"groups_page:{page - 1}"))
+    if db.has_source_groups_before(first):
+        nav_buttons.append(InlineKeyboardButton(
+            text="⬅️ Oldingi",
+            callback_data=f"groups_page:prev:{max(page - 1, 0)}:{first[0]}:{first[1]}"
+        ))
     
     nav_buttons.append(InlineKeyboardButton(text=f"📄 {page + 1}/{total_pages}", callback_data="noop"))
     
-    if page < total_pages - 1:
-        nav_buttons.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"groups_page:{page + 1}"))
+    if db.has_source_groups_after(last):
+        nav_buttons.append(InlineKeyboardButton(
+            text="Keyingi ➡️",
+            callback_data=f"groups_page:next:{page + 1}:{last[0]}:{last[1]}"
+        ))
     
     if nav_buttons:
         buttons.append(nav_buttons)
     
     buttons.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="groups_menu")])
     
-    # State'ga sahifani saqlash
-    await state.update_data(groups_page=page, groups_list=groups)
+    # State'ga faqat sahifa kursorini saqlash
+    await state.update_data(groups_page=page, groups_cursor=list(first))
     
     await safe_edit_text(
         callback.message,
@@ -359,12 +387,26 @@ async def show_groups_page(callback: CallbackQuery, groups: list, page: int, sta
     )
 
 
+async def refresh_groups_page(callback: CallbackQuery, state: FSMContext):
+    """Joriy sahifani qayta ko'rsatish (state'dagi kursor bo'yicha)"""
+    data = await state.get_data()
+    page = data.get('groups_page', 0)
+    cursor = data.get('groups_cursor')
+    if cursor:
+        await show_groups_page(callback, state, page, after=tuple(cursor), inclusive=True)
+    else:
+        await show_groups_page(callback, state, page=0)
+
+
 @router.callback_query(F.data.startswith("groups_page:"))
 async def groups_page_handler(callback: CallbackQuery, state: FSMContext):
     """Guruhlar sahifasini o'zgartirish"""
-    page = int(callback.data.split(":")[1])
-    groups = db.get_source_groups()
-    await show_groups_page(callback, groups, page, state)
+    _, direction, page, is_active, row_id = callback.data.split(":")
+    cursor = (int(is_active), int(row_id))
+    if direction == "prev":
+        await show_groups_page(callback, state, int(page), before=cursor)
+    else:
+        await show_groups_page(callback, state, int(page), after=cursor)
 
 
 @router.callback_query(F.data.startswith("toggle_group:"))
@@ -375,10 +417,7 @@ async def toggle_group(callback: CallbackQuery, state: FSMContext):
     await callback.answer("✅ O'zgartirildi")
     
     # Sahifani qayta ko'rsatish
-    groups = db.get_source_groups()
-    data = await state.get_data()
-    page = data.get('groups_page', 0)
-    await show_groups_page(callback, groups, page, state)
+    await refresh_groups_page(callback, state)
 
 
 @router.callback_query(F.data.startswith("delete_group:"))
@@ -389,10 +428,127 @@ async def delete_group(callback: CallbackQuery, state: FSMContext):
     await callback.answer("🗑 O'chirildi")
     
     # Sahifani qayta ko'rsatish
-    groups = db.get_source_groups()
-    data = await state.get_data()
-    page = data.get('groups_page', 0)
-    await show_groups_page(callback, groups, page, state)
+    await refresh_groups_page(callback, state)
+
+
+# ============== GROUP YIELD HANDLERS ==============
+
+YIELD_PER_PAGE = 10
+
+MODE_LABELS = {
+    MODE_NORMAL: "🟢",
+    MODE_KEYWORD_ONLY: "🔑",
+    MODE_THROTTLED: "🐢",
+}
+
+
+@router.callback_query(F.data.startswith("yield_rank:"))
+async def yield_rank(callback: CallbackQuery):
+    """Guruhlar samaradorligi reytingi"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    page = max(int(callback.data.split(":")[1]), 0)
+    
+    # Xotiradagi hisoblagichlarni yozib, reytingni yangilash
+    yield_tracker.flush()
+    
+    total = db.count_group_yield()
+    total_pages = max((total + YIELD_PER_PAGE - 1) // YIELD_PER_PAGE, 1)
+    page = min(page, total_pages - 1)
+    rows = db.get_group_yield_ranking(limit=YIELD_PER_PAGE, offset=page * YIELD_PER_PAGE)
+    
+    if not rows:
+        await safe_edit_text(
+            callback.message,
+            "📈 **Samaradorlik reytingi**\n\nHali ma'lumot yo'q",
+            reply_markup=back_keyboard("groups_menu"),
+            parse_mode="Markdown"
+        )
+        return
+    
+    text = (
+        f"📈 **Samaradorlik reytingi** ({total} ta)\n"
+        f"_ko'rilgan / AI / yuborilgan — ulush_\n"
+        f"🟢 oddiy  🔑 faqat kalit so'z  🐢 cheklangan  ✋ qo'lda\n\n"
+    )
+    buttons = []
+    
+    for i, row in enumerate(rows, start=page * YIELD_PER_PAGE + 1):
+        mode = row['mode'] or MODE_NORMAL
+        label = MODE_LABELS.get(mode, "🟢") + ("✋" if row['mode_manual'] else "")
+        title = row['title'] or str(row['group_id'])
+        text += (
+            f"{i}. {label} {title[:30]}\n"
+            f"    {row['seen']} / {row['ai_calls']} / {row['forwarded']} — {row['yield'] * 100:.1f}%\n"
+        )
+        buttons.append([
+            InlineKeyboardButton(
+                text=f"🔁 {i}. rejim",
+                callback_data=f"yield_mode:{row['group_id']}:{page}"
+            ),
+            InlineKeyboardButton(
+                text="♻️ Avto",
+                callback_data=f"yield_reset:{row['group_id']}:{page}"
+            )
+        ])
+    
+    # Pagination tugmalari
+    nav_buttons = []
+    if page > 0:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Oldingi", callback_data=f"yield_rank:{page - 1}"))
+    nav_buttons.append(InlineKeyboardButton(text=f"📄 {page + 1}/{total_pages}", callback_data="noop"))
+    if page < total_pages - 1:
+        nav_buttons.append(InlineKeyboardButton(text="Keyingi ➡️", callback_data=f"yield_rank:{page + 1}"))
+    buttons.append(nav_buttons)
+    
+    buttons.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="groups_menu")])
+    
+    await safe_edit_text(
+        callback.message,
+        text,
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
+        parse_mode="Markdown"
+    )
+
+
+@router.callback_query(F.data.startswith("yield_mode:"))
+async def yield_mode(callback: CallbackQuery):
+    """Guruh rejimini qo'lda almashtirish (oddiy → kalit so'z → cheklangan)"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    _, group_id, page = callback.data.split(":")
+    group_id = int(group_id)
+    
+    current = yield_tracker.mode(group_id)
+    new_mode = MODES[(MODES.index(current) + 1) % len(MODES)] if current in MODES else MODE_NORMAL
+    
+    db.set_group_mode(group_id, new_mode, manual=True)
+    yield_tracker.invalidate()
+    await callback.answer(f"✅ Rejim: {new_mode}")
+    
+    callback.data = f"yield_rank:{page}"
+    await yield_rank(callback)
+
+
+@router.callback_query(F.data.startswith("yield_reset:"))
+async def yield_reset(callback: CallbackQuery):
+    """Guruh hisoblagichlarini tozalash va avtomatik rejimga qaytarish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    _, group_id, page = callback.data.split(":")
+    
+    db.reset_group_yield(int(group_id))
+    yield_tracker.invalidate()
+    await callback.answer("♻️ Avtomatik rejimga qaytarildi")
+    
+    callback.data = f"yield_rank:{page}"
+    await yield_rank(callback)
 
 
 # ============== TARGET GROUP HANDLERS ==============
@@ -404,22 +560,26 @@ async def target_menu(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
-    target_groups = db.get_target_groups()
+    target_groups = db.get_target_groups_info()
     
     text = f"📤 **Buyurtmalar guruhlari**\n\n"
     if target_groups:
         text += f"Jami: {len(target_groups)}\n\n"
         for tg in target_groups:
-            text += f"`{tg}`\n"
+            limit = f"{tg['rate_limit']}/daq" if tg['rate_limit'] else "cheksiz"
+            text += f"`{tg['group_id']}` {tg['title'] or ''}\n└ ⭐ {tg['priority']} | ⏱ {limit}\n"
     else:
         text += "⚠️ Hali sozlanmagan"
     
     buttons = []
     
-    # Guruhlar ro'yxati va o'chirish
+    # Guruhlar: ustuvorlik, limit va o'chirish
     for tg in target_groups:
+        gid = tg['group_id']
         buttons.append([
-            InlineKeyboardButton(text=f"🗑 {tg} ni o'chirish", callback_data=f"del_target:{tg}")
+            InlineKeyboardButton(text=f"⭐ {tg['priority']}", callback_data=f"target_prio:{gid}"),
+            InlineKeyboardButton(text=f"⏱ {tg['rate_limit'] or '∞'}", callback_data=f"target_rate:{gid}"),
+            InlineKeyboardButton(text=f"🗑 {gid}", callback_data=f"del_target:{gid}"),
         ])
     
     buttons.append([InlineKeyboardButton(text="➕ Guruh qo'shish", callback_data="add_target")])
@@ -433,6 +593,38 @@ async def target_menu(callback: CallbackQuery):
     )
 
 
+# Tugma bosilganda navbatdagi qiymatga o'tadi
+TARGET_PRIORITIES = [0, 1, 2, 3]
+TARGET_RATE_LIMITS = [0, 5, 10, 20, 30]
+
+
+def _next_value(values: list, current: int) -> int:
+    return values[(values.index(current) + 1) % len(values)] if current in values else values[0]
+
+
+@router.callback_query(F.data.startswith("target_prio:") | F.data.startswith("target_rate:"))
+async def update_target(callback: CallbackQuery):
+    """Target guruh ustuvorligi / daqiqalik limitini o'zgartirish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    action, group_id = callback.data.split(":")
+    group_id = int(group_id)
+    current = next((t for t in db.get_target_groups_info() if t['group_id'] == group_id), None)
+    if not current:
+        await callback.answer("❌ Guruh topilmadi", show_alert=True)
+        return
+    
+    if action == "target_prio":
+        db.update_target_group(group_id, priority=_next_value(TARGET_PRIORITIES, current['priority']))
+    else:
+        db.update_target_group(group_id, rate_limit=_next_value(TARGET_RATE_LIMITS, current['rate_limit']))
+    
+    await callback.answer("✅ Saqlandi")
+    await target_menu(callback)
+
+
 @router.callback_query(F.data == "add_target")
 async def add_target_start(callback: CallbackQuery, state: FSMContext):
     """Target guruh qo'shish"""
@@ -598,39 +790,218 @@ async def delete_admin(callback: CallbackQuery):
 # ============== STATS HANDLERS ==============
 
 @router.callback_query(F.data == "stats")
-async def show_stats(callback: CallbackQuery):
+async def show_stats(callback: CallbackQuery, userbot=None):
     """Statistika"""
-    today = db.get_today_stats()
-    total = db.get_total_stats()
-    groups = len(db.get_source_groups())
-    active_groups = len(db.get_active_group_ids())
-    target_groups = len(db.get_target_groups())
-    monitored_groups = len(db.get_monitored_groups())
+    stats = db.get_dashboard_stats()
+    outbox = db.get_outbox_stats()
+    hourly = db.get_hourly_stats()
+    top_groups = db.get_group_order_counts(days=7, limit=5)
     
     text = (
         "📊 **Statistika**\n\n"
         f"**Bugun:**\n"
-        f"├ Qayta ishlangan: {today['processed']}\n"
-        f"├ Yuborilgan: {today['forwarded']}\n"
-        f"└ Filtrlangan: {today['filtered']}\n\n"
+        f"├ Qayta ishlangan: {stats['today_processed']}\n"
+        f"├ Yuborilgan: {stats['today_forwarded']}\n"
+        f"└ Filtrlangan: {stats['today_filtered']}\n\n"
         f"**Umumiy:**\n"
-        f"├ Qayta ishlangan: {total['processed']}\n"
-        f"├ Yuborilgan: {total['forwarded']}\n"
-        f"└ Filtrlangan: {total['filtered']}\n\n"
+        f"├ Qayta ishlangan: {stats['total_processed']}\n"
+        f"├ Yuborilgan: {stats['total_forwarded']}\n"
+        f"└ Filtrlangan: {stats['total_filtered']}\n\n"
         f"**Guruhlar:**\n"
-        f"├ Kuzatiladigan: {active_groups}/{groups} faol\n"
-        f"├ Buyurtmalar: {target_groups}\n"
-        f"└ Qo'shimcha: {monitored_groups}"
+        f"├ Kuzatiladigan: {stats['groups_active']}/{stats['groups_total']} faol\n"
+        f"├ Buyurtmalar: {stats['target_groups']}\n"
+        f"└ Qo'shimcha: {stats['monitored_groups']}"
     )
     
+    if hourly:
+        text += "\n\n**Soatlar (bugun):** _yuborilgan/qayta ishlangan_\n"
+        for i, h in enumerate(hourly):
+            prefix = "└" if i == len(hourly) - 1 else "├"
+            text += f"{prefix} {h['hour']}:00 — {h['forwarded']}/{h['processed']}\n"
+    
+    if top_groups:
+        text += "\n**Eng ko'p zakaz bergan guruhlar (7 kun):**\n"
+        for i, g in enumerate(top_groups):
+            prefix = "└" if i == len(top_groups) - 1 else "├"
+            text += f"{prefix} {g['title'] or g['chat_id']}: {g['orders']}\n"
+    
+    text += (
+        "\n**Yuborish navbati:**\n"
+        f"├ Kutilmoqda: {outbox['pending']}"
+        + (f" (eng eskisi {outbox['oldest_age']} s)" if outbox['pending'] else "") + "\n"
+    )
+    if userbot and getattr(userbot, 'outbox', None):
+        text += (
+            f"├ Tezlik: {userbot.outbox.sent_per_minute()} ta/daqiqa\n"
+            f"├ Birlashtirilgan xabarlar: {userbot.outbox.digests_sent}\n"
+        )
+    text += (
+        f"├ So'nggi soatda yuborilgan: {outbox['sent_hour']}\n"
+        f"└ Yuborilmagan: {outbox['failed']}"
+    )
+    
+    buttons = [[
+        InlineKeyboardButton(text="🗺 Yo'nalishlar", callback_data="routes"),
+        InlineKeyboardButton(text="💰 AI xarajat", callback_data="ai_costs"),
+    ]]
+    if outbox['failed']:
+        buttons.append([InlineKeyboardButton(text="🔁 Yuborilmaganlarni qayta yuborish", callback_data="outbox_retry")])
+    buttons.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="main_menu")])
+    
     await safe_edit_text(
         callback.message,
         text,
-        reply_markup=back_keyboard(),
+        reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
         parse_mode="Markdown"
     )
 
 
+HEATMAP_SHADES = " ░▒▓█"
+
+
+def _format_price(value) -> str:
+    return f"{value:,}".replace(",", " ") if value else "—"
+
+
+def route_heatmap_text(heatmap: list) -> str:
+    """Yo'nalishlar x soatlar jadvali (monospace)"""
+    peak = max((max(r['hours']) for r in heatmap), default=0) or 1
+    lines = ["    0     6     12    18"]
+    for i, route in enumerate(heatmap, 1):
+        cells = "".join(
+            HEATMAP_SHADES[min(len(HEATMAP_SHADES) - 1, -(-count * (len(HEATMAP_SHADES) - 1) // peak))]
+            for count in route['hours']
+        )
+        lines.append(f"{i:>2}. {cells}")
+    return "\n".join(lines)
+
+
+@router.callback_query(F.data == "routes")
+async def show_routes(callback: CallbackQuery):
+    """Yo'nalishlar tahlili va soatlik heatmap"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    routes = db.get_top_routes(days=7, limit=8)
+    heatmap = db.get_route_heatmap(days=7, limit=8)
+    
+    text = "🗺 **Yo'nalishlar (7 kun)**\n\n"
+    if not routes:
+        text += "Hali yo'nalish ma'lumotlari yo'q"
+    
+    for i, r in enumerate(routes, 1):
+        text += f"{i}. {r['from_location']} → {r['to_location']} — {r['orders']} ta\n"
+        text += f"   👥 {r['avg_passengers'] or '—'}"
+        if r['avg_price']:
+            text += (f" | 💰 {_format_price(r['min_price'])} – {_format_price(r['max_price'])}"
+                     f" (o'rtacha {_format_price(r['avg_price'])})")
+        text += "\n"
+    
+    if heatmap:
+        text += f"\n**Soatlar bo'yicha:**\n```\n{route_heatmap_text(heatmap)}\n```"
+    
+    await safe_edit_text(
+        callback.message,
+        text,
+        reply_markup=back_keyboard("stats"),
+        parse_mode="Markdown"
+    )
+
+
+def _format_tokens(value) -> str:
+    value = value or 0
+    return f"{value / 1000:.1f}K" if value >= 1000 else str(value)
+
+
+@router.callback_query(F.data == "ai_costs")
+async def show_ai_costs(callback: CallbackQuery):
+    """OpenAI sarfi: kunlar, guruhlar va byudjet holati"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    # Xotiradagi hisoblagichlarni yozib, ko'rsatkichlarni yangilash
+    usage_tracker.flush()
+    
+    daily = db.get_ai_usage_daily(days=7)
+    groups = db.get_ai_usage_by_group(days=1, limit=8)
+    group_budget = Config.AI_GROUP_DAILY_BUDGET
+    total_budget = Config.AI_DAILY_BUDGET
+    
+    text = "💰 **AI xarajat**\n\n"
+    if not daily:
+        text += "Hali AI so'rovlari yo'q"
+    else:
+        today = daily[0] if daily[0]['day'] == ai_today() else None
+        if today:
+            requests = today['calls'] + today['cached']
+            text += (
+                f"**Bugun:**\n"
+                f"├ So'rovlar: {today['calls']} (+{today['cached']} keshdan, "
+                f"{today['cached'] * 100 // max(requests, 1)}%)\n"
+                f"├ Tokenlar: {_format_tokens(today['prompt_tokens'])} / "
+                f"{_format_tokens(today['completion_tokens'])}\n"
+                f"└ Narx: ${today['cost']:.4f}"
+                + (f" / ${total_budget:.2f}" if total_budget else "") + "\n\n"
+            )
+        
+        text += "**Kunlar:**\n"
+        for i, d in enumerate(daily):
+            prefix = "└" if i == len(daily) - 1 else "├"
+            text += f"{prefix} {d['day']}: ${d['cost']:.4f} ({d['calls']} so'rov)\n"
+    
+    models = db.get_ai_usage_by_model(days=1)
+    if models:
+        text += "\n**Modellar (bugun):**\n"
+        for i, m in enumerate(models):
+            prefix = "└" if i == len(models) - 1 else "├"
+            text += (f"{prefix} {m['model']}: {m['calls']} so'rov, "
+                     f"{m['avg_latency_ms']:.0f} ms, ${m['cost']:.4f}\n")
+    
+    # Bosqichlar ko'rsatkichlari (shu process, ishga tushgandan beri)
+    from ai_classifier import classifier
+    fast = classifier.tier_stats["fast"]
+    if fast["calls"]:
+        text += (
+            f"_Arzon model: {fast['escalated'] * 100 // fast['calls']}% asosiy modelga o'tkazildi"
+            + (f", {fast['agreed'] * 100 // fast['compared']}% mos kelgan" if fast['compared'] else "")
+            + "_\n"
+        )
+    
+    if groups:
+        text += "\n**Guruhlar (bugun):**\n"
+        for i, g in enumerate(groups):
+            prefix = "└" if i == len(groups) - 1 else "├"
+            mark = "🔴 " if group_budget and g['cost'] >= group_budget else ""
+            title = g['title'] or ("Shaxsiy" if not g['group_id'] else g['group_id'])
+            text += f"{prefix} {mark}{title}: ${g['cost']:.4f} ({g['calls']} so'rov, {_format_tokens(g['tokens'])} token)\n"
+    
+    if group_budget:
+        text += f"\n_Guruh byudjeti: ${group_budget:.2f}/kun - tugasa faqat kalit so'zlar_"
+    
+    await safe_edit_text(
+        callback.message,
+        text,
+        reply_markup=back_keyboard("stats"),
+        parse_mode="Markdown"
+    )
+
+
+@router.callback_query(F.data == "outbox_retry")
+async def retry_outbox(callback: CallbackQuery, userbot=None):
+    """Yuborilmagan xabarlarni qayta navbatga qo'yish"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    count = db.retry_failed_outbox()
+    if userbot and getattr(userbot, 'outbox', None):
+        userbot.outbox.notify()
+    await callback.answer(f"🔁 {count} ta xabar qayta navbatga qo'yildi")
+    await show_stats(callback, userbot)
+
+
 # ============== SERVER INFO HANDLERS ==============
 
 @router.callback_query(F.data == "server_info")
@@ -679,7 +1050,7 @@ async def show_server_info(callback: CallbackQuery):
         bytes_recv = net_io.bytes_recv / (1024 ** 2)
         
         # Database hajmi
-        db_size = os.path.getsize('data.db') / (1024 ** 2)  # MB
+        db_size = os.path.getsize(db.DATABASE_PATH) / (1024 ** 2)  # MB
         
         text = (
             "🖥 **Server Ma'lumotlari**\n\n"
@@ -720,7 +1091,7 @@ async def show_server_info(callback: CallbackQuery):
 # ============== ACCOUNTS HANDLERS ==============
 
 @router.callback_query(F.data == "accounts_menu")
-async def show_accounts(callback: CallbackQuery):
+async def show_accounts(callback: CallbackQuery, userbot=None):
     """Telegram akkauntlar holati"""
     if not is_admin(callback.from_user.id):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
@@ -777,15 +1148,18 @@ async def show_accounts(callback: CallbackQuery):
                     # Telethon session'da sessions jadvalidagi dc_id va auth_key bor
                     # Lekin telefon raqam to'g'ridan-to'g'ri saqlanmaydi
                     # Config fayldan olish
-                    from config import Config
-                    if session_name == Config.SESSION_NAME:
-                        phone_number = Config.PHONE_NUMBER
+                    phone_number = Config.session_phone(session_name) or phone_number
                     conn.close()
                 except:
                     pass
                 
+                # Akkauntlar pulidagi holat (FloodWait / ban)
+                pool_status = userbot.pool.status().get(session_name) if userbot and getattr(userbot, 'pool', None) else None
+                
                 text += f"**{session_name}**\n"
                 text += f"├ 📞 Telefon: {phone_number}\n"
+                if pool_status:
+                    text += f"├ Pul: {pool_status}\n"
                 text += f"├ Holat: {status}\n"
                 text += f"├ Hajm: {file_size:.1f} KB\n"
                 text += f"└ Oxirgi faollik: {last_active}\n\n"
@@ -825,6 +1199,9 @@ async def show_accounts(callback: CallbackQuery):
 
 # ============== RECENT ORDERS HANDLERS ==============
 
+ORDERS_PER_PAGE = 10
+
+
 @router.callback_query(F.data == "recent_orders")
 async def show_recent_orders(callback: CallbackQuery):
     """So'nggi zakazlar"""
@@ -832,7 +1209,38 @@ async def show_recent_orders(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
-    orders = db.get_recent_orders(10)
+    await show_orders_page(callback)
+
+
+@router.callback_query(F.data.startswith("orders_page:"))
+async def orders_page_handler(callback: CallbackQuery):
+    """Eskiroq zakazlar sahifasi"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    before_id = int(callback.data.split(":")[1])
+    await show_orders_page(callback, before_id=before_id)
+
+
+@router.callback_query(F.data.startswith("orders_newer:"))
+async def orders_newer_handler(callback: CallbackQuery):
+    """Yangiroq zakazlar sahifasi"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    after_id = int(callback.data.split(":")[1])
+    await show_orders_page(callback, after_id=after_id)
+
+
+async def show_orders_page(callback: CallbackQuery, before_id: int = None, after_id: int = None):
+    """Zakazlarni sahifa bo'yicha ko'rsatish (keyset pagination)"""
+    orders = db.get_orders_page(before_id=before_id, after_id=after_id, limit=ORDERS_PER_PAGE)
+    
+    # Yangiroq zakazlar tugagan bo'lsa - eng so'nggi sahifaga qaytish
+    if not orders and after_id is not None:
+        orders = db.get_orders_page(limit=ORDERS_PER_PAGE)
     
     if not orders:
         await safe_edit_text(
@@ -843,38 +1251,53 @@ async def show_recent_orders(callback: CallbackQuery):
         )
         return
     
-    text = "📦 **So'nggi 10 ta zakaz**\n\n"
+    newest_id = orders[0]['id']
+    oldest_id = orders[-1]['id']
+    # Sahifani qayta chizish uchun yakor (bloklash/blokdan chiqarishdan keyin)
+    anchor = newest_id + 1
+    
+    text = f"📦 **So'nggi zakazlar** (#{oldest_id} - #{newest_id})\n\n"
     buttons = []
     
     for order in orders:
-        # Vaqtni formatlash
-        from datetime import datetime
-        created = datetime.fromisoformat(order['created_at'])
-        time_str = created.strftime("%d.%m %H:%M")
+        time_str = order['created_label'] or ""
         
         # Qisqa ma'lumot
         user_name = order['user_name'] or "Noma'lum"
         phone = order['phone'] or "Telefon yo'q"
         
         # Xabar matnini qisqartirish
-        msg_preview = order['message_text'][:30] + "..." if len(order['message_text']) > 30 else order['message_text']
+        message_text = order['message_text'] or ""
+        msg_preview = message_text[:30] + "..." if len(message_text) > 30 else message_text
         
         text += f"🕐 {time_str} | {user_name}\n"
         text += f"📞 {phone}\n"
         text += f"💬 {msg_preview}\n"
         
         # Bloklash tugmasi
-        is_blocked = db.is_blocked(order['user_id'])
-        if is_blocked:
+        if order['is_blocked']:
             button_text = f"✅ Bloklangan: {user_name[:15]}"
-            callback_data = f"unblock_order:{order['user_id']}"
+            callback_data = f"unblock_order:{order['user_id']}:{anchor}"
         else:
             button_text = f"🚫 Bloklash: {user_name[:15]}"
-            callback_data = f"block_order:{order['user_id']}"
+            callback_data = f"block_order:{order['user_id']}:{anchor}"
         
         buttons.append([InlineKeyboardButton(text=button_text, callback_data=callback_data)])
         text += "\n"
     
+    # Pagination tugmalari
+    nav_buttons = []
+    
+    if db.has_orders_after(newest_id):
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Yangiroq", callback_data=f"orders_newer:{newest_id}"))
+    
+    if db.has_orders_before(oldest_id):
+        nav_buttons.append(InlineKeyboardButton(text="Eskiroq ➡️", callback_data=f"orders_page:{oldest_id}"))
+    
+    if nav_buttons:
+        buttons.append(nav_buttons)
+    
+    buttons.append([InlineKeyboardButton(text="🔎 Qidirish", callback_data="search_orders")])
     buttons.append([InlineKeyboardButton(text="🔙 Orqaga", callback_data="main_menu")])
     
     await safe_edit_text(
@@ -885,6 +1308,119 @@ async def show_recent_orders(callback: CallbackQuery):
     )
 
 
+# ============== ORDER SEARCH HANDLERS ==============
+
+def search_results_view(query: str, orders: list, has_more: bool) -> tuple[str, InlineKeyboardMarkup]:
+    """Qidiruv natijalari sahifasi (matn va tugmalar)"""
+    text = f"🔎 **Qidiruv:** `{query.replace('`', '')}`\n\n"
+    if not orders:
+        text += "Hech narsa topilmadi.\n\n_Har bir so'z kamida 3 belgidan iborat bo'lsin._"
+    
+    for order in orders:
+        message_text = order['message_text'] or ""
+        msg_preview = message_text[:60] + "..." if len(message_text) > 60 else message_text
+        user_name = order['user_name'] or "Noma'lum"
+        phone = order['phone'] or "Telefon yo'q"
+        blocked = " 🚫" if order['is_blocked'] else ""
+        text += f"#{order['id']} 🕐 {order['created_label'] or ''} | {user_name}{blocked}\n"
+        text += f"📞 {phone}\n"
+        text += f"💬 {msg_preview}\n\n"
+    
+    buttons = []
+    if has_more:
+        buttons.append([InlineKeyboardButton(text="Eskiroq ➡️", callback_data=f"search_page:{orders[-1]['id']}")])
+    buttons.append([
+        InlineKeyboardButton(text="🔎 Yangi qidiruv", callback_data="search_orders"),
+        InlineKeyboardButton(text="🔙 Orqaga", callback_data="recent_orders"),
+    ])
+    return text, InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
+def find_orders(query: str, before_id: int = None) -> tuple[list, bool]:
+    """Qidiruv sahifasi va keyingi sahifa borligi"""
+    orders = db.search_orders(query, before_id=before_id, limit=ORDERS_PER_PAGE + 1)
+    return orders[:ORDERS_PER_PAGE], len(orders) > ORDERS_PER_PAGE
+
+
+@router.message(Command("search", "qidir"))
+async def cmd_search(message: Message, state: FSMContext):
+    """Zakazlarni qidirish: /search <matn, ism yoki telefon>"""
+    if not is_admin(message.from_user.id):
+        return
+    
+    query = message.text.partition(" ")[2].strip()
+    if not query:
+        await state.set_state(SearchOrdersState.waiting_for_query)
+        await message.answer(
+            "🔎 Qidiruv so'zini yuboring (yo'nalish, ism yoki telefon):",
+            reply_markup=cancel_keyboard()
+        )
+        return
+    
+    await send_search_results(message, state, query)
+
+
+@router.callback_query(F.data == "search_orders")
+async def search_orders_start(callback: CallbackQuery, state: FSMContext):
+    """Qidiruv so'zini so'rash"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    await state.set_state(SearchOrdersState.waiting_for_query)
+    await safe_edit_text(
+        callback.message,
+        "🔎 **Zakazlarni qidirish**\n\n"
+        "Yo'nalish, ism yoki telefon raqamini yuboring.\n"
+        "Masalan: `Samarqand`, `Alisher`, `901234567`",
+        reply_markup=cancel_keyboard(),
+        parse_mode="Markdown"
+    )
+
+
+@router.message(SearchOrdersState.waiting_for_query)
+async def search_orders_finish(message: Message, state: FSMContext):
+    """Qidiruv natijalari"""
+    await send_search_results(message, state, (message.text or "").strip())
+
+
+async def send_search_results(message: Message, state: FSMContext, query: str):
+    """Birinchi sahifani yuborish va so'rovni keyingi sahifalar uchun saqlash"""
+    await state.set_state(None)
+    await state.update_data(search_query=query)
+    
+    orders, has_more = find_orders(query)
+    text, keyboard = search_results_view(query, orders, has_more)
+    reply = await message.answer("🔎 Qidirilmoqda...")
+    await safe_edit_text(reply, text, reply_markup=keyboard, parse_mode="Markdown")
+
+
+@router.callback_query(F.data.startswith("search_page:"))
+async def search_page_handler(callback: CallbackQuery, state: FSMContext):
+    """Qidiruv natijalarining keyingi sahifasi"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
+        return
+    
+    query = (await state.get_data()).get("search_query")
+    if not query:
+        await callback.answer("Qidiruv eskirgan, qaytadan qidiring", show_alert=True)
+        return
+    
+    before_id = int(callback.data.split(":")[1])
+    orders, has_more = find_orders(query, before_id=before_id)
+    text, keyboard = search_results_view(query, orders, has_more)
+    await safe_edit_text(callback.message, text, reply_markup=keyboard, parse_mode="Markdown")
+
+
+def _parse_order_action(data: str) -> tuple[int, int | None]:
+    """`block_order:<user_id>[:<anchor>]` dan user_id va sahifa yakorini olish"""
+    parts = data.split(":")
+    user_id = int(parts[1])
+    anchor = int(parts[2]) if len(parts) > 2 else None
+    return user_id, anchor
+
+
 @router.callback_query(F.data.startswith("block_order:"))
 async def block_order_user(callback: CallbackQuery):
     """Zakazdan foydalanuvchini bloklash"""
@@ -892,12 +1428,12 @@ async def block_order_user(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
-    user_id = int(callback.data.split(":")[1])
+    user_id, anchor = _parse_order_action(callback.data)
     
     if db.block_user(user_id, blocked_by=callback.from_user.id, reason="Admin tomonidan bloklandi"):
         await callback.answer("🚫 Foydalanuvchi bloklandi!", show_alert=True)
-        # Ro'yxatni yangilash
-        await show_recent_orders(callback)
+        # Ro'yxatni yangilash (o'sha sahifada qolish)
+        await show_orders_page(callback, before_id=anchor)
     else:
         await callback.answer("❌ Xatolik", show_alert=True)
 
@@ -909,12 +1445,12 @@ async def unblock_order_user(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
-    user_id = int(callback.data.split(":")[1])
+    user_id, anchor = _parse_order_action(callback.data)
     
     if db.unblock_user(user_id):
         await callback.answer("✅ Blokdan chiqarildi!", show_alert=True)
-        # Ro'yxatni yangilash
-        await show_recent_orders(callback)
+        # Ro'yxatni yangilash (o'sha sahifada qolish)
+        await show_orders_page(callback, before_id=anchor)
     else:
         await callback.answer("❌ Xatolik", show_alert=True)
 
@@ -928,8 +1464,18 @@ async def ai_menu(callback: CallbackQuery):
         await callback.answer("⛔ Ruxsat yo'q!", show_alert=True)
         return
     
+    from ai_classifier import classifier
+    
     current_prompt = db.get_setting("ai_prompt")
     status = "✅ Maxsus prompt" if current_prompt else "📝 Default prompt"
+    if current_prompt and classifier.fast_model and classifier.fast_model != classifier.model:
+        tiers = (f"⚠️ Maxsus prompt bilan arzon model ({classifier.fast_model}) ishlatilmaydi - "
+                 f"har xabar asosiy modelda ({classifier.model}) tahlil qilinadi, sarf oshadi.\n\n")
+    elif classifier.uses_fast_tier():
+        tiers = (f"⚡ Aniq xabarlarni arzon model ({classifier.fast_model}) o'z qisqa prompti bilan "
+                 f"tahlil qiladi; maxsus prompt o'rnatilsa - hammasi asosiy modelda.\n\n")
+    else:
+        tiers = ""
     
     buttons = [
         [InlineKeyboardButton(text="👁 Promptni ko'rish", callback_data="view_prompt")],
@@ -942,6 +1488,7 @@ async def ai_menu(callback: CallbackQuery):
         callback.message,
         f"🤖 **AI Sozlamalari**\n\n"
         f"Holat: {status}\n\n"
+        f"{tiers}"
         f"AI prompt - xabarlarni tahlil qilish uchun ishlatiladi.\n"
         f"Yo'lovchi va haydovchi zakazlarini ajratadi.",
         reply_markup=InlineKeyboardMarkup(inline_keyboard=buttons),
@@ -1001,7 +1548,8 @@ async def edit_prompt_finish(message: Message, state: FSMContext):
     
     await message.answer(
         "✅ AI prompt saqlandi!\n\n"
-        "Yangi prompt keyingi xabarlardan boshlab ishlatiladi.",
+        "Yangi prompt keyingi xabarlardan boshlab ishlatiladi.\n"
+        "Maxsus prompt bilan arzon model o'chadi - barcha xabarlar asosiy modelda.",
         reply_markup=back_keyboard("ai_menu"),
         parse_mode="Markdown"
     )
@@ -1495,7 +2043,8 @@ async def handle_user_order(message: Message, userbot = None):
                 phone=order_data.get('phone'),
                 message_text=text,
                 chat_id=message.chat.id,
-                chat_title="Private"
+                chat_title="Private",
+                fields=extract_order_fields(order_data, classifier.PASSENGER_ORDER)
             )
             
             await message.answer(
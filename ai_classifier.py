@@ -6,9 +6,16 @@ Yaxshilangan versiya - yo'lovchi va haydovchi zakazlarini ajratadi
 
 import json
 import logging
+import time
+from collections import OrderedDict
 from openai import AsyncOpenAI
 from config import Config
 import database as db
+from ai_usage import usage_tracker
+from alerts import alerts
+from locations import extract_route, is_complete
+from semantic_cache import SemanticCache
+from textnorm import normalize
 
 logger = logging.getLogger("taxi_bot.classifier")
 
@@ -65,6 +72,24 @@ MISOLLAR:
 Faqat JSON formatda javob ber, boshqa hech narsa yozma."""
 
 
+# 1-bosqich (arzon model) prompti - javob sxemasi minimal (kam chiquvchi token)
+FAST_PROMPT = """Taxi guruhidagi xabarni tasnifla. Faqat JSON:
+{"t": "p" | "d" | "o", "c": 0.0-1.0, "f": "qayerdan", "to": "qayerga",
+ "v": "vaqt", "n": "yo'lovchilar soni", "pr": "narx", "m": "mashina"}
+p - yo'lovchi taksi/pochta qidiryapti ("kerak", "boraman", "pochta bor")
+d - haydovchi yo'lovchi qidiryapti ("olib ketaman", "joy bor", mashina nomi)
+o - boshqa xabar
+c - ishonch; f/to - shahar yoki tuman; v, n, pr, m - xabarda bo'lsa (bo'lmasa "")"""
+
+# Arzon model javobidagi qisqa kalitlar -> to'liq prompt'dagi data maydonlari
+FAST_FIELDS = {
+    "f": "from_location", "to": "to_location", "v": "time",
+    "n": "passengers", "pr": "price", "m": "car_info",
+}
+
+FAST_TYPES = {"p": "passenger_order", "d": "driver_order", "o": "other"}
+
+
 class MessageClassifier:
     """OpenAI orqali xabarlarni klassifikatsiya qilish"""
     
@@ -73,19 +98,38 @@ class MessageClassifier:
     DRIVER_ORDER = "driver_order"
     OTHER = "other"
     
+    # Natijalar keshi hajmi (kalit - normallashtirilgan matn)
+    CACHE_SIZE = 2000
+    
     def __init__(self):
         self.client = AsyncOpenAI(api_key=Config.OPENAI_API_KEY)
         self.model = Config.OPENAI_MODEL
+        self.fast_model = Config.OPENAI_FAST_MODEL
+        # Bosqichlar ko'rsatkichlari (shu process bo'yicha)
+        self.tier_stats = {
+            tier: {"calls": 0, "errors": 0, "latency_ms": 0.0, "escalated": 0, "compared": 0, "agreed": 0}
+            for tier in ("fast", "full")
+        }
+        self._cache = OrderedDict()
+        self._cache_prompt = None
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.semantic_cache = SemanticCache(
+            Config.SEMANTIC_CACHE_SIZE, Config.SEMANTIC_CACHE_THRESHOLD
+        ) if Config.SEMANTIC_CACHE_SIZE > 0 else None
     
     def _get_prompt(self) -> str:
         """AI promptni olish (DB dan yoki default)"""
         custom_prompt = db.get_setting("ai_prompt")
         return custom_prompt if custom_prompt else DEFAULT_PROMPT
     
-    async def classify_message(self, message_text: str) -> dict:
+    async def classify_message(self, message_text: str, group_id: int = None) -> dict:
         """
         Xabarni tahlil qilish
         
+        Args:
+            group_id: manba guruh (AI sarfini hisoblash uchun)
+        
         Returns:
             dict: {
                 "type": "passenger_order" | "driver_order" | "other",
@@ -97,13 +141,63 @@ class MessageClassifier:
         if not message_text or len(message_text.strip()) < 5:
             return {"type": self.OTHER, "confidence": 1.0, "data": None}
         
+        # Prompt o'zgarsa eski natijalar yaroqsiz
+        prompt = self._get_prompt()
+        if prompt != self._cache_prompt:
+            self._cache.clear()
+            if self.semantic_cache is not None:
+                self.semantic_cache.clear()
+            self._cache_prompt = prompt
+        
+        # Bir xil xabar (lotin/kirill, apostrof farqisiz) - keshdan
+        key = normalize(message_text)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.cache_hits += 1
+            usage_tracker.record(group_id, self.model, cached=1)
+            data = cached.get("data")
+            return {**cached, "data": dict(data) if isinstance(data, dict) else data, "cached": "exact"}
+        self.cache_misses += 1
+        
+        # O'xshash xabar (boshqa yo'nalish, raqam yoki so'z tartibi) - faqat turi
+        # qayta ishlatiladi; yo'nalish va yo'lovchilar soni shu xabardan lokal ajratiladi
+        encoded = None
+        if self.semantic_cache is not None:
+            encoded = self.semantic_cache.encode(message_text)
+            verdict, score = self.semantic_cache.lookup(message_text, encoded)
+            if verdict:
+                usage_tracker.record(group_id, self.model, cached=1)
+                logger.debug("AI semantik keshdan (%.2f): %s", score, verdict['type'])
+                data = extract_route(message_text) if verdict["type"] != self.OTHER else None
+                return {**verdict, "data": data, "cached": "semantic"}
+        
+        result = await self.classify_tiered(message_text, group_id, prompt)
+        if result is None:
+            return {"type": self.OTHER, "confidence": 0.0, "data": None}
+        
+        self._cache[key] = result
+        if len(self._cache) > self.CACHE_SIZE:
+            self._cache.popitem(last=False)
+        if self.semantic_cache is not None and result.get("type"):
+            verdict = {"type": result["type"], "confidence": result.get("confidence", 0)}
+            self.semantic_cache.add(message_text, verdict, encoded)
+        data = result.get("data")
+        return {**result, "data": dict(data) if isinstance(data, dict) else data}
+    
+    async def _request(self, tier_name: str, model: str, prompt: str, message_text: str,
+                       max_tokens: int, group_id: int = None) -> dict | None:
+        """Bitta OpenAI so'rovi: JSON natija yoki xato bo'lsa None"""
+        tier = self.tier_stats[tier_name]
+        tier["calls"] += 1
+        start = time.perf_counter()
         try:
             response = await self.client.chat.completions.create(
-                model=self.model,
+                model=model,
                 messages=[
                     {
                         "role": "system",
-                        "content": self._get_prompt()
+                        "content": prompt
                     },
                     {
                         "role": "user",
@@ -111,51 +205,129 @@ class MessageClassifier:
                     }
                 ],
                 temperature=0.1,
-                max_tokens=500,
+                max_tokens=max_tokens,
                 response_format={"type": "json_object"}
             )
+            latency_ms = (time.perf_counter() - start) * 1000
+            tier["latency_ms"] += latency_ms
             
-            result = json.loads(response.choices[0].message.content)
-            logger.debug(f"AI natija: {result}")
+            usage = getattr(response, "usage", None)
+            usage_tracker.record(
+                group_id, model,
+                getattr(usage, "prompt_tokens", 0) or 0,
+                getattr(usage, "completion_tokens", 0) or 0,
+                latency_ms=latency_ms
+            )
             
+            result = json.loads(response.choices[0].message.content)
+            logger.debug("AI natija (%s): %s", model, result)
+            if not isinstance(result, dict):
+                raise json.JSONDecodeError("JSON obyekt emas", str(result), 0)
             return result
             
         except json.JSONDecodeError as e:
+            tier["errors"] += 1
             logger.error(f"JSON parse xatosi: {e}")
-            return {"type": self.OTHER, "confidence": 0.0, "data": None}
+            return None
             
         except Exception as e:
+            tier["errors"] += 1
             logger.error(f"OpenAI API xatosi: {e}")
-            return {"type": self.OTHER, "confidence": 0.0, "data": None}
+            alerts.report(e, f"openai:{tier_name}")
+            return None
+    
+    async def classify_fast(self, message_text: str, group_id: int = None) -> dict | None:
+        """1-bosqich: arzon model, qisqa prompt va kichik javob sxemasi"""
+        result = await self._request("fast", self.fast_model, FAST_PROMPT, message_text, 100, group_id)
+        if result is None:
+            return None
+        try:
+            confidence = float(result.get("c", 0))
+        except (TypeError, ValueError):
+            confidence = 0.0
+        return {
+            "type": FAST_TYPES.get(result.get("t"), self.OTHER),
+            "confidence": confidence,
+            "data": {field: result.get(key) or None for key, field in FAST_FIELDS.items()},
+        }
+    
+    async def classify_full(self, message_text: str, group_id: int = None, prompt: str = None) -> dict | None:
+        """2-bosqich: asosiy model va to'liq ma'lumot ajratish prompti"""
+        return await self._request("full", self.model, prompt or self._get_prompt(), message_text, 500, group_id)
+    
+    def needs_escalation(self, result: dict, message_text: str) -> bool:
+        """Arzon model natijasi noaniqmi: ishonch oralig'ida yoki zakazda yo'nalish yo'q"""
+        confidence = result.get("confidence", 0)
+        if Config.AI_ESCALATE_MIN <= confidence < Config.AI_ESCALATE_MAX:
+            return True
+        if result["type"] == self.OTHER:
+            return False
+        data = result.get("data") or {}
+        if data.get("from_location") and data.get("to_location"):
+            return False
+        return not is_complete(extract_route(message_text))
     
-    async def is_order(self, message_text: str) -> tuple[bool, str, dict | None]:
+    def uses_fast_tier(self, prompt: str = None) -> bool:
+        """Arzon model ishlatiladimi: sozlangan va admin o'z promptini o'rnatmagan
+
+        Arzon model FAST_PROMPT bilan ishlaydi - maxsus prompt unga ta'sir
+        qilmaydi, shuning uchun maxsus prompt bilan har xabar asosiy modelda.
+        """
+        if not self.fast_model or self.fast_model == self.model:
+            return False
+        return (prompt or self._get_prompt()) == DEFAULT_PROMPT
+    
+    async def classify_tiered(self, message_text: str, group_id: int = None, prompt: str = None) -> dict | None:
+        """Avval arzon model; noaniq natijalar asosiy modelga yuboriladi"""
+        fast = None
+        if self.uses_fast_tier(prompt):
+            fast = await self.classify_fast(message_text, group_id)
+            if fast is not None and not self.needs_escalation(fast, message_text):
+                return fast
+            self.tier_stats["fast"]["escalated"] += 1
+        
+        full = await self.classify_full(message_text, group_id, prompt)
+        if fast is not None and full is not None:
+            # Arzon model asosiy model bilan mos kelganmi (aniqlik ko'rsatkichi)
+            self.tier_stats["fast"]["compared"] += 1
+            if fast["type"] == full.get("type"):
+                self.tier_stats["fast"]["agreed"] += 1
+        return full if full is not None else fast
+    
+    async def is_order(self, message_text: str, group_id: int = None,
+                       details: dict = None) -> tuple[bool, str, dict | None]:
         """
         Xabar zakaz (yo'lovchi yoki haydovchi) mi tekshirish
         
+        Args:
+            details: berilsa - AI javobi bilan to'ldiriladi (verdict, confidence, cached)
+        
         Returns:
             (bool, str, dict | None): (zakazmi, turi, ma'lumotlar)
         """
         
-        result = await self.classify_message(message_text)
+        result = await self.classify_message(message_text, group_id)
         order_type = result.get("type", self.OTHER)
         confidence = result.get("confidence", 0)
+        if details is not None:
+            details.update(verdict=order_type, confidence=confidence, cached=result.get("cached"))
         
         if order_type in [self.PASSENGER_ORDER, self.DRIVER_ORDER]:
-            if confidence >= 0.7:
+            if confidence >= Config.AI_MIN_CONFIDENCE:
                 return True, order_type, result.get("data")
         
         return False, self.OTHER, None
     
-    async def is_passenger_order(self, message_text: str) -> tuple[bool, dict | None]:
+    async def is_passenger_order(self, message_text: str, group_id: int = None) -> tuple[bool, dict | None]:
         """Yo'lovchi zakazi tekshirish (orqaga muvofiqlik)"""
-        is_ord, order_type, data = await self.is_order(message_text)
+        is_ord, order_type, data = await self.is_order(message_text, group_id)
         if is_ord and order_type == self.PASSENGER_ORDER:
             return True, data
         return False, None
     
-    async def is_driver_order(self, message_text: str) -> tuple[bool, dict | None]:
+    async def is_driver_order(self, message_text: str, group_id: int = None) -> tuple[bool, dict | None]:
         """Haydovchi zakazi tekshirish"""
-        is_ord, order_type, data = await self.is_order(message_text)
+        is_ord, order_type, data = await self.is_order(message_text, group_id)
         if is_ord and order_type == self.DRIVER_ORDER:
             return True, data
         return False, None
@@ -0,0 +1,161 @@
+"""
+Telegram Taxi Bot - AI Usage Accounting
+OpenAI so'rovlari tokenlari va narxini kun, manba guruh va model bo'yicha hisoblash,
+guruh/kunlik byudjet tugaganda AI'ni o'chirish (faqat kalit so'zlar va lokal tahlil)
+"""
+
+import asyncio
+import logging
+import time
+
+from config import Config
+import database as db
+
+logger = logging.getLogger("taxi_bot.ai_usage")
+
+
+# Narxlar: USD / 1M token (kiruvchi, chiquvchi)
+MODEL_PRICES = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+
+def token_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """So'rov narxi (USD); noma'lum model - gpt-4o-mini narxida"""
+    price_in, price_out = MODEL_PRICES.get(model, MODEL_PRICES["gpt-4o-mini"])
+    return (prompt_tokens * price_in + completion_tokens * price_out) / 1_000_000
+
+
+def today() -> str:
+    return time.strftime("%Y-%m-%d")
+
+
+class UsageTracker:
+    """AI sarfi hisoblagichlari
+
+    record() va over_budget() faqat xotirada ishlaydi (DB so'rovisiz);
+    DB ga yozish va boshqa process'lar sarfini o'qish - run() fon vazifasida,
+    alohida thread'da.
+    """
+
+    FLUSH_INTERVAL = 30  # soniya
+
+    def __init__(self):
+        self._pending = {}    # (day, group_id, model) -> [calls, cached, prompt, completion, cost, latency_ms]
+        self._day = None
+        self._spent = {}      # group_id -> bugungi sarf (DB + yozilmagan)
+        self._exhausted = set()  # byudjeti tugagani haqida log yozilgan guruhlar
+
+    def record(self, group_id: int, model: str, prompt_tokens: int = 0,
+               completion_tokens: int = 0, cached: int = 0, latency_ms: float = 0.0):
+        """So'rov (yoki keshdan javob) sarfini qo'shish"""
+        group_id = group_id or 0
+        day = today()
+        if day != self._day:
+            self._start_day(day)
+
+        cost = token_cost(model, prompt_tokens, completion_tokens)
+        key = (day, group_id, model)
+        counters = self._pending.get(key)
+        if counters is None:
+            counters = self._pending[key] = [0, 0, 0, 0, 0.0, 0.0]
+        counters[0] += 0 if cached else 1
+        counters[1] += cached
+        counters[2] += prompt_tokens
+        counters[3] += completion_tokens
+        counters[4] += cost
+        counters[5] += latency_ms
+        self._spent[group_id] = self._spent.get(group_id, 0.0) + cost
+
+    def spent(self, group_id: int = None) -> float:
+        """Bugungi sarf (USD): guruh yoki jami"""
+        if today() != self._day:
+            self._start_day(today())
+        if group_id is None:
+            return sum(self._spent.values())
+        return self._spent.get(group_id, 0.0)
+
+    def over_budget(self, group_id: int) -> bool:
+        """Guruh yoki umumiy kunlik byudjet tugaganmi"""
+        group_budget = Config.AI_GROUP_DAILY_BUDGET
+        total_budget = Config.AI_DAILY_BUDGET
+        if not group_budget and not total_budget:
+            return False
+
+        exhausted = (
+            (group_budget and self.spent(group_id) >= group_budget)
+            or (total_budget and self.spent() >= total_budget)
+        )
+        if exhausted and group_id not in self._exhausted:
+            self._exhausted.add(group_id)
+            logger.warning(f"💸 Guruh {group_id}: AI byudjeti tugadi (${self.spent(group_id):.4f}) - faqat kalit so'zlar")
+        return bool(exhausted)
+
+    async def run(self):
+        """Fonda: darhol (bugungi sarfni yuklash), keyin har FLUSH_INTERVAL da DB ga yozish"""
+        while True:
+            pending, day = self._take()
+            try:
+                spent = await asyncio.to_thread(self._write, pending, day)
+            except Exception as e:
+                logger.error(f"AI sarfini yozishda xato: {e}")
+                spent = None
+            self._apply(pending, day, spent)
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+
+    def flush(self):
+        """Yig'ilgan hisoblagichlarni darhol DB ga yozish (to'xtatishda, admin panel)"""
+        pending, day = self._take()
+        self._apply(pending, day, self._write(pending, day))
+
+    def _take(self) -> tuple:
+        """Yozilmagan hisoblagichlarni olish (event loop'da - record() bilan to'qnashmaydi)"""
+        pending, self._pending = self._pending, {}
+        return pending, today()
+
+    @staticmethod
+    def _write(pending: dict, day: str) -> dict | None:
+        """Hisoblagichlarni yozish va bugungi sarfni o'qish (thread'da ishlashi mumkin)
+
+        Returns:
+            {group_id: sarf} yoki None - yozib bo'lmadi
+        """
+        if pending and not db.add_ai_usage([(*key, *counters) for key, counters in pending.items()]):
+            return None
+        # Boshqa process'lar (worker'lar) sarfi ham hisobga olinadi
+        return db.get_ai_spent(day)
+
+    def _apply(self, pending: dict, day: str, spent: dict | None):
+        """Yozish natijasi: xato bo'lsa hisoblagichlar qaytariladi, aks holda sarf yangilanadi"""
+        if spent is None:
+            for key, counters in pending.items():
+                current = self._pending.setdefault(key, [0, 0, 0, 0, 0.0, 0.0])
+                for i, value in enumerate(counters):
+                    current[i] += value
+            return
+        if day != self._day:
+            if self._day is not None:
+                return  # yozish paytida kun almashdi - yangi kun xotiradan davom etadi
+            self._start_day(day)
+        self._spent = spent
+        self._add_pending(day)
+
+    def _start_day(self, day: str):
+        """Yangi kun: sarf faqat yozilmagan hisoblagichlardan (DB keyingi yozishda o'qiladi)"""
+        self._day = day
+        self._exhausted.clear()
+        self._spent = {}
+        self._add_pending(day)
+
+    def _add_pending(self, day: str):
+        for (pending_day, group_id, _), counters in self._pending.items():
+            if pending_day == day:
+                self._spent[group_id] = self._spent.get(group_id, 0.0) + counters[4]
+
+
+# Singleton instance
+usage_tracker = UsageTracker()
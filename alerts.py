@@ -0,0 +1,173 @@
+"""
+Telegram Taxi Bot - Admin Alerts
+Xatolarni adminlarga yig'ma xabar (digest) bilan yetkazish: bir xil xato
+(turi va joyi) bitta qatorga birlashtiriladi, ALERT_INTERVAL ichida ko'pi
+bilan bitta digest yuboriladi, adminlarga parallel yuboriladi.
+OpenAI yoki DB ishlamay qolganda minglab Bot API so'rovlari bo'lmaydi.
+"""
+
+import asyncio
+import html
+import logging
+import os
+import time
+import traceback
+
+from config import Config
+import database as db
+
+logger = logging.getLogger("taxi_bot.alerts")
+
+# Telegram xabar uzunligi chegarasi
+MESSAGE_LIMIT = 4096
+
+
+def error_location(error: BaseException) -> str:
+    """Xato ko'tarilgan joy: "fayl.py:qator funksiya" (traceback bo'lmasa - "")"""
+    frames = traceback.extract_tb(error.__traceback__) if error.__traceback__ else None
+    if not frames:
+        return ""
+    frame = frames[-1]
+    return f"{os.path.basename(frame.filename)}:{frame.lineno} {frame.name}"
+
+
+class AlertManager:
+    """Xatolarni yig'ib, davriy digest yuborish"""
+
+    SEND_TIMEOUT = 10  # bitta adminga yuborish (s)
+
+    def __init__(self, interval: int = None, max_items: int = None):
+        self.interval = Config.ALERT_INTERVAL if interval is None else interval
+        self.max_items = Config.ALERT_MAX_ITEMS if max_items is None else max_items
+        self._pending = {}          # (turi, joyi) -> {"count", "first", "last", "message", "context", "where"}
+        self._last_sent = 0.0       # monotonic
+        self._wakeup = asyncio.Event()
+        self._running = False
+        self.digests_sent = 0
+        self.suppressed = 0         # digest'ga birlashtirilgan (alohida yuborilmagan) xatolar
+
+    def report(self, error, where: str, context: str = None):
+        """Xatoni qayd qilish (sinxron, tez - hot path'da chaqirish mumkin)
+
+        Args:
+            error: exception yoki matn
+            where: komponent ("process_message", "outbox", ...)
+            context: qo'shimcha (guruh nomi, xabar matni)
+        """
+        if isinstance(error, BaseException):
+            kind, message, location = type(error).__name__, str(error), error_location(error)
+        else:
+            kind, message, location = "Error", str(error), ""
+
+        key = (kind, location or where)
+        now = time.time()
+        entry = self._pending.get(key)
+        if entry is None:
+            self._pending[key] = {
+                "count": 1, "first": now, "last": now, "where": where,
+                "location": location, "message": message, "context": context,
+            }
+            self._wakeup.set()
+        else:
+            entry["count"] += 1
+            entry["last"] = now
+            entry["message"] = message
+            if context:
+                entry["context"] = context
+            self.suppressed += 1
+
+    @staticmethod
+    def format_entry(entry: dict) -> str:
+        """Bitta xato qatori (HTML)"""
+        since = time.strftime("%H:%M:%S", time.localtime(entry["first"]))
+        location = f" <code>{html.escape(entry['location'], quote=False)}</code>" if entry["location"] else ""
+        lines = [
+            f"❌ <b>{html.escape(entry['kind'], quote=False)}</b> × {entry['count']} "
+            f"({html.escape(entry['where'], quote=False)}{location}, {since} dan)",
+            f"   {html.escape(entry['message'][:300], quote=False)}",
+        ]
+        if entry["context"]:
+            lines.append(f"   📍 {html.escape(entry['context'][:100], quote=False)}")
+        return "\n".join(lines)
+
+    def build_digest(self, entries: list) -> str:
+        """Yig'ma xabar (HTML): eng ko'p takrorlangan xatolar birinchi
+
+        Matn kesilmaydi (HTML teg yoki entity o'rtasida qolib, Telegram butun
+        xabarni rad etadi) - limitga sig'maydigan xatolar butunicha "yana ..." ga o'tadi.
+        """
+        entries = sorted(entries, key=lambda e: -e["count"])
+        total = sum(e["count"] for e in entries)
+        header = f"⚠️ <b>Xatolar</b>: {total} ta ({len(entries)} xil)\n"
+        blocks = [self.format_entry(entry) for entry in entries[:self.max_items]]
+
+        while True:
+            rest = entries[len(blocks):]
+            footer = f"\n\n… yana {len(rest)} xil xato ({sum(e['count'] for e in rest)} ta)" if rest else ""
+            text = "\n".join([header, *blocks]) + footer
+            if len(text) <= MESSAGE_LIMIT or not blocks:
+                return text
+            blocks.pop()
+
+    async def send_digest(self, bot) -> int:
+        """Yig'ilgan xatolarni barcha adminlarga (parallel) yuborish, yetkazilganlar soni"""
+        if not self._pending:
+            return 0
+        entries = [{**entry, "kind": kind} for (kind, _), entry in self._pending.items()]
+        self._pending = {}
+        self._last_sent = time.monotonic()
+        text = self.build_digest(entries)
+
+        try:
+            admin_ids = {admin["user_id"] for admin in db.get_all_admins()}
+        except Exception as e:
+            logger.error(f"Adminlarni olishda xato: {e}")
+            admin_ids = set()
+        admin_ids.update(Config.SUPER_ADMIN_IDS)
+        if not admin_ids:
+            return 0
+
+        async def send(admin_id):
+            await asyncio.wait_for(bot.send_message(admin_id, text, parse_mode="HTML"), self.SEND_TIMEOUT)
+
+        results = await asyncio.gather(*(send(admin_id) for admin_id in admin_ids), return_exceptions=True)
+        delivered = 0
+        for admin_id, result in zip(admin_ids, results):
+            if isinstance(result, BaseException):
+                logger.warning("Admin %sga xatolar digest'ini yuborib bo'lmadi: %s", admin_id, result)
+            else:
+                delivered += 1
+        self.digests_sent += 1
+        return delivered
+
+    async def run(self, bot):
+        """Fon vazifa: yangi xato bo'lsa - interval tugagach digest yuborish"""
+        self._running = True
+        while self._running:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            # Oxirgi digest'dan beri interval o'tmagan bo'lsa - yig'ishda davom etish
+            delay = self._last_sent + self.interval - time.monotonic()
+            if delay > 0 and self._running:
+                try:
+                    await asyncio.wait_for(self._stopped(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            try:
+                await self.send_digest(bot)
+            except Exception as e:
+                logger.error(f"Xatolar digest'ini yuborishda xato: {e}")
+
+    async def _stopped(self):
+        while self._running:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+    def stop(self):
+        """Fon vazifani to'xtatish (yig'ilganlari oxirgi digest bilan yuboriladi)"""
+        self._running = False
+        self._wakeup.set()
+
+
+# Singleton instance
+alerts = AlertManager()
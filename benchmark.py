@@ -0,0 +1,430 @@
+#!/usr/bin/env python3
+"""
+Benchmark'lar
+
+    python benchmark.py workers [--messages 2000] [--workers 0,1,2,4]
+    python benchmark.py startup [--groups 1000] [--latency-ms 30]
+    python benchmark.py orders [--rows 10000000]
+    python benchmark.py locations [--messages 100000]
+    python benchmark.py semantic [--entries 100000] [--pairs eval/semantic_pairs.jsonl]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Benchmark alohida (vaqtinchalik) database bilan ishlaydi
+if "DATABASE_PATH" not in os.environ:
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="taxi_bench_"), "bench.db")
+
+SAMPLE_MESSAGES = [
+    "Toshkent-Samarqand 2ta odam bor",
+    "Chilonzor 9 dan Sergeli 5 ga kerak",
+    "Samarqanddan Toshkentga cobalt ketadi",
+    "Pochta bor Toshkentdan Buxoroga",
+    "Assalomu alaykum hammaga",
+    "Andijondan Toshkentga 3 kishi 901234567",
+    "Yunusobod dan Qoyliq ga 3 kishi",
+    "Bugun kechqurun kim bor?",
+]
+
+AI_RESPONSE = json.dumps({
+    "type": "passenger_order",
+    "confidence": 0.92,
+    "data": {"from_location": "Toshkent", "to_location": "Samarqand", "passengers": "2",
+             "phone": None, "time": "bugun", "price": None, "notes": None},
+})
+
+
+class BenchClassifier:
+    """OpenAI o'rniga: tarmoq kutishi (sleep) + CPU ishi (JSON parse)"""
+
+    PASSENGER_ORDER = "passenger_order"
+    DRIVER_ORDER = "driver_order"
+    OTHER = "other"
+
+    latency = float(os.getenv("BENCH_AI_LATENCY_MS", 200)) / 1000
+    cpu_ms = float(os.getenv("BENCH_CPU_MS", 2))
+
+    async def is_order(self, message_text: str, group_id: int = None, details: dict = None):
+        await asyncio.sleep(self.latency)
+        deadline = time.perf_counter() + self.cpu_ms / 1000
+        result = None
+        while time.perf_counter() < deadline:
+            result = json.loads(AI_RESPONSE)
+        result = result or json.loads(AI_RESPONSE)
+        other = "kim bor" in message_text or "Assalomu" in message_text
+        if details is not None:
+            details.update(verdict=self.OTHER if other else result["type"],
+                           confidence=result["confidence"], cached=None)
+        if other:
+            return False, self.OTHER, None
+        return True, result["type"], result["data"]
+
+
+bench_classifier = BenchClassifier()
+
+
+def make_messages(count: int) -> list:
+    return [
+        {
+            "chat_id": -1000 - (i % 50),
+            "message_id": i,
+            "chat_title": f"Guruh {i % 50}",
+            "sender_id": 10_000 + i,
+            "sender_name": f"User {i}",
+            "sender_username": None,
+            "sender_phone": None,
+            "text": SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)],
+            "has_sticker": False,
+            "media_only": False,
+        }
+        for i in range(count)
+    ]
+
+
+async def run_in_process(messages: list, concurrency: int) -> float:
+    import pipeline
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(msg):
+        async with semaphore:
+            await pipeline.decide(msg, bench_classifier)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(m) for m in messages))
+    return time.perf_counter() - start
+
+
+async def run_workers(messages: list, processes: int, concurrency: int) -> float:
+    from workers import WorkerPool
+
+    done = asyncio.Event()
+    received = 0
+
+    async def on_result(msg, result):
+        nonlocal received
+        received += 1
+        if received == len(messages):
+            done.set()
+
+    pool = WorkerPool(processes, on_result, classifier_spec="benchmark:bench_classifier",
+                      concurrency=concurrency)
+    pool.start()
+    # Worker'lar ishga tushishini kutish (import vaqti o'lchanmaydi)
+    warmup = make_messages(processes)
+    for msg in warmup:
+        msg["chat_id"] = -1
+        pool.submit(msg)
+    while pool.pending:
+        await asyncio.sleep(0.05)
+    received = 0
+
+    start = time.perf_counter()
+    for msg in messages:
+        pool.submit(msg)
+    await done.wait()
+    elapsed = time.perf_counter() - start
+
+    await pool.stop()
+    return elapsed
+
+
+def bench_workers(args):
+    messages = make_messages(args.messages)
+    counts = [int(x) for x in args.workers.split(",")]
+
+    print("=" * 60)
+    print(f"WORKER BENCHMARK: {len(messages)} xabar, AI kutish {BenchClassifier.latency * 1000:.0f} ms, "
+          f"CPU {BenchClassifier.cpu_ms:.1f} ms/xabar")
+    print("=" * 60)
+
+    baseline = None
+    for n in counts:
+        if n == 0:
+            elapsed = asyncio.run(run_in_process(messages, args.concurrency))
+            label = "bitta process"
+        else:
+            elapsed = asyncio.run(run_workers(messages, n, args.concurrency))
+            label = f"{n} worker"
+        rate = len(messages) / elapsed
+        baseline = baseline or rate
+        print(f"{label:>15}: {elapsed:7.2f} s  {rate:8.1f} xabar/s  x{rate / baseline:.2f}")
+
+
+class FakeEntityClient:
+    """get_entity'ni tarmoq kutishi bilan taqlid qiluvchi client"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+
+    async def get_entity(self, entity_id):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return type("Entity", (), {"id": entity_id, "title": f"Guruh {entity_id}", "username": None})()
+
+
+async def startup_sequential(client, group_ids: list) -> float:
+    """Eski usul: har bir guruh uchun ketma-ket get_entity + add_source_group"""
+    import database as db
+
+    start = time.perf_counter()
+    for group_id in group_ids:
+        entity = await client.get_entity(group_id)
+        db.add_source_group(group_id, getattr(entity, 'title', str(group_id)))
+    return time.perf_counter() - start
+
+
+async def startup_resolver(client, group_ids: list) -> float:
+    from entity_cache import EntityResolver
+
+    start = time.perf_counter()
+    await EntityResolver().resolve(client, group_ids)
+    return time.perf_counter() - start
+
+
+def bench_startup(args):
+    import database as db
+
+    group_ids = [-100_000_000 - i for i in range(args.groups)]
+    for group_id in group_ids:
+        db.add_source_group(group_id, None)
+    latency = args.latency_ms / 1000
+
+    print("=" * 60)
+    print(f"STARTUP BENCHMARK: {len(group_ids)} guruh, get_entity {args.latency_ms} ms")
+    print("=" * 60)
+
+    runs = [
+        ("ketma-ket", startup_sequential),
+        ("kesh (bo'sh)", startup_resolver),
+        ("kesh (to'la)", startup_resolver),
+    ]
+    for label, run in runs:
+        client = FakeEntityClient(latency)
+        elapsed = asyncio.run(run(client, group_ids))
+        print(f"{label:>15}: {elapsed:7.2f} s  ({client.calls} so'rov)")
+    print("Xabarlar qabul qilish: darhol (aniqlash fonda ishlaydi)")
+
+
+ORDER_INDEXES = ("idx_orders_created_chat", "idx_orders_user", "idx_orders_chat")
+
+
+def fill_orders(rows: int, days: int = 365):
+    """orders jadvalini sun'iy zakazlar bilan to'ldirish (vaqt bo'yicha tartibda)"""
+    import database as db
+
+    with db.get_connection() as conn:
+        conn.execute("""
+            WITH RECURSIVE seq(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM seq WHERE x < :rows)
+            INSERT INTO orders (user_id, user_name, phone, message_text, chat_id, chat_title, created_at)
+            SELECT x % 50000, 'User ' || (x % 50000), '+99890' || (1000000 + x % 9000000),
+                   CASE x % 3 WHEN 0 THEN 'Toshkent-Samarqand ' WHEN 1 THEN 'Buxorodan Toshkentga '
+                        ELSE 'Chilonzordan Yunusobodga ' END || (x % 4 + 1) || ' kishi',
+                   -1000 - x % 500, 'Guruh ' || (x % 500),
+                   datetime('now', printf('-%d seconds', (:rows - x) * :span / :rows))
+            FROM seq
+        """, {"rows": rows, "span": days * 86400})
+
+
+def time_query(label: str, func, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    print(f"{label:>34}: {best * 1000:9.2f} ms")
+
+
+def order_queries(rows: int):
+    import database as db
+
+    def query(sql, *params):
+        with db.get_connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    time_query("so'nggi zakazlar (keyset)", lambda: db.get_orders_page(limit=10))
+    time_query("o'rtadagi sahifa (keyset)", lambda: db.get_orders_page(before_id=rows // 2, limit=10))
+    time_query("ORDER BY created_at LIMIT 10",
+               lambda: query("SELECT * FROM orders ORDER BY created_at DESC LIMIT 10"))
+    time_query("guruhlar bo'yicha (7 kun)", lambda: db.get_group_order_counts(days=7), repeat=3)
+    time_query("foydalanuvchi zakazlari", lambda: query("SELECT COUNT(*) FROM orders WHERE user_id = ?", 1234))
+    time_query("guruh zakazlari (1 kun)",
+               lambda: query("SELECT COUNT(*) FROM orders WHERE chat_id = ? AND created_at >= datetime('now', '-1 day')", -1042))
+    time_query("qidiruv: Samarqand (FTS5)", lambda: db.search_orders("Samarqand", limit=11))
+    time_query("qidiruv: telefon qismi (FTS5)", lambda: db.search_orders("1234567", limit=11))
+
+
+def bench_orders(args):
+    import database as db
+
+    print("=" * 60)
+    print(f"ORDERS BENCHMARK: {args.rows:,} zakaz ({db.DATABASE_PATH})")
+    print("=" * 60)
+
+    with db.get_connection() as conn:
+        for index in ORDER_INDEXES:
+            conn.execute(f"DROP INDEX IF EXISTS {index}")
+
+    start = time.perf_counter()
+    fill_orders(args.rows)
+    print(f"To'ldirish: {time.perf_counter() - start:.1f} s")
+
+    print("\nIndekssiz:")
+    order_queries(args.rows)
+
+    start = time.perf_counter()
+    db.init_database()
+    db.optimize_database()
+    print(f"\nIndekslar + ANALYZE: {time.perf_counter() - start:.1f} s")
+    order_queries(args.rows)
+
+    start = time.perf_counter()
+    moved = db.archive_old_orders(args.retention_days)
+    print(f"\nArxivlash ({args.retention_days} kundan eski): {moved:,} zakaz, {time.perf_counter() - start:.1f} s, "
+          f"{len(db.get_archive_tables())} ta oylik jadval")
+
+    start = time.perf_counter()
+    db.optimize_database(vacuum=True)
+    size = os.path.getsize(db.DATABASE_PATH) / 1024 ** 2
+    print(f"VACUUM: {time.perf_counter() - start:.1f} s, fayl {size:.0f} MB")
+
+    print("\nArxivlashdan keyin:")
+    order_queries(args.rows)
+
+
+def bench_locations(args):
+    from locations import extract_route, is_complete
+
+    messages = [SAMPLE_MESSAGES[i % len(SAMPLE_MESSAGES)] for i in range(args.messages)]
+
+    print("=" * 60)
+    print(f"LOCATIONS BENCHMARK: {len(messages):,} xabar")
+    print("=" * 60)
+    for text in SAMPLE_MESSAGES:
+        route = extract_route(text)
+        print(f"{text:>40} → {route['from_location']} - {route['to_location']}")
+
+    start = time.perf_counter()
+    complete = sum(1 for text in messages if is_complete(extract_route(text)))
+    elapsed = time.perf_counter() - start
+    print(f"\n{elapsed * 1e6 / len(messages):.1f} µs/xabar, to'liq yo'nalish: {complete * 100 / len(messages):.0f}%")
+
+
+SEMANTIC_WORDS = ["kerak", "bor", "odam", "kishi", "pochta", "ketadi", "olaman", "mashina", "cobalt",
+                  "nexia", "bugun", "ertaga", "ertalab", "kechqurun", "tez", "srochno", "joy", "ayol",
+                  "yuk", "salom", "qancha", "narxi", "ming", "so'm", "aka", "uka", "dom", "bilan"]
+
+
+def calibrate_semantic(path: str):
+    """Belgilangan juftliklar o'xshashligi va tavsiya etilgan chegara"""
+    from config import Config
+    from semantic_cache import SemanticCache, calibrate
+
+    cache = SemanticCache(capacity=1)
+    with open(path, encoding="utf-8") as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+    scores = [(cache.similarity(pair["a"], pair["b"]), pair["same"]) for pair in pairs]
+
+    threshold = Config.SEMANTIC_CACHE_THRESHOLD
+    print(f"\nJuftliklar ({len(pairs)} ta), joriy chegara {threshold}:")
+    for pair, (score, same) in sorted(zip(pairs, scores), key=lambda item: -item[1][0]):
+        mark = "✓" if (score >= threshold) == same else "✗"
+        print(f"  {mark} {score:.3f} {'bir xil ' if same else 'boshqa  '} {pair['a']} | {pair['b']}")
+    print(f"Tavsiya etilgan SEMANTIC_CACHE_THRESHOLD: {calibrate(scores)}")
+
+
+def bench_semantic(args):
+    import random
+    from locations import GAZETTEER
+    from semantic_cache import SemanticCache
+
+    if args.pairs:
+        calibrate_semantic(args.pairs)
+        return
+
+    rng = random.Random(42)
+    places = list(GAZETTEER)
+
+    def random_message():
+        words = rng.sample(SEMANTIC_WORDS, rng.randint(3, 6)) + [f"{rng.randint(1, 4)}ta"]
+        words.insert(0, f"{rng.choice(places)}dan {rng.choice(places)}ga")
+        return " ".join(words)
+
+    cache = SemanticCache(capacity=args.entries)
+    print("=" * 60)
+    print(f"SEMANTIC CACHE BENCHMARK: {args.entries:,} yozuv, dim {cache.dim}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    while len(cache) < args.entries:
+        cache.add(random_message(), {"type": "passenger_order", "confidence": 0.9})
+
+    print(f"To'ldirish: {time.perf_counter() - start:.1f} s, {len(cache):,} ta shablon, "
+          f"matritsa {cache._vectors.nbytes / 1024 ** 2:.0f} MB")
+
+    # Kalit bo'yicha topilmaydigan (matritsa qidiruvi) so'rovlar
+    queries = [random_message() + " zudlik" for _ in range(args.queries)]
+    start = time.perf_counter()
+    encoded = [cache.encode(text) for text in queries]
+    encode_us = (time.perf_counter() - start) * 1e6 / len(queries)
+    cache.hits = cache.misses = 0
+    start = time.perf_counter()
+    for text, enc in zip(queries, encoded):
+        cache.lookup(text, enc)
+    lookup_ms = (time.perf_counter() - start) * 1000 / len(queries)
+    print(f"vektor: {encode_us:.0f} µs, qidiruv (matritsa): {lookup_ms:.2f} ms, "
+          f"hit: {cache.hits * 100 / len(queries):.0f}%")
+
+    print("\nBo'sh keshda bitta yozuv: \"Toshkentdan Samarqandga 2 kishi kerak\"")
+    cache = SemanticCache(capacity=10)
+    cache.add("Toshkentdan Samarqandga 2 kishi kerak", {"type": "passenger_order", "confidence": 0.9})
+    for text in ["Buxorodan Andijonga 3 kishi kerak", "Samarqandga Toshkentdan 2ta odam kerak",
+                 "Тошкентдан Самаркандга 1 киши керак", "Toshkentdan Samarqandga 2 kishi kerakmi",
+                 "Toshkentdan Samarqandga cobalt ketadi"]:
+        value, score = cache.lookup(text)
+        print(f"{text:>40}: {score:.2f} {'hit' if value else 'miss'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Taxi bot benchmark'lari")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("workers", help="Worker process'lar soni bo'yicha throughput")
+    p.add_argument("--messages", type=int, default=2000)
+    p.add_argument("--workers", default="0,1,2,4")
+    p.add_argument("--concurrency", type=int, default=64)
+    p.set_defaults(func=bench_workers)
+
+    p = sub.add_parser("startup", help="Guruhlarni tekshirish (get_entity) vaqti")
+    p.add_argument("--groups", type=int, default=1000)
+    p.add_argument("--latency-ms", type=float, default=30)
+    p.set_defaults(func=bench_startup)
+
+    p = sub.add_parser("orders", help="orders jadvali so'rovlari (indeks, arxivlash)")
+    p.add_argument("--rows", type=int, default=10_000_000)
+    p.add_argument("--retention-days", type=int, default=90)
+    p.set_defaults(func=bench_orders)
+
+    p = sub.add_parser("locations", help="Lokal yo'nalish ajratish tezligi")
+    p.add_argument("--messages", type=int, default=100_000)
+    p.set_defaults(func=bench_locations)
+
+    p = sub.add_parser("semantic", help="AI semantik keshi qidiruv tezligi")
+    p.add_argument("--entries", type=int, default=100_000)
+    p.add_argument("--queries", type=int, default=1000)
+    p.add_argument("--pairs", help="belgilangan juftliklar (JSONL) - chegarani tanlash")
+    p.set_defaults(func=bench_semantic)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -12,6 +12,7 @@ from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 
 from config import Config
+import database as db
 from admin_handlers import router
 from utils import setup_logging
 
@@ -40,6 +41,9 @@ async def main():
         default=DefaultBotProperties(parse_mode=ParseMode.MARKDOWN)
     )
     
+    # Adminlar keshini yuklash
+    db.load_admins_cache()
+    
     # Dispatcher
     dp = Dispatcher(storage=MemoryStorage())
     dp.include_router(router)
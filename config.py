@@ -15,12 +15,95 @@ class Config:
     API_HASH = os.getenv("API_HASH", "")
     PHONE_NUMBER = os.getenv("PHONE_NUMBER", "")
     SESSION_NAME = os.getenv("SESSION_NAME", "taxi_userbot")
+    # Bir nechta akkaunt (vergul bilan): guruhlar ular o'rtasida taqsimlanadi
+    SESSION_NAMES = [x.strip() for x in os.getenv("SESSION_NAMES", "").split(",") if x.strip()] or [SESSION_NAME]
+    # SESSION_NAMES tartibida telefon raqamlar (vergul bilan)
+    PHONE_NUMBERS = [x.strip() for x in os.getenv("PHONE_NUMBERS", "").split(",") if x.strip()] or [PHONE_NUMBER]
     # If true, import all joined groups/channels into monitored source groups on startup
     IMPORT_JOINED_GROUPS = os.getenv("IMPORT_JOINED_GROUPS", "false").lower() in ("1", "true", "yes")
     
     # OpenAI
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # AI natijasi zakaz deb qabul qilinadigan minimal ishonch
+    AI_MIN_CONFIDENCE = float(os.getenv("AI_MIN_CONFIDENCE", 0.7))
+    # Arzon model (1-bosqich, "" - o'chiq): ishonchi AI_ESCALATE_MIN..AI_ESCALATE_MAX
+    # oralig'ida yoki yo'nalishi topilmagan natijalar OPENAI_MODEL'ga yuboriladi
+    OPENAI_FAST_MODEL = os.getenv("OPENAI_FAST_MODEL", "gpt-4.1-nano")
+    AI_ESCALATE_MIN = float(os.getenv("AI_ESCALATE_MIN", 0.5))
+    AI_ESCALATE_MAX = float(os.getenv("AI_ESCALATE_MAX", 0.85))
+    
+    # Worker process'lar soni (0 - hammasi bitta process'da)
+    WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", 0))
+    
+    # Yuborish navbati: bitta xabar uchun maksimal urinishlar soni
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", 10))
+    
+    # Digest: target navbatida shuncha buyurtma bo'lsa yoki FloodWait'dan keyin
+    # DIGEST_COOLDOWN soniya davomida buyurtmalar bitta xabarga birlashtiriladi
+    DIGEST_THRESHOLD = int(os.getenv("DIGEST_THRESHOLD", 5))
+    DIGEST_COOLDOWN = int(os.getenv("DIGEST_COOLDOWN", 60))
+    
+    # Bir foydalanuvchining bir xil (normallashtirilgan) xabari shuncha soniya
+    # ichida qayta kelsa (masalan, boshqa guruhga) - takror sifatida tashlanadi
+    DUPLICATE_WINDOW = int(os.getenv("DUPLICATE_WINDOW", 600))
+    
+    # AI semantik keshi: o'xshash xabarlar (shablon bo'yicha) uchun AI qayta
+    # chaqirilmaydi; hajmi (0 - o'chiq) va kosinus o'xshashlik chegarasi
+    SEMANTIC_CACHE_SIZE = int(os.getenv("SEMANTIC_CACHE_SIZE", 20000))
+    SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.78))
+    
+    # OpenAI kunlik byudjeti (USD, 0 - cheklanmagan): bitta manba guruh va jami.
+    # Tugasa - guruh xabarlari faqat kalit so'zlar va lokal tahlil bilan
+    AI_GROUP_DAILY_BUDGET = float(os.getenv("AI_GROUP_DAILY_BUDGET", 0))
+    AI_DAILY_BUDGET = float(os.getenv("AI_DAILY_BUDGET", 0))
+    
+    # Guruh nomlari keshi: necha soniyadan keyin qayta tekshiriladi,
+    # bir vaqtda nechta get_entity so'rovi, qancha FloodWait kutiladi
+    ENTITY_CACHE_TTL = int(os.getenv("ENTITY_CACHE_TTL", 86400))
+    ENTITY_RESOLVE_CONCURRENCY = int(os.getenv("ENTITY_RESOLVE_CONCURRENCY", 8))
+    ENTITY_FLOOD_MAX_WAIT = int(os.getenv("ENTITY_FLOOD_MAX_WAIT", 60))
+    
+    # Zakazlar tarixi: shuncha kundan eskilari oylik arxivga ko'chiriladi
+    # ("archive") yoki o'chiriladi ("delete"); 0 - hech narsa qilinmaydi
+    ORDERS_RETENTION_DAYS = int(os.getenv("ORDERS_RETENTION_DAYS", 90))
+    ORDERS_RETENTION_MODE = os.getenv("ORDERS_RETENTION_MODE", "archive").lower()
+    
+    # Guruhlar samaradorligi siyosati (o'lik guruhlarni avtomatik cheklash)
+    # Kamida shuncha xabar ko'rilgandan keyin siyosat qo'llaniladi
+    YIELD_MIN_SAMPLES = int(os.getenv("YIELD_MIN_SAMPLES", 200))
+    # Zakaz ulushi shundan past bo'lsa - faqat kalit so'zlar (AI chaqirilmaydi)
+    YIELD_KEYWORD_ONLY_BELOW = float(os.getenv("YIELD_KEYWORD_ONLY_BELOW", 0.01))
+    # Zakaz ulushi shundan past bo'lsa - har N-xabardan faqat bittasi ko'riladi
+    YIELD_THROTTLE_BELOW = float(os.getenv("YIELD_THROTTLE_BELOW", 0.002))
+    YIELD_THROTTLE_EVERY = int(os.getenv("YIELD_THROTTLE_EVERY", 5))
+    # Ulush so'nggi ~shuncha tekshirilgan xabar bo'yicha (oshsa hisoblagichlar yarmiga tushadi)
+    YIELD_WINDOW = int(os.getenv("YIELD_WINDOW", 2000))
+    # Avtomatik cheklangan guruh shuncha soatdan keyin sinov uchun oddiy rejimga qaytadi
+    YIELD_PROBATION_HOURS = float(os.getenv("YIELD_PROBATION_HOURS", 24))
+    
+    # Loglar: daraja, fayl, aylantirish (LOG_ROTATE_WHEN berilsa - vaqt bo'yicha,
+    # masalan "midnight"; aks holda LOG_MAX_BYTES hajm bo'yicha) va eski fayllarni gzip'lash
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+    LOG_FILE = os.getenv("LOG_FILE", "taxi_bot.log")
+    LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 10 * 1024 * 1024))
+    LOG_ROTATE_WHEN = os.getenv("LOG_ROTATE_WHEN", "")
+    LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 10))
+    LOG_COMPRESS = os.getenv("LOG_COMPRESS", "true").lower() in ("1", "true", "yes")
+    # Har bir xabar qarori va yetkazish - NDJSON jurnal ("" - o'chiq); tahlil: python event_log.py
+    EVENT_LOG_FILE = os.getenv("EVENT_LOG_FILE", "events.ndjson")
+    
+    # Xatolar adminlarga yig'ma xabar (digest) bilan: ko'pi bilan ALERT_INTERVAL
+    # soniyada bitta, unda ALERT_MAX_ITEMS xil xato (turi va joyi bo'yicha)
+    ALERT_INTERVAL = int(os.getenv("ALERT_INTERVAL", 300))
+    ALERT_MAX_ITEMS = int(os.getenv("ALERT_MAX_ITEMS", 10))
+    
+    # To'xtatish (SIGTERM): ishlanayotgan xabarlarni tugatish muddati (soniya).
+    # Qayta ishga tushganda checkpoint'dan keyingi xabarlar qayta ishlanadi:
+    # CATCHUP_MAX_AGE soniyadan eski bo'lmagan checkpoint'lar, guruhga ko'pi bilan CATCHUP_LIMIT ta
+    SHUTDOWN_TIMEOUT = int(os.getenv("SHUTDOWN_TIMEOUT", 25))
+    CATCHUP_MAX_AGE = int(os.getenv("CATCHUP_MAX_AGE", 3600))
+    CATCHUP_LIMIT = int(os.getenv("CATCHUP_LIMIT", 100))
     
     # Super Adminlar (birinchi marta setup uchun)
     SUPER_ADMIN_IDS = []
@@ -33,6 +116,15 @@ class Config:
             cls.SUPER_ADMIN_IDS = [int(x.strip()) for x in admins_str.split(",") if x.strip()]
         return cls.SUPER_ADMIN_IDS
     
+    @classmethod
+    def session_phone(cls, session_name: str) -> str:
+        """Akkaunt (session) telefon raqami"""
+        if session_name in cls.SESSION_NAMES:
+            index = cls.SESSION_NAMES.index(session_name)
+            if index < len(cls.PHONE_NUMBERS):
+                return cls.PHONE_NUMBERS[index]
+        return cls.PHONE_NUMBER if session_name == cls.SESSION_NAME else ""
+    
     @classmethod
     def validate_bot(cls):
         """Bot sozlamalarini tekshirish"""
@@ -3,15 +3,19 @@ Telegram Taxi Bot - Database Module
 SQLite database bilan ishlash
 """
 
+import os
 import sqlite3
 import logging
+import time
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 from contextlib import contextmanager
 
+from textnorm import normalize
+
 logger = logging.getLogger("taxi_bot.database")
 
-DATABASE_PATH = "data.db"
+DATABASE_PATH = os.getenv("DATABASE_PATH", "data.db")
 
 
 @contextmanager
@@ -29,6 +33,25 @@ def get_connection():
         conn.close()
 
 
+# orders jadvalidagi tuzilgan ustunlar (utils.extract_order_fields natijasi)
+ORDER_FIELD_COLUMNS = {
+    "order_type": "TEXT",
+    "from_location": "TEXT",
+    "to_location": "TEXT",
+    "travel_time": "TEXT",
+    "passengers": "INTEGER",
+    "price": "INTEGER",
+}
+
+# group_yield siyosat ustunlari (group_yield.GroupYieldTracker)
+GROUP_YIELD_COLUMNS = {
+    "skipped": "INTEGER DEFAULT 0",
+    "recent_seen": "REAL DEFAULT 0",
+    "recent_forwarded": "REAL DEFAULT 0",
+    "mode_since": "REAL DEFAULT 0",
+}
+
+
 def init_database():
     """Database jadvallarini yaratish"""
     
@@ -60,6 +83,26 @@ def init_database():
             )
         """)
         
+        # Guruhlar samaradorligi (yield) hisoblagichlari va rejimi
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS group_yield (
+                group_id INTEGER PRIMARY KEY,
+                seen INTEGER DEFAULT 0,
+                filtered INTEGER DEFAULT 0,
+                ai_calls INTEGER DEFAULT 0,
+                forwarded INTEGER DEFAULT 0,
+                mode TEXT DEFAULT 'normal',
+                mode_manual BOOLEAN DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        # Siyosat uchun: cheklash tufayli ko'rilmaganlar, so'nggi oyna hisoblagichlari, rejim vaqti
+        cursor.execute("PRAGMA table_info(group_yield)")
+        yield_columns = {row["name"] for row in cursor.fetchall()}
+        for column, column_type in GROUP_YIELD_COLUMNS.items():
+            if column not in yield_columns:
+                cursor.execute(f"ALTER TABLE group_yield ADD COLUMN {column} {column_type}")
+        
         # Sozlamalar
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS settings (
@@ -80,6 +123,16 @@ def init_database():
             )
         """)
         
+        # Soatlik statistika (YYYY-MM-DD HH)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS stats_hourly (
+                hour TEXT PRIMARY KEY,
+                processed INTEGER DEFAULT 0,
+                forwarded INTEGER DEFAULT 0,
+                filtered INTEGER DEFAULT 0
+            )
+        """)
+        
         # Foydalanuvchi zakazlari (kunlik limit uchun)
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS user_orders (
@@ -129,12 +182,162 @@ def init_database():
             )
         """)
         
+        # Zakazning tuzilgan ustunlari (AI ajratgan ma'lumotlar, yo'nalishlar tahlili)
+        cursor.execute("PRAGMA table_info(orders)")
+        order_columns = {row["name"] for row in cursor.fetchall()}
+        for column, column_type in ORDER_FIELD_COLUMNS.items():
+            if column not in order_columns:
+                cursor.execute(f"ALTER TABLE orders ADD COLUMN {column} {column_type}")
+        
+        # Zakazlar indekslari (so'nggi zakazlar, guruh/foydalanuvchi statistikasi)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_created_chat ON orders (created_at, chat_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_user ON orders (user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_chat ON orders (chat_id, created_at)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_orders_route ON orders (from_location, to_location, created_at)")
+        
+        # Zakazlar bo'yicha to'liq matnli qidiruv (FTS5, trigram - so'z ichidan ham
+        # qidiradi: "Samarqand" -> "Samarqanddan", telefon raqam qismi)
+        try:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'orders_fts'")
+            fts_exists = cursor.fetchone() is not None
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS orders_fts USING fts5(
+                    message_text, user_name, phone,
+                    content='orders', content_rowid='id', tokenize='trigram'
+                )
+            """)
+            cursor.executescript("""
+                CREATE TRIGGER IF NOT EXISTS orders_fts_insert AFTER INSERT ON orders BEGIN
+                    INSERT INTO orders_fts (rowid, message_text, user_name, phone)
+                    VALUES (new.id, new.message_text, new.user_name, new.phone);
+                END;
+                CREATE TRIGGER IF NOT EXISTS orders_fts_delete AFTER DELETE ON orders BEGIN
+                    INSERT INTO orders_fts (orders_fts, rowid, message_text, user_name, phone)
+                    VALUES ('delete', old.id, old.message_text, old.user_name, old.phone);
+                END;
+                CREATE TRIGGER IF NOT EXISTS orders_fts_update AFTER UPDATE OF message_text, user_name, phone ON orders BEGIN
+                    INSERT INTO orders_fts (orders_fts, rowid, message_text, user_name, phone)
+                    VALUES ('delete', old.id, old.message_text, old.user_name, old.phone);
+                    INSERT INTO orders_fts (rowid, message_text, user_name, phone)
+                    VALUES (new.id, new.message_text, new.user_name, new.phone);
+                END;
+            """)
+            if not fts_exists:
+                # Mavjud zakazlarni indekslash (bir marta)
+                cursor.execute("INSERT INTO orders_fts (orders_fts) VALUES ('rebuild')")
+        except sqlite3.OperationalError as e:
+            logger.warning(f"⚠️ FTS5 qidiruv mavjud emas: {e}")
+        
+        # Buyurtmalar yuboriladigan guruhlar (priority - yuqorisi birinchi,
+        # rate_limit - daqiqada maksimal xabar, 0 - cheksiz)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS target_groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER UNIQUE NOT NULL,
+                priority INTEGER DEFAULT 0,
+                rate_limit INTEGER DEFAULT 0,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Qo'shimcha kuzatilayotgan guruhlar
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS monitored_groups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                group_id INTEGER UNIQUE NOT NULL,
+                added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        # Telegram entity keshi (guruh nomlari) - ishga tushishda get_entity'ni kamaytirish
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS entity_cache (
+                entity_id INTEGER PRIMARY KEY,
+                title TEXT,
+                username TEXT,
+                resolved_at REAL DEFAULT 0,
+                error TEXT
+            )
+        """)
+        
+        # Yuborish navbati (outbox) - har bir (zakaz, target guruh) juftligi
+        # source_key - manba xabar kaliti ("chat_id:message_id"), qayta yuborilmaslik uchun
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                order_id INTEGER,
+                source_key TEXT NOT NULL,
+                target_id INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                status TEXT DEFAULT 'pending',
+                attempts INTEGER DEFAULT 0,
+                next_attempt_at REAL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL,
+                UNIQUE(source_key, target_id)
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_outbox_due
+            ON outbox (status, next_attempt_at)
+        """)
+        
+        # OpenAI sarfi: kun, manba guruh va model bo'yicha (cached - keshdan javoblar)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS ai_usage (
+                day TEXT NOT NULL,
+                group_id INTEGER NOT NULL,
+                model TEXT NOT NULL,
+                calls INTEGER DEFAULT 0,
+                cached INTEGER DEFAULT 0,
+                prompt_tokens INTEGER DEFAULT 0,
+                completion_tokens INTEGER DEFAULT 0,
+                cost REAL DEFAULT 0,
+                latency_ms REAL DEFAULT 0,
+                PRIMARY KEY (day, group_id, model)
+            )
+        """)
+        cursor.execute("PRAGMA table_info(ai_usage)")
+        if "latency_ms" not in {row["name"] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE ai_usage ADD COLUMN latency_ms REAL DEFAULT 0")
+        
+        # Har bir guruhda oxirgi qayta ishlangan xabar (qayta ishga tushganda davom ettirish)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS chat_checkpoints (
+                chat_id INTEGER PRIMARY KEY,
+                message_id INTEGER NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        
         conn.commit()
         logger.info("✅ Database yaratildi yoki mavjud")
+    
+    migrate_group_settings()
 
 
 # ============== ADMIN FUNCTIONS ==============
 
+# Adminlar keshi - har bir tekshiruvda DB ga ulanmaslik uchun (O(1))
+_admin_ids: Optional[set] = None
+_super_admin_ids: Optional[set] = None
+
+
+def load_admins_cache():
+    """Adminlar keshini DB dan yuklash (ishga tushishda)"""
+    global _admin_ids, _super_admin_ids
+    
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT user_id, is_super_admin FROM admins")
+        rows = cursor.fetchall()
+    
+    _admin_ids = {row['user_id'] for row in rows}
+    _super_admin_ids = {row['user_id'] for row in rows if row['is_super_admin']}
+    logger.debug("Adminlar keshi yuklandi: %d ta", len(_admin_ids))
+
+
 def add_admin(user_id: int, username: str = None, full_name: str = None, is_super: bool = False) -> bool:
     """Admin qo'shish"""
     try:
@@ -144,7 +347,14 @@ def add_admin(user_id: int, username: str = None, full_name: str = None, is_supe
                 INSERT OR REPLACE INTO admins (user_id, username, full_name, is_super_admin)
                 VALUES (?, ?, ?, ?)
             """, (user_id, username, full_name, is_super))
-            return True
+        
+        if _admin_ids is not None:
+            _admin_ids.add(user_id)
+            if is_super:
+                _super_admin_ids.add(user_id)
+            else:
+                _super_admin_ids.discard(user_id)
+        return True
     except Exception as e:
         logger.error(f"Admin qo'shishda xato: {e}")
         return False
@@ -156,26 +366,28 @@ def remove_admin(user_id: int) -> bool:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM admins WHERE user_id = ? AND is_super_admin = 0", (user_id,))
-            return cursor.rowcount > 0
+            removed = cursor.rowcount > 0
+        
+        if removed and _admin_ids is not None:
+            _admin_ids.discard(user_id)
+        return removed
     except Exception as e:
         logger.error(f"Admin o'chirishda xato: {e}")
         return False
 
 
 def is_admin(user_id: int) -> bool:
-    """Foydalanuvchi adminmi tekshirish"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM admins WHERE user_id = ?", (user_id,))
-        return cursor.fetchone() is not None
+    """Foydalanuvchi adminmi tekshirish (keshdan)"""
+    if _admin_ids is None:
+        load_admins_cache()
+    return user_id in _admin_ids
 
 
 def is_super_admin(user_id: int) -> bool:
-    """Super adminmi tekshirish"""
-    with get_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT 1 FROM admins WHERE user_id = ? AND is_super_admin = 1", (user_id,))
-        return cursor.fetchone() is not None
+    """Super adminmi tekshirish (keshdan)"""
+    if _super_admin_ids is None:
+        load_admins_cache()
+    return user_id in _super_admin_ids
 
 
 def get_all_admins() -> List[Dict]:
@@ -197,19 +409,56 @@ def add_source_group(group_id: int, title: str = None, username: str = None, add
                 INSERT OR REPLACE INTO source_groups (group_id, title, username, added_by, is_active)
                 VALUES (?, ?, ?, ?, 1)
             """, (group_id, title, username, added_by))
-            return True
+        _invalidate_source_groups_count()
+        return True
     except Exception as e:
         logger.error(f"Guruh qo'shishda xato: {e}")
         return False
 
 
+def import_source_groups(rows: List[tuple]) -> int:
+    """Guruhlarni ommaviy qo'shish (bitta tranzaksiyada)
+    
+    Mavjud guruhlarning faqat nomi yangilanadi - is_active va added_by saqlanadi.
+    
+    Args:
+        rows: [(group_id, title, username), ...]
+    
+    Returns:
+        Yangi qo'shilgan guruhlar soni
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            before = conn.total_changes
+            cursor.executemany("""
+                INSERT OR IGNORE INTO source_groups (group_id, title, username, added_by, is_active)
+                VALUES (?, ?, ?, 0, 1)
+            """, rows)
+            inserted = conn.total_changes - before
+            cursor.executemany("""
+                UPDATE source_groups SET
+                    title = ?,
+                    username = COALESCE(?, username)
+                WHERE group_id = ? AND (title IS NOT ? OR username IS NOT COALESCE(?, username))
+            """, [(title, username, group_id, title, username) for group_id, title, username in rows])
+        if inserted:
+            _invalidate_source_groups_count()
+        return inserted
+    except Exception as e:
+        logger.error(f"Guruhlarni import qilishda xato: {e}")
+        return 0
+
+
 def remove_source_group(group_id: int) -> bool:
     """Guruhni o'chirish"""
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM source_groups WHERE group_id = ?", (group_id,))
-            return cursor.rowcount > 0
+            removed = cursor.rowcount > 0
+        _invalidate_source_groups_count()
+        return removed
     except Exception as e:
         logger.error(f"Guruh o'chirishda xato: {e}")
         return False
@@ -223,7 +472,9 @@ def toggle_source_group(group_id: int) -> bool:
             cursor.execute("""
                 UPDATE source_groups SET is_active = NOT is_active WHERE group_id = ?
             """, (group_id,))
-            return cursor.rowcount > 0
+            toggled = cursor.rowcount > 0
+        _invalidate_source_groups_count()
+        return toggled
     except Exception as e:
         logger.error(f"Guruh toggle qilishda xato: {e}")
         return False
@@ -240,12 +491,208 @@ def get_source_groups(active_only: bool = False) -> List[Dict]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_source_groups_page(after: tuple = None, before: tuple = None,
+                           inclusive: bool = False, limit: int = 10) -> List[Dict]:
+    """Guruhlarni sahifalab olish (keyset pagination)
+    
+    Tartib: avval faollar, keyin o'chirilganlar; har birida `id` bo'yicha.
+    Kursor - `(is_active, id)` juftligi.
+    
+    Args:
+        after: shu kursordan keyingi guruhlar (inclusive=True bo'lsa, kursor ham)
+        before: shu kursordan oldingi guruhlar
+        limit: sahifadagi guruhlar soni
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if before is not None:
+            is_active, group_row_id = before
+            cursor.execute("""
+                SELECT * FROM source_groups
+                WHERE is_active > ? OR (is_active = ? AND id < ?)
+                ORDER BY is_active ASC, id DESC
+                LIMIT ?
+            """, (is_active, is_active, group_row_id, limit))
+            rows = cursor.fetchall()[::-1]
+        elif after is not None:
+            is_active, group_row_id = after
+            op = ">=" if inclusive else ">"
+            cursor.execute(f"""
+                SELECT * FROM source_groups
+                WHERE is_active < ? OR (is_active = ? AND id {op} ?)
+                ORDER BY is_active DESC, id ASC
+                LIMIT ?
+            """, (is_active, is_active, group_row_id, limit))
+            rows = cursor.fetchall()
+        else:
+            cursor.execute("""
+                SELECT * FROM source_groups
+                ORDER BY is_active DESC, id ASC
+                LIMIT ?
+            """, (limit,))
+            rows = cursor.fetchall()
+        return [dict(row) for row in rows]
+
+
+def has_source_groups_after(after: tuple) -> bool:
+    """Kursordan keyin guruh bormi"""
+    return bool(get_source_groups_page(after=after, limit=1))
+
+
+def has_source_groups_before(before: tuple) -> bool:
+    """Kursordan oldin guruh bormi"""
+    return bool(get_source_groups_page(before=before, limit=1))
+
+
+# Guruhlar soni keshi: (jami, faol), vaqt
+_source_groups_count = None
+_source_groups_count_at = 0.0
+SOURCE_GROUPS_COUNT_TTL = 60  # soniya (boshqa process yozgan bo'lsa ham yangilanadi)
+
+
+def _invalidate_source_groups_count():
+    """Guruhlar soni keshini tozalash"""
+    global _source_groups_count
+    _source_groups_count = None
+
+
+def count_source_groups() -> Dict:
+    """Guruhlar soni (keshlangan): {"total": ..., "active": ...}"""
+    global _source_groups_count, _source_groups_count_at
+    
+    now = time.monotonic()
+    if _source_groups_count is None or now - _source_groups_count_at > SOURCE_GROUPS_COUNT_TTL:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT COUNT(*) AS total, COALESCE(SUM(is_active), 0) AS active
+                FROM source_groups
+            """)
+            row = cursor.fetchone()
+            _source_groups_count = {"total": row['total'], "active": row['active']}
+            _source_groups_count_at = now
+    
+    return dict(_source_groups_count)
+
+
 def get_active_group_ids() -> List[int]:
     """Faol guruh ID'larini olish"""
     groups = get_source_groups(active_only=True)
     return [g['group_id'] for g in groups]
 
 
+# ============== GROUP YIELD FUNCTIONS ==============
+
+def add_group_yield(rows: List[tuple], window: int = 2000) -> bool:
+    """Guruhlar hisoblagichlarini qo'shish (bitta tranzaksiyada)
+    
+    Args:
+        rows: [(group_id, seen, filtered, ai_calls, forwarded, skipped), ...]
+        window: recent_seen shundan oshsa - recent_* yarmiga tushadi (eski xabarlar ta'siri so'nadi)
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO group_yield (group_id, seen, filtered, ai_calls, forwarded, skipped,
+                                         recent_seen, recent_forwarded)
+                VALUES (?1, ?2, ?3, ?4, ?5, ?6, ?2, ?5)
+                ON CONFLICT(group_id) DO UPDATE SET
+                    seen = seen + excluded.seen,
+                    filtered = filtered + excluded.filtered,
+                    ai_calls = ai_calls + excluded.ai_calls,
+                    forwarded = forwarded + excluded.forwarded,
+                    skipped = skipped + excluded.skipped,
+                    recent_seen = (recent_seen + excluded.seen)
+                        / (CASE WHEN recent_seen + excluded.seen > ?7 THEN 2 ELSE 1 END),
+                    recent_forwarded = (recent_forwarded + excluded.forwarded)
+                        / (CASE WHEN recent_seen + excluded.seen > ?7 THEN 2 ELSE 1 END),
+                    updated_at = CURRENT_TIMESTAMP
+            """, [(*row, window) for row in rows])
+            return True
+    except Exception as e:
+        logger.error(f"Guruh hisoblagichlarini saqlashda xato: {e}")
+        return False
+
+
+def get_group_yield(group_id: int = None) -> List[Dict]:
+    """Guruhlar hisoblagichlari va rejimlari"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if group_id is not None:
+            cursor.execute("SELECT * FROM group_yield WHERE group_id = ?", (group_id,))
+        else:
+            cursor.execute("SELECT * FROM group_yield")
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_group_yield_ranking(limit: int = 10, offset: int = 0) -> List[Dict]:
+    """Guruhlar reytingi - so'nggi oynadagi zakaz ulushi (recent_forwarded/recent_seen) bo'yicha"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT y.*, g.title,
+                   y.recent_forwarded / MAX(y.recent_seen, 1) AS yield
+            FROM group_yield y
+            LEFT JOIN source_groups g ON g.group_id = y.group_id
+            ORDER BY yield DESC, y.forwarded DESC, y.seen DESC
+            LIMIT ? OFFSET ?
+        """, (limit, offset))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def count_group_yield() -> int:
+    """Hisoblagichi bor guruhlar soni"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM group_yield")
+        return cursor.fetchone()[0]
+
+
+def set_group_mode(group_id: int, mode: str, manual: bool = False, probation: bool = False) -> bool:
+    """Guruh rejimini o'rnatish (normal / keyword_only / throttled)
+    
+    Args:
+        probation: sinov - so'nggi oyna hisoblagichlari nolga tushadi (ulush qaytadan o'lchanadi)
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT INTO group_yield (group_id, mode, mode_manual, mode_since)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(group_id) DO UPDATE SET
+                    mode = excluded.mode,
+                    mode_manual = excluded.mode_manual,
+                    mode_since = excluded.mode_since,
+                    recent_seen = CASE WHEN ? THEN 0 ELSE recent_seen END,
+                    recent_forwarded = CASE WHEN ? THEN 0 ELSE recent_forwarded END,
+                    updated_at = CURRENT_TIMESTAMP
+            """, (group_id, mode, manual, time.time(), probation, probation))
+            return True
+    except Exception as e:
+        logger.error(f"Guruh rejimini o'rnatishda xato: {e}")
+        return False
+
+
+def reset_group_yield(group_id: int) -> bool:
+    """Guruh hisoblagichlarini nolga tushirish va avtomatik rejimga qaytarish"""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE group_yield SET
+                    seen = 0, filtered = 0, ai_calls = 0, forwarded = 0, skipped = 0,
+                    recent_seen = 0, recent_forwarded = 0, mode_since = 0,
+                    mode = 'normal', mode_manual = 0, updated_at = CURRENT_TIMESTAMP
+                WHERE group_id = ?
+            """, (group_id,))
+            return cursor.rowcount > 0
+    except Exception as e:
+        logger.error(f"Guruh hisoblagichlarini tozalashda xato: {e}")
+        return False
+
+
 # ============== SETTINGS FUNCTIONS ==============
 
 def set_setting(key: str, value: str) -> bool:
@@ -272,42 +719,132 @@ def get_setting(key: str, default: str = None) -> Optional[str]:
         return row['value'] if row else default
 
 
-def get_target_groups() -> List[int]:
-    """Target guruhlarni olish (bir nechta)"""
-    value = get_setting("target_groups")
-    if value:
+# Target va qo'shimcha guruhlar, kalit so'zlar ro'yxati keshi. Yozishda tozalanadi;
+# TTL - boshqa process'lardagi (worker, admin bot) o'zgarishlar uchun
+GROUP_LISTS_TTL = 30
+_group_lists_cache: Dict[str, tuple] = {}  # nom -> (vaqt, qiymat)
+
+
+def _cached_group_list(name: str, loader):
+    cached = _group_lists_cache.get(name)
+    if cached and time.monotonic() - cached[0] < GROUP_LISTS_TTL:
+        return cached[1]
+    value = loader()
+    _group_lists_cache[name] = (time.monotonic(), value)
+    return value
+
+
+def _invalidate_group_lists():
+    _group_lists_cache.clear()
+
+
+def _parse_group_ids(value: Optional[str]) -> List[int]:
+    """Vergul bilan ajratilgan ID'lar (eski sozlamalar formati)"""
+    ids = []
+    for x in (value or "").split(","):
         try:
-            return [int(x.strip()) for x in value.split(",") if x.strip()]
-        except:
-            return []
-    
-    # Eski sozlamani tekshirish (migratsiya uchun)
-    old_value = get_setting("target_group")
-    if old_value:
-        # Yangi formatga o'tkazish
-        set_setting("target_groups", old_value)
-        set_setting("target_group", "") # Eskisini o'chirish
-        return [int(old_value)]
+            ids.append(int(x.strip()))
+        except ValueError:
+            continue
+    return ids
+
+
+def migrate_group_settings():
+    """Bir martalik migratsiya: settings'dagi vergulli ro'yxatlar -> jadvallar"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT key, value FROM settings
+            WHERE key IN ('target_groups', 'target_group', 'monitored_groups') AND value != ''
+        """)
+        values = {row["key"]: row["value"] for row in cursor.fetchall()}
+        if not values:
+            return
+        
+        targets = _parse_group_ids(values.get("target_groups")) or _parse_group_ids(values.get("target_group"))
+        monitored = _parse_group_ids(values.get("monitored_groups"))
         
-    return []
+        cursor.executemany(
+            "INSERT OR IGNORE INTO target_groups (group_id) VALUES (?)",
+            [(group_id,) for group_id in targets]
+        )
+        cursor.executemany(
+            "INSERT OR IGNORE INTO monitored_groups (group_id) VALUES (?)",
+            [(group_id,) for group_id in monitored]
+        )
+        cursor.execute("""
+            DELETE FROM settings WHERE key IN ('target_groups', 'target_group', 'monitored_groups')
+        """)
+        logger.info(f"✅ Guruhlar ro'yxati ko'chirildi: {len(targets)} target, {len(monitored)} qo'shimcha")
+
+
+def get_target_groups() -> List[int]:
+    """Target guruhlarni olish (ustuvorlik bo'yicha tartiblangan)"""
+    return [row["group_id"] for row in get_target_groups_info()]
 
 
-def add_target_group(group_id: int) -> bool:
+def get_target_groups_info() -> List[Dict]:
+    """Target guruhlar sozlamalari bilan: priority, rate_limit (daqiqada, 0 - cheksiz), title"""
+    def load():
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT t.group_id, t.priority, t.rate_limit, t.added_at, e.title
+                FROM target_groups t
+                LEFT JOIN entity_cache e ON e.entity_id = t.group_id
+                ORDER BY t.priority DESC, t.id
+            """)
+            return [dict(row) for row in cursor.fetchall()]
+    return _cached_group_list("target_groups", load)
+
+
+def add_target_group(group_id: int, priority: int = 0, rate_limit: int = 0) -> bool:
     """Target guruh qo'shish"""
-    groups = get_target_groups()
-    if group_id not in groups:
-        groups.append(group_id)
-        return set_setting("target_groups", ",".join(map(str, groups)))
-    return True
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                INSERT OR IGNORE INTO target_groups (group_id, priority, rate_limit)
+                VALUES (?, ?, ?)
+            """, (group_id, priority, rate_limit))
+        _invalidate_group_lists()
+        return True
+    except Exception as e:
+        logger.error(f"Target guruh qo'shishda xato: {e}")
+        return False
+
+
+def update_target_group(group_id: int, priority: int = None, rate_limit: int = None) -> bool:
+    """Target guruh sozlamalarini o'zgartirish"""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE target_groups SET
+                    priority = COALESCE(?, priority),
+                    rate_limit = COALESCE(?, rate_limit)
+                WHERE group_id = ?
+            """, (priority, rate_limit, group_id))
+            updated = cursor.rowcount > 0
+        _invalidate_group_lists()
+        return updated
+    except Exception as e:
+        logger.error(f"Target guruhni o'zgartirishda xato: {e}")
+        return False
 
 
 def remove_target_group(group_id: int) -> bool:
     """Target guruhni olib tashlash"""
-    groups = get_target_groups()
-    if group_id in groups:
-        groups.remove(group_id)
-        return set_setting("target_groups", ",".join(map(str, groups)))
-    return False
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM target_groups WHERE group_id = ?", (group_id,))
+            removed = cursor.rowcount > 0
+        _invalidate_group_lists()
+        return removed
+    except Exception as e:
+        logger.error(f"Target guruhni o'chirishda xato: {e}")
+        return False
 
 
 # Eskilik (kodni buzmaslik uchun alias), lekin list'ning birinchisini qaytaradi
@@ -321,41 +858,50 @@ def get_target_group() -> Optional[int]:
 
 def get_monitored_groups() -> List[int]:
     """Qo'shimcha kuzatilayotgan guruhlarni olish"""
-    value = get_setting("monitored_groups")
-    if value:
-        try:
-            return [int(x.strip()) for x in value.split(",") if x.strip()]
-        except:
-            return []
-    return []
+    def load():
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT group_id FROM monitored_groups ORDER BY id")
+            return [row["group_id"] for row in cursor.fetchall()]
+    return _cached_group_list("monitored_groups", load)
 
 
 def add_monitored_group(group_id: int) -> bool:
     """Qo'shimcha kuzatilayotgan guruh qo'shish"""
-    groups = get_monitored_groups()
-    if group_id not in groups:
-        groups.append(group_id)
-        return set_setting("monitored_groups", ",".join(map(str, groups)))
-    return True
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT OR IGNORE INTO monitored_groups (group_id) VALUES (?)", (group_id,))
+        _invalidate_group_lists()
+        return True
+    except Exception as e:
+        logger.error(f"Guruh qo'shishda xato: {e}")
+        return False
 
 
 def remove_monitored_group(group_id: int) -> bool:
     """Qo'shimcha kuzatilayotgan guruhni olib tashlash"""
-    groups = get_monitored_groups()
-    if group_id in groups:
-        groups.remove(group_id)
-        return set_setting("monitored_groups", ",".join(map(str, groups)))
-    return False
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM monitored_groups WHERE group_id = ?", (group_id,))
+            removed = cursor.rowcount > 0
+        _invalidate_group_lists()
+        return removed
+    except Exception as e:
+        logger.error(f"Guruhni o'chirishda xato: {e}")
+        return False
 
 
 # ============== STATS FUNCTIONS ==============
 
 def update_stats(processed: int = 0, forwarded: int = 0, filtered: int = 0):
-    """Statistikani yangilash"""
+    """Statistikani yangilash (kunlik va soatlik)"""
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            today = datetime.now().strftime("%Y-%m-%d")
+            now = datetime.now()
+            today = now.strftime("%Y-%m-%d")
             
             # Bugungi yozuv bormi tekshirish
             cursor.execute("SELECT id FROM stats WHERE date = ?", (today,))
@@ -374,6 +920,15 @@ def update_stats(processed: int = 0, forwarded: int = 0, filtered: int = 0):
                     INSERT INTO stats (date, processed, forwarded, filtered)
                     VALUES (?, ?, ?, ?)
                 """, (today, processed, forwarded, filtered))
+            
+            cursor.execute("""
+                INSERT INTO stats_hourly (hour, processed, forwarded, filtered)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(hour) DO UPDATE SET
+                    processed = processed + excluded.processed,
+                    forwarded = forwarded + excluded.forwarded,
+                    filtered = filtered + excluded.filtered
+            """, (now.strftime("%Y-%m-%d %H"), processed, forwarded, filtered))
     except Exception as e:
         logger.error(f"Statistika yangilashda xato: {e}")
 
@@ -405,6 +960,253 @@ def get_total_stats() -> Dict:
         return dict(row) if row else {"processed": 0, "forwarded": 0, "filtered": 0}
 
 
+def get_dashboard_stats() -> Dict:
+    """Statistika ekrani uchun barcha raqamlar - bitta so'rovda"""
+    today = datetime.now().strftime("%Y-%m-%d")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                COALESCE((SELECT processed FROM stats WHERE date = :today), 0) AS today_processed,
+                COALESCE((SELECT forwarded FROM stats WHERE date = :today), 0) AS today_forwarded,
+                COALESCE((SELECT filtered FROM stats WHERE date = :today), 0) AS today_filtered,
+                COALESCE(SUM(processed), 0) AS total_processed,
+                COALESCE(SUM(forwarded), 0) AS total_forwarded,
+                COALESCE(SUM(filtered), 0) AS total_filtered,
+                (SELECT COUNT(*) FROM source_groups) AS groups_total,
+                (SELECT COUNT(*) FROM source_groups WHERE is_active = 1) AS groups_active,
+                (SELECT COUNT(*) FROM target_groups) AS target_groups,
+                (SELECT COUNT(*) FROM monitored_groups) AS monitored_groups
+            FROM stats
+        """, {"today": today})
+        return dict(cursor.fetchone())
+
+
+def get_hourly_stats(date: str = None) -> List[Dict]:
+    """Soatlik statistika (faqat faollik bo'lgan soatlar)
+    
+    Args:
+        date: "YYYY-MM-DD" (default - bugun)
+    """
+    date = date or datetime.now().strftime("%Y-%m-%d")
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT substr(hour, 12, 2) AS hour, processed, forwarded, filtered
+            FROM stats_hourly
+            WHERE hour >= ? AND hour < ?
+            ORDER BY hour
+        """, (f"{date} 00", f"{date} 24"))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_group_order_counts(days: int = 7, limit: int = 10) -> List[Dict]:
+    """Guruhlar bo'yicha zakazlar soni (qaysi guruhlar zakaz beradi)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT o.chat_id,
+                   COALESCE(g.title, MAX(o.chat_title)) AS title,
+                   COUNT(*) AS orders
+            FROM orders o
+            LEFT JOIN source_groups g ON g.group_id = o.chat_id
+            WHERE o.created_at >= datetime('now', ?)
+            GROUP BY o.chat_id
+            ORDER BY orders DESC
+            LIMIT ?
+        """, (f"-{int(days)} days", limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+# ============== AI USAGE FUNCTIONS ==============
+
+def add_ai_usage(rows: List[tuple]) -> bool:
+    """OpenAI sarfini qo'shish (bitta tranzaksiyada)
+    
+    Args:
+        rows: [(day, group_id, model, calls, cached, prompt_tokens, completion_tokens, cost, latency_ms), ...]
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO ai_usage (day, group_id, model, calls, cached,
+                                      prompt_tokens, completion_tokens, cost, latency_ms)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(day, group_id, model) DO UPDATE SET
+                    calls = calls + excluded.calls,
+                    cached = cached + excluded.cached,
+                    prompt_tokens = prompt_tokens + excluded.prompt_tokens,
+                    completion_tokens = completion_tokens + excluded.completion_tokens,
+                    cost = cost + excluded.cost,
+                    latency_ms = latency_ms + excluded.latency_ms
+            """, rows)
+            return True
+    except Exception as e:
+        logger.error(f"AI sarfini saqlashda xato: {e}")
+        return False
+
+
+def save_checkpoints(rows: List[tuple]) -> bool:
+    """Guruhlardagi oxirgi qayta ishlangan xabar ID'lari (faqat oshadi)
+    
+    Args:
+        rows: [(chat_id, message_id), ...]
+    """
+    try:
+        now = time.time()
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO chat_checkpoints (chat_id, message_id, updated_at)
+                VALUES (?, ?, ?)
+                ON CONFLICT(chat_id) DO UPDATE SET
+                    message_id = MAX(message_id, excluded.message_id),
+                    updated_at = excluded.updated_at
+            """, [(chat_id, message_id, now) for chat_id, message_id in rows])
+            return True
+    except Exception as e:
+        logger.error(f"Checkpoint'larni saqlashda xato: {e}")
+        return False
+
+
+def get_checkpoints() -> Dict[int, tuple]:
+    """{chat_id: (message_id, updated_at)}"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT chat_id, message_id, updated_at FROM chat_checkpoints")
+        return {row["chat_id"]: (row["message_id"], row["updated_at"]) for row in cursor.fetchall()}
+
+
+def get_ai_spent(day: str) -> Dict[int, float]:
+    """Kun bo'yicha guruhlar sarfi (USD): {group_id: cost}"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT group_id, SUM(cost) AS cost FROM ai_usage
+            WHERE day = ? GROUP BY group_id
+        """, (day,))
+        return {row['group_id']: row['cost'] for row in cursor.fetchall()}
+
+
+def get_ai_usage_daily(days: int = 7) -> List[Dict]:
+    """So'nggi kunlar bo'yicha jami sarf (yangilari birinchi)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT day, SUM(calls) AS calls, SUM(cached) AS cached,
+                   SUM(prompt_tokens) AS prompt_tokens,
+                   SUM(completion_tokens) AS completion_tokens,
+                   SUM(cost) AS cost
+            FROM ai_usage
+            WHERE day >= date('now', 'localtime', ?)
+            GROUP BY day
+            ORDER BY day DESC
+        """, (f"-{int(days) - 1} days",))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_ai_usage_by_model(days: int = 1) -> List[Dict]:
+    """Modellar bo'yicha sarf va o'rtacha kechikish"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT model, SUM(calls) AS calls,
+                   SUM(prompt_tokens + completion_tokens) AS tokens,
+                   SUM(cost) AS cost,
+                   SUM(latency_ms) / MAX(SUM(calls), 1) AS avg_latency_ms
+            FROM ai_usage
+            WHERE day >= date('now', 'localtime', ?)
+            GROUP BY model
+            HAVING SUM(calls) > 0
+            ORDER BY cost DESC
+        """, (f"-{int(days) - 1} days",))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_ai_usage_by_group(days: int = 1, limit: int = 10) -> List[Dict]:
+    """Eng ko'p sarf qilgan manba guruhlar"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT u.group_id, COALESCE(g.title, e.title) AS title,
+                   SUM(u.calls) AS calls, SUM(u.cached) AS cached,
+                   SUM(u.prompt_tokens + u.completion_tokens) AS tokens,
+                   SUM(u.cost) AS cost
+            FROM ai_usage u
+            LEFT JOIN source_groups g ON g.group_id = u.group_id
+            LEFT JOIN entity_cache e ON e.entity_id = u.group_id
+            WHERE u.day >= date('now', 'localtime', ?)
+            GROUP BY u.group_id
+            ORDER BY cost DESC
+            LIMIT ?
+        """, (f"-{int(days) - 1} days", limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+# ============== ROUTE ANALYTICS FUNCTIONS ==============
+
+def get_top_routes(days: int = 7, limit: int = 10) -> List[Dict]:
+    """Eng ko'p zakaz berilgan yo'nalishlar: soni, o'rtacha yo'lovchi, narx oralig'i"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT from_location, to_location,
+                   COUNT(*) AS orders,
+                   ROUND(AVG(passengers), 1) AS avg_passengers,
+                   MIN(price) AS min_price,
+                   CAST(AVG(price) AS INTEGER) AS avg_price,
+                   MAX(price) AS max_price
+            FROM orders
+            WHERE created_at >= datetime('now', ?)
+              AND from_location IS NOT NULL AND to_location IS NOT NULL
+            GROUP BY from_location, to_location
+            ORDER BY orders DESC
+            LIMIT ?
+        """, (f"-{int(days)} days", limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_route_heatmap(days: int = 7, limit: int = 8) -> List[Dict]:
+    """Top yo'nalishlar bo'yicha soatlik zakazlar (mahalliy vaqt)
+    
+    Returns:
+        [{"from_location", "to_location", "orders", "hours": [24 ta son]}, ...]
+    """
+    cutoff = f"-{int(days)} days"
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            WITH top AS (
+                SELECT from_location, to_location, COUNT(*) AS orders
+                FROM orders
+                WHERE created_at >= datetime('now', ?)
+                  AND from_location IS NOT NULL AND to_location IS NOT NULL
+                GROUP BY from_location, to_location
+                ORDER BY orders DESC
+                LIMIT ?
+            )
+            SELECT t.from_location, t.to_location, t.orders,
+                   CAST(strftime('%H', o.created_at, 'localtime') AS INTEGER) AS hour,
+                   COUNT(*) AS count
+            FROM top t
+            JOIN orders o ON o.from_location = t.from_location AND o.to_location = t.to_location
+            WHERE o.created_at >= datetime('now', ?)
+            GROUP BY t.from_location, t.to_location, hour
+            ORDER BY t.orders DESC, t.from_location, t.to_location
+        """, (cutoff, limit, cutoff))
+        
+        routes = {}
+        for row in cursor.fetchall():
+            key = (row["from_location"], row["to_location"])
+            route = routes.setdefault(key, {
+                "from_location": key[0], "to_location": key[1],
+                "orders": row["orders"], "hours": [0] * 24,
+            })
+            route["hours"][row["hour"]] = row["count"]
+        return list(routes.values())
+
+
 # ============== USER ORDER LIMIT FUNCTIONS ==============
 
 MAX_ORDERS_PER_DAY = 999999  # Kunlik maksimal zakaz soni (cheklanmagan)
@@ -522,8 +1324,9 @@ def add_keyword(word: str, ktype: str, added_by: int = None) -> bool:
             cursor.execute("""
                 INSERT OR REPLACE INTO keywords (word, type, added_by)
                 VALUES (?, ?, ?)
-            """, (word.lower().strip(), ktype, added_by))
-            return True
+            """, (normalize(word), ktype, added_by))
+        _invalidate_group_lists()
+        return True
     except Exception as e:
         logger.error(f"Keyword qo'shishda xato: {e}")
         return False
@@ -535,7 +1338,9 @@ def remove_keyword(word_id: int) -> bool:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM keywords WHERE id = ?", (word_id,))
-            return cursor.rowcount > 0
+            deleted = cursor.rowcount > 0
+        _invalidate_group_lists()
+        return deleted
     except Exception as e:
         logger.error(f"Keyword o'chirishda xato: {e}")
         return False
@@ -552,18 +1357,39 @@ def get_keywords(ktype: str = None) -> List[Dict]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+def get_keyword_words(ktype: str) -> List[str]:
+    """Xabarlarni tekshirish uchun kalit so'zlar (normalize() ko'rinishida, keshlangan)"""
+    def load():
+        words = (normalize(k['word']) for k in get_keywords(ktype))
+        return list(dict.fromkeys(w for w in words if w))
+    return _cached_group_list(f"keywords:{ktype}", load)
+
+
 # ============== ORDERS FUNCTIONS ==============
 
+def _insert_order(cursor, user_id: int, user_name: str, phone: str, message_text: str,
+                  chat_id: int, chat_title: str, fields: Dict = None) -> int:
+    """orders jadvaliga qator qo'shish (tuzilgan ustunlar bilan)"""
+    fields = {k: v for k, v in (fields or {}).items() if k in ORDER_FIELD_COLUMNS}
+    columns = ["user_id", "user_name", "phone", "message_text", "chat_id", "chat_title", *fields]
+    cursor.execute(
+        f"INSERT INTO orders ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        (user_id, user_name, phone, message_text, chat_id, chat_title, *fields.values())
+    )
+    return cursor.lastrowid
+
+
 def add_order(user_id: int, user_name: str, phone: str, message_text: str, 
-              chat_id: int, chat_title: str) -> bool:
-    """Zakazni saqlash"""
+              chat_id: int, chat_title: str, fields: Dict = None) -> bool:
+    """Zakazni saqlash
+    
+    Args:
+        fields: tuzilgan ustunlar (utils.extract_order_fields)
+    """
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO orders (user_id, user_name, phone, message_text, chat_id, chat_title)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, (user_id, user_name, phone, message_text, chat_id, chat_title))
+            _insert_order(cursor, user_id, user_name, phone, message_text, chat_id, chat_title, fields)
             return True
     except Exception as e:
         logger.error(f"Zakaz saqlashda xato: {e}")
@@ -572,15 +1398,414 @@ def add_order(user_id: int, user_name: str, phone: str, message_text: str,
 
 def get_recent_orders(limit: int = 10) -> List[Dict]:
     """So'nggi zakazlarni olish"""
+    return get_orders_page(limit=limit)
+
+
+def get_orders_page(before_id: int = None, after_id: int = None, limit: int = 10) -> List[Dict]:
+    """Zakazlarni sahifalab olish (keyset pagination, orders.id bo'yicha)
+    
+    Args:
+        before_id: shu ID dan eskiroq zakazlar (keyingi sahifa)
+        after_id: shu ID dan yangiroq zakazlar (oldingi sahifa)
+        limit: sahifadagi zakazlar soni
+    
+    Returns:
+        Yangidan eskiga tartiblangan zakazlar. Har bir qatorda
+        `is_blocked` (0/1) va `created_label` ("dd.mm HH:MM") bor.
+    """
+    query = """
+        SELECT o.*,
+               strftime('%d.%m %H:%M', o.created_at) AS created_label,
+               (b.user_id IS NOT NULL) AS is_blocked
+        FROM orders o
+        LEFT JOIN blocked_users b ON b.user_id = o.user_id
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        if after_id is not None:
+            cursor.execute(query + " WHERE o.id > ? ORDER BY o.id ASC LIMIT ?", (after_id, limit))
+            rows = cursor.fetchall()[::-1]
+        elif before_id is not None:
+            cursor.execute(query + " WHERE o.id < ? ORDER BY o.id DESC LIMIT ?", (before_id, limit))
+            rows = cursor.fetchall()
+        else:
+            cursor.execute(query + " ORDER BY o.id DESC LIMIT ?", (limit,))
+            rows = cursor.fetchall()
+        return [dict(row) for row in rows]
+
+
+def _fts_query(text: str) -> Optional[str]:
+    """Qidiruv matnidan FTS5 so'rovi: har bir so'z (3+ belgi) - qo'shtirnoqda, hammasi AND"""
+    terms = [t.replace('"', '') for t in text.split()]
+    terms = [t for t in terms if len(t) >= 3]
+    if not terms:
+        return None
+    return " ".join(f'"{t}"' for t in terms)
+
+
+def get_labeled_orders(limit: int = 200, days: int = 30) -> List[Dict]:
+    """Turi aniqlangan so'nggi zakazlar (klassifikator sifatini qayta tekshirish uchun)"""
     with get_connection() as conn:
         cursor = conn.cursor()
         cursor.execute("""
-            SELECT * FROM orders 
-            ORDER BY created_at DESC 
+            SELECT id, message_text, order_type, from_location, to_location
+            FROM orders
+            WHERE order_type IS NOT NULL AND message_text IS NOT NULL
+              AND created_at >= datetime('now', ?)
+            ORDER BY id DESC
             LIMIT ?
-        """, (limit,))
+        """, (f"-{int(days)} days", limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def search_orders(text: str, before_id: int = None, limit: int = 10) -> List[Dict]:
+    """Zakazlarni matn, ism yoki telefon bo'yicha qidirish (yangidan eskiga)
+    
+    Args:
+        text: qidiruv so'zlari (har biri kamida 3 belgi, hammasi bo'lishi kerak)
+        before_id: shu ID dan eskiroq natijalar (keyingi sahifa)
+    
+    Returns:
+        get_orders_page bilan bir xil ko'rinishdagi qatorlar
+    """
+    query = _fts_query(text)
+    if not query:
+        return []
+    
+    sql = """
+        SELECT o.*,
+               strftime('%d.%m %H:%M', o.created_at) AS created_label,
+               (b.user_id IS NOT NULL) AS is_blocked
+        FROM orders_fts f
+        JOIN orders o ON o.id = f.rowid
+        LEFT JOIN blocked_users b ON b.user_id = o.user_id
+        WHERE orders_fts MATCH ? AND f.rowid < ?
+        ORDER BY f.rowid DESC
+        LIMIT ?
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(sql, (query, before_id if before_id is not None else 2 ** 63 - 1, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    except sqlite3.OperationalError as e:
+        logger.error(f"Qidiruvda xato: {e}")
+        return []
+
+
+def has_orders_before(order_id: int) -> bool:
+    """Berilgan ID dan eskiroq zakaz bormi"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM orders WHERE id < ? LIMIT 1", (order_id,))
+        return cursor.fetchone() is not None
+
+
+def has_orders_after(order_id: int) -> bool:
+    """Berilgan ID dan yangiroq zakaz bormi"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT 1 FROM orders WHERE id > ? LIMIT 1", (order_id,))
+        return cursor.fetchone() is not None
+
+
+# ============== MAINTENANCE FUNCTIONS ==============
+
+ARCHIVE_TABLE_PREFIX = "orders_archive_"
+# Arxivga ko'chiriladigan ustunlar: asosiylari + barcha tuzilgan ustunlar (ORDER_FIELD_COLUMNS)
+ARCHIVE_COLUMNS = {
+    "id": "INTEGER PRIMARY KEY",
+    "user_id": "INTEGER",
+    "user_name": "TEXT",
+    "phone": "TEXT",
+    "message_text": "TEXT",
+    "chat_id": "INTEGER",
+    "created_at": "TIMESTAMP",
+    **ORDER_FIELD_COLUMNS,
+}
+
+
+def archive_old_orders(days: int, delete_only: bool = False, batch_size: int = 10000) -> int:
+    """Eski zakazlarni oylik arxiv jadvallariga ko'chirish (yoki o'chirish)
+    
+    Arxiv jadvali: orders_archive_YYYY_MM (chat_title'siz, ixcham).
+    Har bir partiya alohida tranzaksiyada - katta jadvalda ham bloklanish qisqa.
+    
+    Returns:
+        Ko'chirilgan (o'chirilgan) zakazlar soni
+    """
+    cutoff = f"-{int(days)} days"
+    moved = 0
+    while True:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT MIN(id), MAX(id) FROM (
+                    SELECT id FROM orders
+                    WHERE created_at < datetime('now', ?)
+                    ORDER BY created_at
+                    LIMIT ?
+                )
+            """, (cutoff, batch_size))
+            min_id, max_id = cursor.fetchone()
+            if max_id is None:
+                break
+            
+            # Partiya id oralig'i bo'yicha (+created_at - indeks emas, PRIMARY KEY ishlatiladi)
+            batch = "id BETWEEN ? AND ? AND +created_at < datetime('now', ?)"
+            params = (min_id, max_id, cutoff)
+            
+            if not delete_only:
+                cursor.execute(
+                    f"SELECT DISTINCT strftime('%Y_%m', created_at) FROM orders WHERE {batch}", params
+                )
+                columns = ", ".join(ARCHIVE_COLUMNS)
+                for (month,) in cursor.fetchall():
+                    table = ARCHIVE_TABLE_PREFIX + month
+                    definitions = ", ".join(f"{name} {kind}" for name, kind in ARCHIVE_COLUMNS.items())
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {table} ({definitions})")
+                    # Avvalroq yaratilgan arxivda yangi ustunlar (travel_time) bo'lmasligi mumkin
+                    cursor.execute(f"PRAGMA table_info({table})")
+                    existing = {row["name"] for row in cursor.fetchall()}
+                    for name, kind in ARCHIVE_COLUMNS.items():
+                        if name not in existing:
+                            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {kind}")
+                    cursor.execute(f"""
+                        INSERT OR IGNORE INTO {table} ({columns})
+                        SELECT {columns}
+                        FROM orders
+                        WHERE {batch} AND strftime('%Y_%m', created_at) = ?
+                    """, params + (month,))
+            
+            cursor.execute(f"DELETE FROM orders WHERE {batch}", params)
+            moved += cursor.rowcount
+            if cursor.rowcount < batch_size:
+                break
+    
+    if moved:
+        action = "o'chirildi" if delete_only else "arxivlandi"
+        logger.info(f"🗄 {moved} ta eski zakaz {action}")
+    return moved
+
+
+def get_archive_tables() -> List[str]:
+    """Zakazlar arxivi jadvallari (eskisidan yangisiga)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ? ORDER BY name",
+            (ARCHIVE_TABLE_PREFIX + "%",)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def optimize_database(vacuum: bool = False):
+    """Statistikani yangilash (ANALYZE) va ixtiyoriy VACUUM (bo'sh joyni qaytarish)"""
+    conn = sqlite3.connect(DATABASE_PATH, isolation_level=None)
+    try:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA optimize")
+        if vacuum:
+            conn.execute("VACUUM")
+    finally:
+        conn.close()
+
+
+# ============== ENTITY CACHE FUNCTIONS ==============
+
+def get_entity_cache() -> Dict[int, Dict]:
+    """Keshlangan entity'lar (entity_id -> qator)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT * FROM entity_cache")
+        return {row["entity_id"]: dict(row) for row in cursor.fetchall()}
+
+
+def save_entity_cache(rows: List[tuple]) -> bool:
+    """Entity'larni keshga yozish (bitta tranzaksiyada)
+    
+    Args:
+        rows: [(entity_id, title, username, resolved_at, error), ...] -
+            xato bo'lsa title None, eski nom saqlanib qoladi
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.executemany("""
+                INSERT INTO entity_cache (entity_id, title, username, resolved_at, error)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(entity_id) DO UPDATE SET
+                    title = COALESCE(excluded.title, title),
+                    username = COALESCE(excluded.username, username),
+                    resolved_at = excluded.resolved_at,
+                    error = excluded.error
+            """, rows)
+            return True
+    except Exception as e:
+        logger.error(f"Entity keshini saqlashda xato: {e}")
+        return False
+
+
+def update_source_group_titles(titles: List[tuple]) -> int:
+    """Guruhlar nomini yangilash (is_active/added_by o'zgarmaydi)
+    
+    Args:
+        titles: [(group_id, title), ...]
+    """
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany("""
+            UPDATE source_groups SET title = ?
+            WHERE group_id = ? AND title IS NOT ?
+        """, [(title, group_id, title) for group_id, title in titles])
+        return cursor.rowcount
+
+
+# ============== OUTBOX FUNCTIONS ==============
+
+OUTBOX_PENDING = "pending"
+OUTBOX_SENT = "sent"
+OUTBOX_FAILED = "failed"
+
+
+def enqueue_order(source_key: str, message: str, target_ids: List[int],
+                  user_id: int, user_name: str, phone: str, message_text: str,
+                  chat_id: int, chat_title: str, fields: Dict = None) -> Optional[int]:
+    """Zakazni saqlash va target guruhlarga yuborish navbatiga qo'yish (bitta tranzaksiyada)
+    
+    Args:
+        source_key: manba xabar kaliti ("chat_id:message_id") - shu xabar
+            allaqachon navbatda bo'lsa, qayta qo'shilmaydi
+    
+    Returns:
+        Yangi zakaz ID si, xabar avval qo'shilgan yoki xato bo'lsa None
+    """
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1 FROM outbox WHERE source_key = ? LIMIT 1", (source_key,))
+            if cursor.fetchone():
+                return None
+            
+            order_id = _insert_order(
+                cursor, user_id, user_name, phone, message_text, chat_id, chat_title, fields
+            )
+            
+            now = time.time()
+            cursor.executemany("""
+                INSERT OR IGNORE INTO outbox (order_id, source_key, target_id, message, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            """, [(order_id, source_key, target_id, message, now) for target_id in target_ids])
+            return order_id
+    except Exception as e:
+        logger.error(f"Zakazni navbatga qo'yishda xato: {e}")
+        return None
+
+
+def get_due_outbox(per_target: int = 50) -> List[Dict]:
+    """Yuborish vaqti kelgan xabarlar: har bir target'dan eskisidan boshlab ko'pi bilan
+    `per_target` ta (bitta target'ning katta navbati boshqalarini to'sib qo'ymaydi)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT * FROM (
+                SELECT *, ROW_NUMBER() OVER (PARTITION BY target_id ORDER BY id) AS target_rank
+                FROM outbox
+                WHERE status = 'pending' AND next_attempt_at <= ?
+            )
+            WHERE target_rank <= ?
+            ORDER BY id
+        """, (time.time(), per_target))
         return [dict(row) for row in cursor.fetchall()]
 
 
+def mark_outbox_sent(outbox_ids: List[int]) -> bool:
+    """Xabarlar yuborildi"""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            now = time.time()
+            cursor.executemany("""
+                UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1, last_error = NULL
+                WHERE id = ?
+            """, [(now, outbox_id) for outbox_id in outbox_ids])
+            return True
+    except Exception as e:
+        logger.error(f"Navbat holatini yangilashda xato: {e}")
+        return False
+
+
+def mark_outbox_retry(outbox_id: int, error: str, delay: float, max_attempts: int) -> bool:
+    """Yuborilmadi - keyinroq qayta urinish (urinishlar tugasa 'failed')"""
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                UPDATE outbox SET
+                    attempts = attempts + 1,
+                    last_error = ?,
+                    next_attempt_at = ?,
+                    status = CASE WHEN attempts + 1 >= ? THEN 'failed' ELSE 'pending' END
+                WHERE id = ?
+            """, (error[:500], time.time() + delay, max_attempts, outbox_id))
+            return True
+    except Exception as e:
+        logger.error(f"Navbat holatini yangilashda xato: {e}")
+        return False
+
+
+def postpone_outbox_target(target_id: int, delay: float) -> int:
+    """Target guruhning kutilayotgan barcha xabarlarini keyinga surish (FloodWait)"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE outbox SET next_attempt_at = MAX(next_attempt_at, ?)
+            WHERE status = 'pending' AND target_id = ?
+        """, (time.time() + delay, target_id))
+        return cursor.rowcount
+
+
+def retry_failed_outbox() -> int:
+    """Yuborilmagan (failed) xabarlarni qayta navbatga qo'yish"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            UPDATE outbox SET status = 'pending', attempts = 0, next_attempt_at = 0
+            WHERE status = 'failed'
+        """)
+        return cursor.rowcount
+
+
+def cleanup_outbox(days: int = 7) -> int:
+    """Eski yuborilgan xabarlarni o'chirish"""
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            "DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+            (time.time() - days * 86400,)
+        )
+        return cursor.rowcount
+
+
+def get_outbox_stats() -> Dict[str, Any]:
+    """Navbat holati: kutilayotgan, yuborilmagan, so'nggi soatda yuborilgan, eng eski kutish"""
+    now = time.time()
+    with get_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT
+                COALESCE(SUM(status = 'pending'), 0) AS pending,
+                COALESCE(SUM(status = 'failed'), 0) AS failed,
+                COALESCE(SUM(status = 'sent' AND sent_at >= ?), 0) AS sent_hour,
+                MIN(CASE WHEN status = 'pending' THEN created_at END) AS oldest_pending
+            FROM outbox
+        """, (now - 3600,))
+        row = dict(cursor.fetchone())
+    
+    oldest = row.pop("oldest_pending")
+    row["oldest_age"] = int(now - oldest) if oldest else 0
+    return row
+
+
 # Initialize on import
 init_database()
@@ -0,0 +1,149 @@
+"""
+Telegram Taxi Bot - Entity Cache
+Guruh nomlarini keshlash, Telegram'dan parallel (cheklangan) aniqlash
+va akkaunt dialoglarini oqim bilan import qilish
+"""
+
+import asyncio
+import logging
+import time
+
+from telethon.errors import FloodWaitError
+
+from config import Config
+import database as db
+
+logger = logging.getLogger("taxi_bot.entities")
+
+
+class EntityResolver:
+    """Guruhlar (entity) keshi: database + xotira"""
+
+    def __init__(self):
+        self._cache = None  # entity_id -> qator
+
+    def _rows(self) -> dict:
+        if self._cache is None:
+            self._cache = db.get_entity_cache()
+        return self._cache
+
+    def invalidate(self):
+        """Xotiradagi keshni tozalash (database'dan qayta o'qiladi)"""
+        self._cache = None
+
+    def title(self, entity_id: int, default: str = None) -> str:
+        """Keshdagi guruh nomi"""
+        row = self._rows().get(entity_id)
+        return row["title"] if row and row["title"] else default
+
+    def stale(self, entity_ids, max_age: float = None) -> list:
+        """Keshda yo'q, eskirgan yoki oldin aniqlanmagan entity'lar"""
+        max_age = Config.ENTITY_CACHE_TTL if max_age is None else max_age
+        now = time.time()
+        cache = self._rows()
+        return [
+            entity_id for entity_id in dict.fromkeys(entity_ids)
+            if entity_id not in cache
+            or cache[entity_id]["error"]
+            or now - cache[entity_id]["resolved_at"] > max_age
+        ]
+
+    async def resolve(self, client, entity_ids, concurrency: int = None, max_age: float = None) -> dict:
+        """Eskirgan entity'larni Telegram'dan aniqlash va keshni yangilash
+
+        Returns:
+            dict: {"total", "cached", "resolved", "failed"}
+        """
+        entity_ids = list(dict.fromkeys(entity_ids))
+        todo = self.stale(entity_ids, max_age)
+        semaphore = asyncio.Semaphore(concurrency or Config.ENTITY_RESOLVE_CONCURRENCY)
+        pause_until = 0.0  # FloodWait - barcha so'rovlar to'xtaydi
+        rows = []
+
+        async def resolve_one(entity_id):
+            nonlocal pause_until
+            async with semaphore:
+                for attempt in range(2):
+                    delay = pause_until - time.monotonic()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    try:
+                        entity = await client.get_entity(entity_id)
+                    except FloodWaitError as e:
+                        if attempt or e.seconds > Config.ENTITY_FLOOD_MAX_WAIT:
+                            rows.append((entity_id, None, None, 0, f"FloodWait {e.seconds}s"))
+                            return
+                        pause_until = max(pause_until, time.monotonic() + e.seconds)
+                        continue
+                    except Exception as e:
+                        logger.warning(f"   ✗ {entity_id} - {e}")
+                        rows.append((entity_id, None, None, 0, str(e)[:200]))
+                        return
+                    title = getattr(entity, 'title', None) or str(entity_id)
+                    rows.append((entity_id, title, getattr(entity, 'username', None), time.time(), None))
+                    return
+
+        if todo:
+            await asyncio.gather(*(resolve_one(entity_id) for entity_id in todo))
+            db.save_entity_cache(rows)
+            db.update_source_group_titles([(row[0], row[1]) for row in rows if row[1]])
+            self.invalidate()
+
+        failed = sum(1 for row in rows if row[4])
+        return {
+            "total": len(entity_ids),
+            "cached": len(entity_ids) - len(todo),
+            "resolved": len(rows) - failed,
+            "failed": failed,
+        }
+
+
+async def import_dialogs(client, import_groups: bool = True, on_group=None,
+                         batch_size: int = 500, label: str = "") -> dict:
+    """Akkauntdagi guruhlarni oqim bilan o'qish (iter_dialogs) va partiyalab saqlash
+
+    Args:
+        import_groups: guruhlarni source_groups'ga qo'shish (IMPORT_JOINED_GROUPS)
+        on_group: har bir guruh uchun `on_group(group_id)` (masalan, a'zolikni belgilash)
+        batch_size: bitta tranzaksiyadagi guruhlar soni
+
+    Returns:
+        dict: {"groups", "imported"}
+    """
+    prefix = f"[{label}] " if label else ""
+    groups = imported = 0
+    batch = []
+
+    def flush():
+        nonlocal imported
+        if not batch:
+            return
+        now = time.time()
+        # Dialogdagi nom - get_entity'siz entity keshi ham yangilanadi
+        db.save_entity_cache([(group_id, title, username, now, None) for group_id, title, username in batch])
+        if import_groups:
+            imported += db.import_source_groups(batch)
+        batch.clear()
+        logger.info(f"📥 {prefix}{groups} ta guruh o'qildi, {imported} ta yangi")
+
+    async for dialog in client.iter_dialogs():
+        if not (dialog.is_group or dialog.is_channel):
+            continue
+        # dialog.id - event.chat_id bilan bir xil (-100... ko'rinishida)
+        title = getattr(dialog.entity, 'title', None) or dialog.title
+        if not title:
+            continue
+        groups += 1
+        if on_group:
+            on_group(dialog.id)
+        batch.append((dialog.id, title, getattr(dialog.entity, 'username', None)))
+        if len(batch) >= batch_size:
+            flush()
+
+    flush()
+    entity_resolver.invalidate()
+    return {"groups": groups, "imported": imported}
+
+
+# Singleton instance
+entity_resolver = EntityResolver()
@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+"""
+Telegram Taxi Bot - Offline Evaluation
+Belgilangan xabarlar to'plamini pipeline.decide (filtrlar, kalit so'zlar, lokal
+yo'nalish, AI bosqichlari va keshlar) orqali o'tkazib, yo'lovchi/haydovchi zakazlari
+uchun precision/recall, xabar boshiga AI so'rovlari va vaqtni o'lchash.
+
+    python evaluate.py [--dataset eval/dataset.jsonl] [--classifier recorded|local|live]
+                       [--threshold 0.7] [--prompt prompt.txt] [--no-fast]
+                       [--passenger-keywords kerak,bor] [--driver-keywords olaman]
+
+Dataset - har bir qatorda bitta JSON:
+    {"text": "...", "label": "passenger_order" | "driver_order" | "other",
+     "from_location": "...", "to_location": "...",          # ixtiyoriy
+     "response": {...}, "fast_response": {...},              # yozib olingan AI javoblari
+     "chat_id": -100..., "sender_id": 123}                   # ixtiyoriy
+
+Klassifikator: recorded - yozib olingan javoblar, local - lokal qoidalar
+(tarmoqsiz o'rinbosar), live - haqiqiy OpenAI (pul sarflanadi).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+# Baholash alohida (vaqtinchalik) database bilan ishlaydi
+if "DATABASE_PATH" not in os.environ:
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="taxi_eval_"), "eval.db")
+
+PASSENGER_ORDER = "passenger_order"
+DRIVER_ORDER = "driver_order"
+OTHER = "other"
+
+# Lokal o'rinbosar uchun so'zlar (normalize() ko'rinishida)
+LOCAL_PASSENGER_WORDS = ("kerak", "boraman", "ketaman", "pochta bor", "odam bor", "kishi bor", "kim bor")
+LOCAL_DRIVER_WORDS = ("olaman", "olib ketaman", "joy bor", "ketadi", "cobalt", "nexia", "gentra",
+                      "malibu", "lacetti", "spark")
+
+
+def load_dataset(path: str) -> list:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class StubClient:
+    """OpenAI client o'rniga: `client.chat.completions.create(...)` javoblarini qaytaradi"""
+
+    def __init__(self, answer, latency: float = 0.0):
+        self.answer = answer       # answer(model, text) -> dict | None
+        self.latency = latency
+        self.calls = Counter()     # model -> so'rovlar
+        self.missing = 0
+        self.chat = SimpleNamespace(completions=self)
+
+    async def create(self, model, messages, max_tokens=None, **kwargs):
+        text = messages[-1]["content"]
+        self.calls[model] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        body = self.answer(model, text)
+        if body is None:
+            self.missing += 1
+            body = {"type": OTHER, "confidence": 0.0, "data": None}
+        content = json.dumps(body, ensure_ascii=False)
+        usage = SimpleNamespace(
+            prompt_tokens=(len(messages[0]["content"]) + len(text)) // 4,
+            completion_tokens=len(content) // 4,
+        )
+        return SimpleNamespace(usage=usage, choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def recorded_answers(rows: list, fast_model: str):
+    """Yozib olingan javoblar (matn normalize() bo'yicha)"""
+    from textnorm import normalize
+
+    records = {normalize(row["text"]): row for row in rows}
+
+    def answer(model, text):
+        row = records.get(normalize(text))
+        if not row:
+            return None
+        return row.get("fast_response") if model == fast_model else row.get("response")
+    return answer
+
+
+def local_answers(fast_model: str):
+    """Tarmoqsiz o'rinbosar: kalit so'zlar + gazetteer"""
+    from locations import extract_route
+    from textnorm import normalize
+
+    def answer(model, text):
+        norm = normalize(text)
+        route = extract_route(norm)
+        if any(word in norm for word in LOCAL_DRIVER_WORDS):
+            order_type, confidence = DRIVER_ORDER, 0.8
+        elif any(word in norm for word in LOCAL_PASSENGER_WORDS) or route["to_location"]:
+            order_type, confidence = PASSENGER_ORDER, 0.9 if route["to_location"] else 0.75
+        else:
+            order_type, confidence = OTHER, 0.8
+        if model == fast_model:
+            return {"t": order_type[0] if order_type != OTHER else "o", "c": confidence,
+                    "f": route["from_location"] or "", "to": route["to_location"] or "",
+                    "n": route["passengers"] or ""}
+        data = None if order_type == OTHER else {
+            "from_location": route["from_location"], "to_location": route["to_location"],
+            "passengers": route["passengers"],
+        }
+        return {"type": order_type, "confidence": confidence, "data": data}
+    return answer
+
+
+def make_message(row: dict, index: int) -> dict:
+    return {
+        "chat_id": row.get("chat_id", -1000),
+        "message_id": index + 1,
+        "chat_title": "Eval",
+        "sender_id": row.get("sender_id", 10_000 + index),
+        "sender_name": f"User {index}",
+        "sender_username": None,
+        "sender_phone": None,
+        "text": row["text"],
+        "has_sticker": row.get("has_sticker", False),
+        "media_only": False,
+    }
+
+
+def same_location(predicted, expected) -> bool:
+    from textnorm import normalize
+    return bool(predicted) and normalize(str(predicted)) == normalize(expected)
+
+
+async def run(rows: list, classifier) -> list:
+    """Har bir xabarni ketma-ket pipeline.decide orqali o'tkazish"""
+    import pipeline
+
+    results = []
+    for i, row in enumerate(rows):
+        start = time.perf_counter()
+        result = await pipeline.decide(make_message(row, i), classifier)
+        elapsed = time.perf_counter() - start
+        predicted = result.get("order_type") if result["action"] == pipeline.FORWARD else OTHER
+        results.append((row, result, predicted or OTHER, elapsed))
+    return results
+
+
+def report(results: list, client) -> dict:
+    """Precision/recall, AI so'rovlari, vaqt va yo'qotilgan zakazlar"""
+    n = len(results)
+    metrics = {"messages": n}
+    print(f"\n{'sinf':>16} {'precision':>10} {'recall':>8} {'f1':>6} {'tp/pred/true':>14}")
+    for cls in (PASSENGER_ORDER, DRIVER_ORDER):
+        tp = sum(1 for row, _, pred, _ in results if pred == cls and row["label"] == cls)
+        pred_n = sum(1 for _, _, pred, _ in results if pred == cls)
+        true_n = sum(1 for row, _, _, _ in results if row["label"] == cls)
+        precision = tp / pred_n if pred_n else 0.0
+        recall = tp / true_n if true_n else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        metrics[cls] = {"precision": precision, "recall": recall, "f1": f1}
+        print(f"{cls:>16} {precision:>10.0%} {recall:>8.0%} {f1:>6.2f} {f'{tp}/{pred_n}/{true_n}':>14}")
+
+    # Zakaz sifatida yuborilganlar (turi farq qilsa ham) - yo'nalish aniqligi
+    routed = [
+        (row, result) for row, result, pred, _ in results
+        if pred != OTHER and row.get("from_location") and row.get("to_location")
+    ]
+    route_ok = sum(
+        1 for row, result in routed
+        if same_location((result.get("order_data") or {}).get("from_location"), row["from_location"])
+        and same_location((result.get("order_data") or {}).get("to_location"), row["to_location"])
+    )
+    if routed:
+        print(f"\nYo'nalish to'g'ri: {route_ok}/{len(routed)} ({route_ok / len(routed):.0%})")
+
+    calls = sum(client.calls.values())
+    times = sorted(elapsed for *_, elapsed in results)
+    metrics.update({
+        "api_calls_per_message": calls / max(n, 1),
+        "avg_ms": sum(times) * 1000 / max(n, 1),
+        "p95_ms": times[int(n * 0.95)] * 1000 if times else 0,
+        "total_s": sum(times),
+    })
+    print(f"\nAI so'rovlari: {calls} ({metrics['api_calls_per_message']:.2f} / xabar) - "
+          + ", ".join(f"{model}: {count}" for model, count in client.calls.items()))
+    if client.missing:
+        print(f"   yozib olinmagan javoblar: {client.missing}")
+    print(f"Vaqt: jami {metrics['total_s']:.2f} s, o'rtacha {metrics['avg_ms']:.1f} ms, p95 {metrics['p95_ms']:.1f} ms")
+
+    reasons = Counter(result["reason"] for _, result, _, _ in results)
+    print("Qarorlar: " + ", ".join(f"{reason}: {count}" for reason, count in reasons.most_common()))
+
+    lost = [(row, result) for row, result, pred, _ in results if row["label"] != OTHER and pred == OTHER]
+    if lost:
+        print("\nYo'qotilgan zakazlar:")
+        for row, result in lost:
+            print(f"   [{result['reason']}] {row['text']}")
+    wrong = [(row, pred) for row, _, pred, _ in results if row["label"] == OTHER and pred != OTHER]
+    if wrong:
+        print("\nNoto'g'ri zakaz deb topilganlar:")
+        for row, pred in wrong:
+            print(f"   [{pred}] {row['text']}")
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Klassifikator va filtrlarni belgilangan to'plamda baholash")
+    parser.add_argument("--dataset", default=os.path.join(os.path.dirname(__file__), "eval", "dataset.jsonl"))
+    parser.add_argument("--classifier", choices=("recorded", "local", "live"), default="recorded")
+    parser.add_argument("--threshold", type=float, help="AI_MIN_CONFIDENCE")
+    parser.add_argument("--prompt", help="AI prompt fayli (DEFAULT_PROMPT o'rniga)")
+    parser.add_argument("--no-fast", action="store_true", help="arzon model bosqichisiz")
+    parser.add_argument("--passenger-keywords", default="")
+    parser.add_argument("--driver-keywords", default="")
+    parser.add_argument("--latency-ms", type=float, default=0, help="stub javob kechikishi")
+    parser.add_argument("--json", action="store_true", help="ko'rsatkichlarni JSON ko'rinishida chiqarish")
+    args = parser.parse_args()
+
+    if args.classifier != "live":
+        os.environ.setdefault("OPENAI_API_KEY", "offline-eval")
+
+    from config import Config
+    import database as db
+    from ai_classifier import MessageClassifier
+
+    if args.threshold is not None:
+        Config.AI_MIN_CONFIDENCE = args.threshold
+    if args.prompt:
+        with open(args.prompt, encoding="utf-8") as f:
+            db.set_setting("ai_prompt", f.read())
+    for word in filter(None, args.passenger_keywords.split(",")):
+        db.add_keyword(word, "passenger")
+    for word in filter(None, args.driver_keywords.split(",")):
+        db.add_keyword(word, "driver")
+
+    rows = load_dataset(args.dataset)
+    classifier = MessageClassifier()
+    if args.no_fast:
+        classifier.fast_model = ""
+
+    if args.classifier == "recorded":
+        client = StubClient(recorded_answers(rows, classifier.fast_model), args.latency_ms / 1000)
+    elif args.classifier == "local":
+        client = StubClient(local_answers(classifier.fast_model), args.latency_ms / 1000)
+    else:
+        # Haqiqiy so'rovlar; StubClient faqat hisoblagich sifatida
+        client = StubClient(None)
+        real = classifier.client.chat.completions
+
+        async def create(model, messages, **kwargs):
+            client.calls[model] += 1
+            return await real.create(model=model, messages=messages, **kwargs)
+        client.create = create
+    classifier.client = SimpleNamespace(chat=SimpleNamespace(completions=client))
+
+    print("=" * 60)
+    print(f"EVAL: {len(rows)} xabar, klassifikator: {args.classifier}, "
+          f"model: {classifier.fast_model + ' → ' if classifier.fast_model else ''}{classifier.model}, "
+          f"chegara: {Config.AI_MIN_CONFIDENCE}")
+    print("=" * 60)
+
+    results = asyncio.run(run(rows, classifier))
+    metrics = report(results, client)
+    if args.json:
+        print(json.dumps(metrics, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
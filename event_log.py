@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Telegram Taxi Bot - Structured Event Log
+Har bir xabar bo'yicha qaror (filtr sababi, AI javobi, bosqichlar vaqti,
+yetkazish natijasi) va har bir yetkazish urinishi - NDJSON faylga, bir
+qatorda bitta yozuv. Yozish fon thread'da (QueueListener), fayl aylanadi
+va siqiladi (LOG_* sozlamalari).
+
+Tahlil:
+    python event_log.py [--since 24h] [--window 1h] [--file events.ndjson]
+"""
+
+import argparse
+import glob
+import gzip
+import json
+import logging
+import os
+import queue
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+
+from config import Config
+from utils import rotating_file_handler
+
+logger = logging.getLogger("taxi_bot.event_log")
+
+
+class EventLog:
+    """Qarorlar va yetkazishlar jurnali (EVENT_LOG_FILE bo'sh bo'lsa - o'chiq)"""
+
+    def __init__(self, filename: str = None):
+        self.filename = Config.EVENT_LOG_FILE if filename is None else filename
+        self._writer = None
+        self._listener = None
+
+    def _open(self):
+        """Birinchi yozuvda fayl va fon yozuvchini ochish"""
+        handler = rotating_file_handler(self.filename)
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        events = queue.SimpleQueue()
+        self._listener = QueueListener(events, handler)
+        self._listener.start()
+
+        self._writer = logging.getLogger("taxi_bot.events")
+        self._writer.propagate = False
+        self._writer.setLevel(logging.INFO)
+        self._writer.handlers[:] = [QueueHandler(events)]
+
+    def write(self, record: dict):
+        if not self.filename:
+            return
+        if self._writer is None:
+            self._open()
+        self._writer.info(json.dumps(record, ensure_ascii=False, separators=(",", ":")))
+
+    def message(self, msg: dict, result: dict, delivery: str = None, order_id: int = None):
+        """Xabar bo'yicha qaror
+
+        Args:
+            delivery: forward bo'lsa - navbatga qo'yish natijasi ("queued", "no_targets", ...)
+        """
+        record = {
+            "ts": round(time.time(), 3),
+            "ev": "msg",
+            "chat": msg["chat_id"],
+            "msg": msg["message_id"],
+            "sender": msg["sender_id"],
+            "len": len(msg["text"]),
+            "action": result["action"],
+            "reason": result["reason"],
+        }
+        if result.get("verdict"):
+            record["verdict"] = result["verdict"]
+            record["conf"] = result.get("confidence")
+            if result.get("cached"):
+                record["cache"] = result["cached"]
+        if result.get("order_type"):
+            record["type"] = result["order_type"]
+        if result.get("timings"):
+            record["ms"] = result["timings"]
+        if delivery:
+            record["delivery"] = delivery
+        if order_id:
+            record["order"] = order_id
+        self.write(record)
+
+    def delivery(self, row: dict, status: str, error: str = None):
+        """Outbox yetkazish urinishi: sent | retry | failed | flood"""
+        record = {
+            "ts": round(time.time(), 3),
+            "ev": "delivery",
+            "src": row["source_key"],
+            "order": row.get("order_id"),
+            "target": row["target_id"],
+            "status": status,
+            "attempts": row["attempts"] + (status != "flood"),
+        }
+        if status == "sent":
+            record["wait_s"] = round(time.time() - row["created_at"], 3)
+        if error:
+            record["error"] = error[:200]
+        self.write(record)
+
+    def close(self):
+        """Navbatdagi yozuvlarni yozib, faylni yopish"""
+        if self._listener:
+            self._listener.stop()
+            for handler in self._listener.handlers:
+                handler.close()
+            self._listener = None
+            self._writer = None
+
+
+# Singleton instance
+event_log = EventLog()
+
+
+# ============== TAHLIL ==============
+
+DURATION_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+def parse_duration(value: str) -> int:
+    """"30m", "6h", "7d" -> soniya"""
+    value = value.strip().lower()
+    if value[-1:] in DURATION_UNITS:
+        return int(float(value[:-1]) * DURATION_UNITS[value[-1]])
+    return int(value)
+
+
+def read_events(filename: str, since: float = 0):
+    """Joriy va aylantirilgan (siqilgan ham) fayllardagi yozuvlar"""
+    for path in sorted(glob.glob(glob.escape(filename) + "*")):
+        if os.path.getmtime(path) < since:
+            continue
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("ts", 0) >= since:
+                    yield record
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def summarize(events, window: int) -> dict:
+    """Oynalar bo'yicha o'tkazuvchanlik, sabablar va yetkazish"""
+    windows = {}
+    reasons = Counter()
+    deliveries = Counter()
+    waits = []
+    for record in events:
+        if record.get("ev") == "delivery":
+            deliveries[record["status"]] += 1
+            if "wait_s" in record:
+                waits.append(record["wait_s"])
+            continue
+
+        start = int(record["ts"] // window * window)
+        w = windows.get(start)
+        if w is None:
+            w = windows[start] = {"messages": 0, "forwarded": 0, "ai": 0, "cached": 0, "total_ms": []}
+        w["messages"] += 1
+        w["forwarded"] += record["action"] == "forward"
+        if record.get("verdict"):
+            w["ai"] += 1
+            w["cached"] += bool(record.get("cache"))
+        if "ms" in record:
+            w["total_ms"].append(record["ms"].get("total", 0))
+        reasons[record["reason"]] += 1
+    return {"windows": windows, "reasons": reasons, "deliveries": deliveries, "waits": waits}
+
+
+def print_summary(summary: dict, window: int):
+    windows = summary["windows"]
+    if not windows:
+        print("Yozuvlar yo'q")
+        return
+
+    print(f"{'oyna':<16} {'xabar':>7} {'xabar/min':>9} {'zakaz':>6} {'AI':>6} {'kesh':>5} {'p50 ms':>7} {'p95 ms':>7}")
+    messages = 0
+    for start in sorted(windows):
+        w = windows[start]
+        messages += w["messages"]
+        cached = f"{w['cached'] / w['ai']:.0%}" if w["ai"] else "—"
+        print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(start)):<16} {w['messages']:>7} "
+              f"{w['messages'] * 60 / window:>9.1f} {w['forwarded']:>6} {w['ai']:>6} {cached:>5} "
+              f"{percentile(w['total_ms'], 0.5):>7.1f} {percentile(w['total_ms'], 0.95):>7.1f}")
+
+    print("\nQarorlar:")
+    for reason, count in summary["reasons"].most_common():
+        print(f"   {reason:<16} {count:>8} ({count / messages:.1%})")
+
+    deliveries = summary["deliveries"]
+    if deliveries:
+        print("\nYetkazish: " + ", ".join(f"{status}: {count}" for status, count in deliveries.most_common()))
+        if summary["waits"]:
+            print(f"   navbatda kutish: o'rtacha {sum(summary['waits']) / len(summary['waits']):.1f} s, "
+                  f"p95 {percentile(summary['waits'], 0.95):.1f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Qarorlar jurnali tahlili")
+    parser.add_argument("--file", default=Config.EVENT_LOG_FILE or "events.ndjson")
+    parser.add_argument("--since", default="24h", help="qancha vaqt oldingi yozuvlardan (30m, 6h, 7d)")
+    parser.add_argument("--window", default="1h", help="oyna uzunligi (5m, 1h, 1d)")
+    args = parser.parse_args()
+
+    window = max(parse_duration(args.window), 1)
+    since = time.time() - parse_duration(args.since)
+    print_summary(summarize(read_events(args.file, since), window), window)
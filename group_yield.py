@@ -0,0 +1,168 @@
+"""
+Telegram Taxi Bot - Group Yield Analytics
+Guruhlar bo'yicha samaradorlik hisoblagichlari va avtomatik cheklash siyosati.
+Ulush faqat tekshirilgan xabarlar bo'yicha va so'nggi YIELD_WINDOW oynasida
+hisoblanadi; cheklangan guruh YIELD_PROBATION_HOURS dan keyin sinovga qaytadi.
+"""
+
+import asyncio
+import logging
+import time
+
+from config import Config
+import database as db
+
+logger = logging.getLogger("taxi_bot.yield")
+
+
+# Guruh rejimlari
+MODE_NORMAL = "normal"              # Oddiy: filtrlar + AI
+MODE_KEYWORD_ONLY = "keyword_only"  # Faqat yo'lovchi kalit so'zlari (AI chaqirilmaydi)
+MODE_THROTTLED = "throttled"        # Har N-xabardan bittasi, faqat kalit so'zlar
+
+MODES = (MODE_NORMAL, MODE_KEYWORD_ONLY, MODE_THROTTLED)
+
+
+class GroupYieldTracker:
+    """Guruhlar hisoblagichlari
+
+    record() faqat xotirada; DB ga yozish va siyosatni qo'llash - run() fon
+    vazifasida, alohida thread'da.
+    """
+
+    FLUSH_INTERVAL = 30  # soniya
+
+    def __init__(self):
+        self._pending = {}  # group_id -> [seen, filtered, ai_calls, forwarded, skipped]
+        self._modes = None  # group_id -> mode (DB dan keshlangan)
+        self._throttle_counters = {}  # group_id -> ko'rilgan xabarlar soni
+
+    def record(self, group_id: int, seen: int = 0, filtered: int = 0,
+               ai_calls: int = 0, forwarded: int = 0, skipped: int = 0):
+        """Hisoblagichlarni oshirish
+
+        Args:
+            seen: tekshirilgan xabar (ulush shu bo'yicha)
+            skipped: cheklangan rejimda tekshirilmay o'tkazilgan xabar
+        """
+        if not group_id:
+            return
+
+        counters = self._pending.get(group_id)
+        if counters is None:
+            counters = self._pending[group_id] = [0, 0, 0, 0, 0]
+        counters[0] += seen
+        counters[1] += filtered
+        counters[2] += ai_calls
+        counters[3] += forwarded
+        counters[4] += skipped
+
+    def mode(self, group_id: int) -> str:
+        """Guruhning joriy rejimi"""
+        if self._modes is None:
+            self._load_modes()
+        return self._modes.get(group_id, MODE_NORMAL)
+
+    def should_process(self, group_id: int) -> bool:
+        """Xabarni qayta ishlash kerakmi (throttled rejimda har N-xabardan bittasi)"""
+        if self.mode(group_id) != MODE_THROTTLED:
+            return True
+
+        count = self._throttle_counters.get(group_id, 0)
+        self._throttle_counters[group_id] = count + 1
+        return count % max(Config.YIELD_THROTTLE_EVERY, 1) == 0
+
+    async def run(self):
+        """Fonda har FLUSH_INTERVAL da hisoblagichlarni yozish va siyosatni qo'llash"""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            try:
+                await asyncio.to_thread(self._write, self._take())
+            except Exception as e:
+                logger.error(f"Guruh hisoblagichlarini yozishda xato: {e}")
+
+    def flush(self):
+        """Yig'ilgan hisoblagichlarni darhol DB ga yozish (to'xtatishda, admin panel)"""
+        self._write(self._take())
+
+    def _take(self) -> list:
+        """Yozilmagan hisoblagichlarni olish (event loop'da - record() bilan to'qnashmaydi)"""
+        pending, self._pending = self._pending, {}
+        return [(group_id, *counters) for group_id, counters in pending.items()]
+
+    def _write(self, rows: list):
+        """Hisoblagichlarni yozish va siyosatni qo'llash (thread'da ishlashi mumkin)"""
+        if rows and not db.add_group_yield(rows, Config.YIELD_WINDOW):
+            return
+        self.apply_policy()
+
+    def apply_policy(self, now: float = None):
+        """Zakaz ulushi past guruhlarni cheklash (admin qo'lda o'rnatganlarni tegmaslik)
+
+        Cheklangan rejimda AI chaqirilmaydi va zakazlar kam topiladi - ulush o'z-o'zidan
+        tiklanmaydi. Shuning uchun YIELD_PROBATION_HOURS dan keyin guruh oddiy rejimga
+        sinov uchun qaytadi: oyna nolga tushadi va ulush qaytadan o'lchanadi.
+        """
+        now = time.time() if now is None else now
+        rows = db.get_group_yield()
+        modes = {}
+
+        for row in rows:
+            group_id = row['group_id']
+            mode = row['mode'] or MODE_NORMAL
+
+            if not row['mode_manual']:
+                if mode != MODE_NORMAL and self.probation_due(row['mode_since'], now):
+                    db.set_group_mode(group_id, MODE_NORMAL, probation=True)
+                    logger.info(f"🔄 Guruh {group_id}: {mode} → sinov uchun {MODE_NORMAL}")
+                    mode = MODE_NORMAL
+                    continue
+
+                new_mode = self.policy_mode(row['recent_seen'], row['recent_forwarded'])
+                if new_mode != mode:
+                    db.set_group_mode(group_id, new_mode)
+                    logger.info(
+                        f"📉 Guruh {group_id} rejimi: {mode} → {new_mode} "
+                        f"({row['recent_forwarded']:.0f}/{row['recent_seen']:.0f} zakaz)"
+                    )
+                    mode = new_mode
+
+            if mode != MODE_NORMAL:
+                modes[group_id] = mode
+
+        self._modes = modes
+
+    @staticmethod
+    def probation_due(mode_since: float, now: float) -> bool:
+        """Avtomatik cheklangan guruhni sinovga qaytarish vaqti keldimi"""
+        hours = Config.YIELD_PROBATION_HOURS
+        return hours > 0 and now - (mode_since or 0) >= hours * 3600
+
+    @staticmethod
+    def policy_mode(seen: float, forwarded: float) -> str:
+        """Hisoblagichlar (so'nggi oynadagi tekshirilgan xabarlar) bo'yicha kerakli rejim"""
+        if seen < Config.YIELD_MIN_SAMPLES:
+            return MODE_NORMAL
+
+        ratio = forwarded / seen
+        if ratio < Config.YIELD_THROTTLE_BELOW:
+            return MODE_THROTTLED
+        if ratio < Config.YIELD_KEYWORD_ONLY_BELOW:
+            return MODE_KEYWORD_ONLY
+        return MODE_NORMAL
+
+    def invalidate(self):
+        """Rejimlar keshini tozalash (admin o'zgartirganda)"""
+        self._modes = None
+
+    def _load_modes(self):
+        """Rejimlarni DB dan yuklash"""
+        self._modes = {
+            row['group_id']: row['mode']
+            for row in db.get_group_yield()
+            if row['mode'] and row['mode'] != MODE_NORMAL
+        }
+
+
+# Singleton instance
+yield_tracker = GroupYieldTracker()
@@ -0,0 +1,166 @@
+"""
+Telegram Taxi Bot - Lifecycle
+SIGTERM/SIGINT'da muloyim to'xtatish: yangi xabarlar qabul qilinmaydi,
+ishlanayotganlari muddat ichida tugatiladi, so'ng hisoblagichlar va
+checkpoint'lar saqlanadi. Checkpoint - guruhdagi shunday message_id'ki, undan
+oldingi barcha xabarlar tugatilgan (xabarlar tartibsiz tugaydi - eng kichik
+tugatilmagan xabardan bittasi oldin). Qayta ishga tushganda checkpoint'dan
+keyingi xabarlar qayta ishlanadi.
+"""
+
+import asyncio
+import logging
+import signal
+import time
+
+import database as db
+
+logger = logging.getLogger("taxi_bot.lifecycle")
+
+
+class Lifecycle:
+    """To'xtatish signali, ishlanayotgan xabarlar va checkpoint'lar"""
+
+    FLUSH_INTERVAL = 30  # checkpoint'larni DB ga yozish oralig'i (s)
+
+    def __init__(self):
+        self.accepting = True
+        self.inflight = 0
+        self._stop = asyncio.Event()
+        self._main_task = None
+        self._finished = {}     # chat_id -> eng katta tugatilgan message_id (yozilmagan)
+        self._unfinished = {}   # chat_id -> boshlangan, hali tugamagan message_id'lar
+
+    # ============== SIGNALLAR ==============
+
+    def install_signal_handlers(self):
+        """SIGTERM/SIGINT - muloyim to'xtatish; ikkinchi signal - darhol"""
+        loop = asyncio.get_running_loop()
+        self._main_task = asyncio.current_task()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.request_stop, sig)
+            except (NotImplementedError, RuntimeError):
+                pass  # Windows - faqat KeyboardInterrupt
+
+    def request_stop(self, sig=None):
+        if self._stop.is_set():
+            logger.warning("⛔ Qayta signal - darhol to'xtatilmoqda")
+            if self._main_task:
+                self._main_task.cancel()
+            return
+        name = signal.Signals(sig).name if sig else "stop"
+        logger.info(f"🛑 {name}: yangi xabarlar qabul qilinmaydi, navbat tugatilmoqda...")
+        self.accepting = False
+        self._stop.set()
+
+    async def wait(self, tasks: list):
+        """To'xtatish signali kelguncha yoki barcha vazifalar tugaguncha kutish"""
+        stop_task = asyncio.create_task(self._stop.wait())
+        services = asyncio.gather(*tasks)
+        try:
+            await asyncio.wait([services, stop_task], return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            stop_task.cancel()
+        self.accepting = False
+        if services.done():
+            services.result()  # xizmat xatosi - avvalgidek yuqoriga
+        else:
+            # Xizmatlar keyin bekor qilinadi - natija kutilmaydi
+            services.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    # ============== ISHLANAYOTGAN XABARLAR ==============
+
+    def begin(self) -> bool:
+        """Xabar qayta ishlash boshlandi (to'xtatilayotgan bo'lsa - False)"""
+        if not self.accepting:
+            return False
+        self.inflight += 1
+        return True
+
+    def end(self):
+        self.inflight -= 1
+
+    async def drain(self, pending=None, timeout: float = 30) -> bool:
+        """Ishlanayotgan xabarlar (va `pending()` navbati) tugaguncha kutish
+
+        Returns:
+            True - hammasi tugadi, False - muddat o'tdi
+        """
+        deadline = time.monotonic() + timeout
+        while self.inflight or (pending and pending()):
+            if time.monotonic() >= deadline:
+                logger.warning(
+                    f"⏱ To'xtatish muddati tugadi: {self.inflight} ta xabar ishlanmoqda, "
+                    f"{pending() if pending else 0} ta navbatda"
+                )
+                return False
+            await asyncio.sleep(0.1)
+        return True
+
+    # ============== CHECKPOINT'LAR ==============
+
+    def track(self, chat_id: int, message_id: int):
+        """Xabarni qayta ishlash boshlandi (tugaguncha checkpoint undan oshmaydi)"""
+        self._unfinished.setdefault(chat_id, set()).add(message_id)
+
+    def checkpoint(self, chat_id: int, message_id: int):
+        """Xabar qayta ishlandi (yoki tashlab yuborildi - qayta urinilmaydi)"""
+        unfinished = self._unfinished.get(chat_id)
+        if unfinished is not None:
+            unfinished.discard(message_id)
+            if not unfinished:
+                del self._unfinished[chat_id]
+        if message_id > self._finished.get(chat_id, 0):
+            self._finished[chat_id] = message_id
+
+    def position(self, chat_id: int) -> int:
+        """Guruh checkpoint'i: eng kichik tugamagan xabardan oldingi, bo'lmasa eng katta tugatilgan"""
+        finished = self._finished.get(chat_id, 0)
+        unfinished = self._unfinished.get(chat_id)
+        if unfinished:
+            return min(finished, min(unfinished) - 1)
+        return finished
+
+    async def run(self):
+        """Fonda har FLUSH_INTERVAL da checkpoint'larni yozish (alohida thread'da)"""
+        while True:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            rows = self._rows()
+            try:
+                saved = rows and await asyncio.to_thread(db.save_checkpoints, rows)
+            except Exception as e:
+                logger.error(f"Checkpoint'larni yozishda xato: {e}")
+                saved = False
+            if saved:
+                self._saved(rows)
+
+    def flush(self):
+        """Checkpoint'larni darhol DB ga yozish (DB da kattarog'i qoladi)"""
+        rows = self._rows()
+        if rows and db.save_checkpoints(rows):
+            self._saved(rows)
+
+    def _rows(self) -> list:
+        rows = [(chat_id, self.position(chat_id)) for chat_id in self._finished]
+        return [(chat_id, message_id) for chat_id, message_id in rows if message_id > 0]
+
+    def _saved(self, rows: list):
+        """Yozilganlari xotiradan chiqariladi; tugamaganlari bor yoki yozish paytida
+        oldinga siljigan guruhlar keyingi safar ham hisoblanadi"""
+        for chat_id, message_id in rows:
+            if chat_id not in self._unfinished and self._finished.get(chat_id) == message_id:
+                del self._finished[chat_id]
+
+    def load(self, max_age: float) -> dict:
+        """So'nggi `max_age` soniyada yangilangan checkpoint'lar: {chat_id: message_id}"""
+        cutoff = time.time() - max_age
+        return {
+            chat_id: message_id
+            for chat_id, (message_id, updated_at) in db.get_checkpoints().items()
+            if updated_at >= cutoff
+        }
+
+
+# Singleton instance
+lifecycle = Lifecycle()
@@ -0,0 +1,218 @@
+"""
+Telegram Taxi Bot - Location Extractor
+Shahar va Toshkent tumanlari gazetteer'i (lotin va kirill yozuvdagi variantlar,
+keng tarqalgan xatolar) asosida xabardan yo'nalishni (qayerdan -> qayerga) AI'siz ajratish.
+Matn textnorm.normalize() orqali lotinga o'tkaziladi - kirill variantlari alohida kerak emas.
+"""
+
+import re
+
+from textnorm import normalize
+
+# Kanonik nom -> muqobil yozilishlar (normalize() ko'rinishida)
+GAZETTEER = {
+    # Shaharlar
+    "Toshkent": ["toshkent", "tashkent", "toshkemt", "tashkend"],
+    "Samarqand": ["samarqand", "samarkand", "samarqan", "samarkant"],
+    "Buxoro": ["buxoro", "buxara", "buhoro", "bukhara"],
+    "Andijon": ["andijon", "andijan", "andjon"],
+    "Farg'ona": ["farg'ona", "fargona", "fergana", "farg'ana"],
+    "Namangan": ["namangan"],
+    "Qarshi": ["qarshi", "karshi"],
+    "Navoiy": ["navoiy", "navoi"],
+    "Jizzax": ["jizzax", "jizzah", "jizax", "djizak"],
+    "Guliston": ["guliston", "gulistan"],
+    "Termiz": ["termiz", "termez"],
+    "Urganch": ["urganch", "urgench"],
+    "Nukus": ["nukus"],
+    "Xiva": ["xiva", "khiva", "hiva"],
+    "Shahrisabz": ["shahrisabz", "shaxrisabz"],
+    "Qo'qon": ["qo'qon", "qoqon", "kokand", "quqon"],
+    "Marg'ilon": ["marg'ilon", "margilon", "margilan"],
+    "Chirchiq": ["chirchiq", "chirchik"],
+    "Angren": ["angren"],
+    "Olmaliq": ["olmaliq", "almalyk", "almalik"],
+    "Bekobod": ["bekobod", "bekabad"],
+    "Yangiyo'l": ["yangiyo'l", "yangiyol", "yangiyul"],
+    "Kattaqo'rg'on": ["kattaqo'rg'on", "kattaqorgon", "kattakurgan"],
+    "Denov": ["denov", "denau"],
+    "Zarafshon": ["zarafshon", "zarafshan"],
+    "Nurafshon": ["nurafshon"],
+    "G'ijduvon": ["g'ijduvon", "gijduvon", "gijduvan"],
+    "Kogon": ["kogon", "kagan"],
+    "Chust": ["chust"],
+    "Asaka": ["asaka"],
+    "Quvasoy": ["quvasoy", "kuvasay"],
+    "Shovot": ["shovot"],
+    "Sirdaryo": ["sirdaryo", "syrdarya", "sirdarya"],
+    "Xorazm": ["xorazm", "horazm", "khorezm", "xorezm"],
+    "Qoraqalpog'iston": ["qoraqalpog'iston", "qoraqalpogiston", "karakalpakstan"],
+    # Toshkent tumanlari va mo'ljallar
+    "Chilonzor": ["chilonzor", "chilanzar", "chilonzr"],
+    "Sergeli": ["sergeli", "sergili"],
+    "Yunusobod": ["yunusobod", "yunusabad", "yunusobot"],
+    "Yakkasaroy": ["yakkasaroy", "yakkasaray"],
+    "Mirobod": ["mirobod", "mirabad"],
+    "Mirzo Ulug'bek": ["mirzo ulug'bek", "mirzo ulugbek", "mirzo-ulug'bek", "ulug'bek", "ulugbek"],
+    "Olmazor": ["olmazor", "almazar"],
+    "Shayxontohur": ["shayxontohur", "shayxontoxur", "shaykhantakhur", "shayxantaxur"],
+    "Uchtepa": ["uchtepa", "uchtepe"],
+    "Yashnobod": ["yashnobod", "yashnabad"],
+    "Bektemir": ["bektemir"],
+    "Yangihayot": ["yangihayot", "yangixayot"],
+    "Qo'yliq": ["qo'yliq", "qoyliq", "kuyluk", "kuylyuk"],
+    "Chorsu": ["chorsu"],
+    "Olmazor bozori": ["olmazor bozori"],
+    "Vokzal": ["vokzal"],
+    "Aeroport": ["aeroport", "airport"],
+    "Beruniy": ["beruniy", "beruni"],
+    "Qoraqamish": ["qoraqamish", "karakamish"],
+    "Keles": ["keles"],
+    "Zangiota": ["zangiota", "zangiata"],
+}
+
+# Manzildan keyingi qo'shimchalar: qayerdan / qayerga
+FROM_SUFFIXES = ("dan", "tan")
+TO_SUFFIXES = ("gacha", "ga", "ka", "qa")
+# Manzil va qo'shimcha orasida bo'lishi mumkin: kvartal raqami ("Chilonzor 9 dan")
+_GAP_RE = re.compile(r"[\s\-]*(?:\d+[\s\-]*(?:kv|kvartal|mavze)?\.?)?[\s\-]*")
+_ROUTE_SEPARATOR_RE = re.compile(r"^\s*(?:-+|–|—|→|->|>|=>|/)\s*$")
+_PASSENGERS_RE = re.compile(r"(\d)\s*(?:ta|kishi|odam|nafar)\b")
+_WORD_RE = re.compile(r"[a-z']*")
+_SUFFIXES = FROM_SUFFIXES + TO_SUFFIXES
+
+_END = "\0"
+
+
+def _build_trie(gazetteer: dict) -> dict:
+    trie = {}
+    for canonical, aliases in gazetteer.items():
+        for alias in aliases:
+            node = trie
+            for char in alias:
+                node = node.setdefault(char, {})
+            node[_END] = canonical
+    return trie
+
+
+_TRIE = _build_trie(GAZETTEER)
+
+
+def find_locations(text: str) -> list:
+    """Matndagi joy nomlari: [(boshi, oxiri, kanonik nom, qo'shimcha), ...]
+
+    Joy nomi so'z boshidan boshlanadi; eng uzun mos nom olinadi.
+    Qo'shimcha - "dan"/"ga" kabi (nomga qo'shilgan yoki alohida so'z), bo'lmasa "".
+    """
+    text = normalize(text)
+    found = []
+    i, n = 0, len(text)
+    while i < n:
+        if not text[i].isalpha() or (i and text[i - 1].isalpha()):
+            i += 1
+            continue
+
+        node, j, match = _TRIE, i, None
+        while j < n and text[j] in node:
+            node = node[text[j]]
+            j += 1
+            if _END in node:
+                match = (j, node[_END])
+
+        if not match:
+            i += 1
+            continue
+
+        end, canonical = match
+        suffix = ""
+        # Qo'shimcha nomga yopishgan: "samarqanddan", "toshkentga"
+        tail = _WORD_RE.match(text, end).group()
+        if tail:
+            if tail not in _SUFFIXES:
+                # Boshqa so'z ("toshkentlik", "buxoroliklar") - yo'nalish emas
+                i = end
+                continue
+            suffix = tail
+            end += len(tail)
+        else:
+            # Alohida so'z: "Chilonzor 9 dan", "Sergeli ga"
+            gap = _GAP_RE.match(text, end).end()
+            word = _WORD_RE.match(text, gap).group()
+            if word in _SUFFIXES:
+                suffix = word
+                end = gap + len(word)
+
+        found.append((i, end, canonical, suffix))
+        i = end
+    return found
+
+
+def extract_route(text: str) -> dict:
+    """Xabardan yo'nalishni ajratish
+
+    Returns:
+        dict: {"from_location", "to_location", "passengers"} - topilmaganlari None
+    """
+    route = {"from_location": None, "to_location": None, "passengers": None}
+    if not text:
+        return route
+
+    prepared = normalize(text)
+    locations = find_locations(prepared)
+    rest = []
+    for start, end, canonical, suffix in locations:
+        if suffix in FROM_SUFFIXES and not route["from_location"]:
+            route["from_location"] = canonical
+        elif suffix in TO_SUFFIXES and not route["to_location"]:
+            route["to_location"] = canonical
+        else:
+            rest.append((start, end, canonical))
+
+    # "Toshkent-Samarqand", "Toshkent → Samarqand"
+    if not route["from_location"] and not route["to_location"]:
+        for (s1, e1, c1), (s2, e2, c2) in zip(rest, rest[1:]):
+            if c1 != c2 and _ROUTE_SEPARATOR_RE.match(prepared[e1:s2]):
+                route["from_location"], route["to_location"] = c1, c2
+                break
+    # Bittasi qo'shimchali, ikkinchisi qo'shimchasiz: "Samarqanddan Toshkent"
+    elif rest:
+        other = next((c for _, _, c in rest if c not in (route["from_location"], route["to_location"])), None)
+        if route["from_location"] and not route["to_location"]:
+            route["to_location"] = other
+        elif route["to_location"] and not route["from_location"]:
+            route["from_location"] = other
+
+    match = _PASSENGERS_RE.search(prepared)
+    if match:
+        route["passengers"] = match.group(1)
+    return route
+
+
+def is_complete(route: dict) -> bool:
+    """Yo'nalish to'liq aniqlanganmi (qayerdan va qayerga)"""
+    return bool(route and route.get("from_location") and route.get("to_location"))
+
+
+def is_same_place(value, canonical: str) -> bool:
+    """Qiymat faqat shu joy nomining boshqa yozilishimi ("Tashkent", "Toshkentdan")
+
+    Aniqroq manzil ("Chilonzor 9", "Toshkent, Chorsu") - False.
+    """
+    if not value or not isinstance(value, str):
+        return False
+    text = normalize(value).strip(" .,-")
+    found = find_locations(text)
+    return len(found) == 1 and found[0][2] == canonical and found[0][0] == 0 and found[0][1] == len(text)
+
+
+def apply_route(order_data: dict, route: dict) -> dict:
+    """Lokal topilgan yo'nalishni AI ma'lumotlariga qo'shish
+
+    Faqat bo'sh maydonlar to'ldiriladi; AI qiymati shu joyning boshqa yozilishi
+    bo'lsa - kanonik nomga almashtiriladi. Aniqroq AI qiymati ("Chilonzor 9") qoladi.
+    """
+    order_data = dict(order_data or {})
+    for key, value in route.items():
+        if value and (not order_data.get(key) or (key != "passengers" and is_same_place(order_data[key], value))):
+            order_data[key] = value
+    return order_data
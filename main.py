@@ -7,17 +7,33 @@ import asyncio
 import logging
 import sys
 import re
+import time
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 from aiogram.fsm.storage.memory import MemoryStorage
 from telethon import TelegramClient, events
+from telethon.errors import (
+    FloodWaitError, UserDeactivatedBanError, UserDeactivatedError, AuthKeyUnregisteredError
+)
 
 from config import Config
 import database as db
 from admin_handlers import router
 from ai_classifier import classifier
-from utils import setup_logging, format_order_message, truncate_text
+from ai_usage import usage_tracker
+from alerts import alerts, AlertManager
+from group_yield import yield_tracker
+from session_pool import SessionPool
+from workers import WorkerPool
+from outbox import OutboxSender
+from entity_cache import entity_resolver, import_dialogs
+from event_log import event_log
+from lifecycle import lifecycle
+from maintenance import maintenance_loop
+import pipeline
+from textnorm import normalize, find_keyword
+from utils import setup_logging, extract_order_fields
 
 # Logging
 logger = setup_logging()
@@ -27,12 +43,42 @@ class TaxiUserbot:
     """Xabar kuzatish (Telethon) va Bot orqali yuborish"""
     
     def __init__(self, admin_bot=None):
-        self.client = None
+        self.pool = SessionPool(Config.SESSION_NAMES)
+        self.workers = None  # WorkerPool (WORKER_PROCESSES > 0 bo'lsa)
+        self.outbox = OutboxSender(self._send_to_target)
+        self.outbox_task = None
+        self.resolve_task = None
+        self.catch_up_task = None
+        self._handoff_tasks = set()  # akkaunt cheklangani uchun qayta ishlanadigan xabarlar
         self.admin_bot = admin_bot  # aiogram Bot instance
         self.processed_count = 0
         self.forwarded_count = 0
         self.filtered_count = 0
     
+    @property
+    def client(self):
+        """Asosiy (yuborish uchun) client - birinchi mavjud akkaunt"""
+        return self.pool.primary()
+    
+    def _account_of(self, client) -> str:
+        """Client qaysi akkauntga tegishli"""
+        for name, c in self.pool.clients.items():
+            if c is client:
+                return name
+        return None
+    
+    def _handle_account_error(self, account: str, error: Exception) -> bool:
+        """FloodWait / ban xatolarida akkauntni pul'dan chetlatish"""
+        if not account:
+            return False
+        if isinstance(error, FloodWaitError):
+            self.pool.mark_flood(account, error.seconds)
+            return True
+        if isinstance(error, (UserDeactivatedBanError, UserDeactivatedError, AuthKeyUnregisteredError)):
+            self.pool.mark_banned(account)
+            return True
+        return False
+    
     async def start(self):
         """Userbot ishga tushirish"""
         
@@ -42,87 +88,100 @@ class TaxiUserbot:
             logger.warning(f"⚠️ Userbot sozlanmagan: {e}")
             return
         
-        self.client = TelegramClient(
-            Config.SESSION_NAME,
-            Config.API_ID,
-            Config.API_HASH
-        )
+        logger.info(f"📱 Userbot ulanmoqda... ({len(Config.SESSION_NAMES)} ta akkaunt)")
         
-        logger.info("📱 Userbot ulanmoqda...")
+        for session_name in Config.SESSION_NAMES:
+            client = TelegramClient(
+                session_name,
+                Config.API_ID,
+                Config.API_HASH
+            )
+            
+            try:
+                await client.start(phone=Config.session_phone(session_name))
+                me = await client.get_me()
+                logger.info(f"✅ Userbot [{session_name}]: {me.first_name} (@{me.username or 'yoq'})")
+            except Exception as e:
+                logger.error(f"❌ Userbot xatosi [{session_name}]: {e}")
+                continue
+            
+            self.pool.add_client(session_name, client)
         
-        try:
-            await self.client.start(phone=Config.PHONE_NUMBER)
-            me = await self.client.get_me()
-            logger.info(f"✅ Userbot: {me.first_name} (@{me.username or 'yoq'})")
-        except Exception as e:
-            logger.error(f"❌ Userbot xatosi: {e}")
+        if not self.pool.clients:
             return
         
-        # Optionally import all joined groups into monitored source groups
-        if Config.IMPORT_JOINED_GROUPS:
+        # Har bir akkaunt a'zo bo'lgan guruhlar (guruhlarni faqat a'zolarga taqsimlash uchun)
+        need_dialogs = len(self.pool.clients) > 1 or Config.IMPORT_JOINED_GROUPS
+        for session_name, client in (self.pool.clients.items() if need_dialogs else ()):
             try:
-                imported = 0
-                logger.info("🔎 Importing joined groups into monitored list...")
-                async for dialog in self.client.iter_dialogs():
-                    try:
-                        entity = dialog.entity
-                        # Only consider entities that look like chats/channels (have a title)
-                        title = getattr(entity, 'title', None)
-                        if not title:
-                            continue
-                        group_id = getattr(entity, 'id', None)
-                        if group_id is None:
-                            continue
-                        # Add to DB (db.add_source_group should handle duplicates)
-                        if db.add_source_group(group_id=group_id, title=title, added_by=0):
-                            imported += 1
-                    except Exception:
-                        # skip problematic dialogs
-                        continue
-                logger.info(f"🔔 Imported {imported} joined groups into monitored list")
+                result = await import_dialogs(
+                    client,
+                    import_groups=Config.IMPORT_JOINED_GROUPS,
+                    on_group=lambda chat_id, name=session_name: self.pool.add_member(name, chat_id),
+                    label=session_name,
+                )
+                if Config.IMPORT_JOINED_GROUPS:
+                    logger.info(f"🔔 [{session_name}] Imported {result['imported']} joined groups into monitored list")
             except Exception as e:
-                logger.warning(f"Importing joined groups failed: {e}")
+                logger.warning(f"[{session_name}] Dialoglarni o'qishda xato: {e}")
 
+        # Worker process'lar (filtrlash va klassifikatsiya uchun)
+        if Config.WORKER_PROCESSES > 0:
+            self.workers = WorkerPool(Config.WORKER_PROCESSES, self._handle_result)
+            self.workers.start()
+        
+        # Yuborish navbati (oldingi ishga tushirishdan qolganlari ham)
+        self.outbox_task = asyncio.create_task(self.outbox.run())
+        
+        started_at = time.time()
         self._setup_handlers()
         await self._check_groups()
         
+        # Oldingi ishga tushirishda (deploy vaqtida) o'tkazib yuborilgan xabarlar
+        self.catch_up_task = asyncio.create_task(self._catch_up(started_at))
+        
         logger.info("🟢 Userbot ishlamoqda...")
     
     def _setup_handlers(self):
-        """Handler'lar"""
+        """Handler'lar (har bir akkaunt uchun)"""
         
-        @self.client.on(events.NewMessage())
-        async def handle_message(event):
-            await self._process_message(event)
+        for session_name, client in self.pool.clients.items():
+            def make_handler(account):
+                async def handle_message(event):
+                    await self._process_message(event, account)
+                return handle_message
+            
+            client.add_event_handler(make_handler(session_name), events.NewMessage())
     
     async def _check_groups(self):
-        """Guruhlarni tekshirish"""
+        """Guruhlarni tekshirish - keshdan darhol, Telegram'dan fonda"""
         
         source_groups = db.get_active_group_ids()
-        target_group = db.get_target_group()
+        target_groups = db.get_target_groups()
         
         logger.info(f"📋 Kuzatiladigan guruhlar: {len(source_groups)}")
+        for target_group in target_groups:
+            logger.info(f"📤 Target: {entity_resolver.title(target_group, str(target_group))}")
         
-        for group_id in source_groups:
-            try:
-                entity = await self.client.get_entity(group_id)
-                title = getattr(entity, 'title', str(group_id))
-                logger.info(f"   ✓ {title}")
-                db.add_source_group(group_id, title)
-            except Exception as e:
-                logger.warning(f"   ✗ {group_id} - {e}")
-        
-        if target_group:
-            try:
-                entity = await self.client.get_entity(target_group)
-                title = getattr(entity, 'title', str(target_group))
-                logger.info(f"📤 Target: {title}")
-            except:
-                pass
+        self.resolve_task = asyncio.create_task(self._resolve_groups(source_groups + target_groups))
+    
+    async def _resolve_groups(self, group_ids: list):
+        """Guruh nomlarini Telegram'dan yangilash (fon vazifasi)"""
+        try:
+            result = await entity_resolver.resolve(self.client, group_ids)
+            logger.info(
+                f"✅ Guruhlar tekshirildi: {result['resolved']} yangilandi, "
+                f"{result['cached']} keshdan, {result['failed']} xato"
+            )
+        except Exception as e:
+            logger.error(f"Guruhlarni tekshirishda xato: {e}")
     
-    async def _process_message(self, event):
+    async def _process_message(self, event, account: str = None):
         """Xabarni qayta ishlash"""
         
+        # To'xtatilmoqda - yangi xabar olinmaydi (checkpoint'dan keyin qayta ishlanadi)
+        if not lifecycle.begin():
+            return
         try:
             chat_id = event.chat_id
             source_groups = db.get_active_group_ids()
@@ -130,201 +189,204 @@ class TaxiUserbot:
             if chat_id not in source_groups:
                 return
             
-            message = event.message
-            
-            # Stiker bo'lsa o'tkazib yuborish
-            if message.sticker:
-                return
-            
-            # Media bo'lsa va matn yo'q bo'lsa o'tkazib yuborish
-            if message.media and not message.text:
-                return
-            
-            text = message.text or message.message or ""
-            
-            if not text or len(text) < 10:
-                return
+            # Guruh bir nechta akkauntda bo'lsa - faqat egasi qayta ishlaydi
+            if account:
+                self.pool.add_member(account, chat_id)
+                if not self.pool.owns(account, chat_id):
+                    return
             
-            # 50 belgidan ko'p bo'lsa o'tkazib yuborish (OpenAI tejash)
-            if len(text) > 50:
-                return
+            await self._prepare_and_dispatch(event.message)
             
-            # Faqat emoji bo'lsa o'tkazib yuborish
-            import re
-            text_without_emoji = re.sub(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002702-\U000027B0\U0001F900-\U0001F9FF\s]+', '', text)
-            if len(text_without_emoji) < 5:
+        except Exception as e:
+            if self._handle_account_error(account, e):
+                # Xabar tashlab yuborilmaydi - boshqa akkaunt yoki cheklov tugagach qayta
+                self._handoff(event.chat_id, event.message, account, getattr(e, "seconds", None))
                 return
-            
-            chat = await event.get_chat()
-            sender = await event.get_sender()
-            
-            # Foydalanuvchi ID olish
-            sender_id = sender.id if sender else 0
-            
-            # Bloklangan foydalanuvchini tekshirish
-            if sender_id and db.is_blocked(sender_id):
-                logger.debug(f"Bloklangan: {sender_id}")
+            lifecycle.checkpoint(event.chat_id, event.message.id)
+            logger.error(f"Xato: {e}")
+            alerts.report(e, "process_message", entity_resolver.title(event.chat_id, str(event.chat_id)))
+        finally:
+            lifecycle.end()
+    
+    def _handoff(self, chat_id: int, message, account: str, wait: float = None):
+        """Cheklangan akkaunt xabarini fonda qayta ishlashga berish"""
+        task = asyncio.create_task(self._retry_message(chat_id, message.id, account, wait))
+        self._handoff_tasks.add(task)
+        task.add_done_callback(self._handoff_tasks.discard)
+    
+    async def _retry_message(self, chat_id: int, message_id: int, account: str, wait: float = None):
+        """Xabarni guruhning yangi egasi orqali olib qayta ishlash; boshqa akkaunt
+        bo'lmasa - FloodWait (`wait`) tugagach shu akkaunt orqali"""
+        owner = self.pool.owner(chat_id)
+        if owner in (None, account):
+            if wait is None:
+                logger.warning(f"⚠️ {chat_id}:{message_id} - xabarni qayta ishlash uchun akkaunt yo'q")
+                lifecycle.checkpoint(chat_id, message_id)
                 return
-            
-            # Kunlik limit tekshirish (Endi cheklanmagan)
-            # if sender_id and not db.check_user_daily_limit(sender_id):
-            #     logger.debug(f"Limit tugagan: {sender_id}")
-            #     return
-            
-            # Kalit so'zlar bilan tekshirish
-            text_lower = text.lower()
-            
-            # 1. Haydovchi so'zlari (IGNORE)
-            driver_keywords = db.get_keywords('driver')
-            for k in driver_keywords:
-                if k['word'] in text_lower:
-                    return
-            
-            # 2. Yo'lovchi so'zlari (FORCE ORDER)
-            passenger_keywords = db.get_keywords('passenger')
-            is_forced_order = False
-            for k in passenger_keywords:
-                if k['word'] in text_lower:
-                    is_forced_order = True
-                    break
-            
-            self.processed_count += 1
-            
-            chat_title = getattr(chat, 'title', 'Unknown')
-            sender_name = self._get_sender_name(sender)
-            
-            # AI klassifikatsiya yoki Keyword orqali
-            if is_forced_order:
-                is_ord = True
-                order_type = "passenger_order"
-                # AI dan faqat ma'lumot olish uchun foydalanamiz, lekin order aniqligi 100%
-                _, _, order_data = await classifier.is_order(text)
-                if not order_data:
-                    order_data = {}
-            else:
-                is_ord, order_type, order_data = await classifier.is_order(text)
-            
-            if is_ord:
-                # Zakaz sonini oshirish
-                if sender_id:
-                    db.increment_user_order_count(sender_id)
-                await self._forward_order(event, order_data, order_type, chat_title, sender_name)
+            await asyncio.sleep(wait)
+            owner = account
+        client = self.pool.clients.get(owner)
+        if not client or not lifecycle.begin():
+            return  # to'xtatilmoqda - checkpoint shu xabardan oshmaydi
+        try:
+            message = await client.get_messages(chat_id, ids=message_id)
+            if message:
+                await self._prepare_and_dispatch(message)
+                logger.info(f"🔀 {chat_id}:{message_id} {owner} orqali qayta ishlandi")
             else:
-                logger.debug(f"Boshqa xabar: {truncate_text(text, 40)}")
-            
-            db.update_stats(processed=1)
-            
+                lifecycle.checkpoint(chat_id, message_id)  # o'chirilgan
         except Exception as e:
-            logger.error(f"Xato: {e}")
+            lifecycle.checkpoint(chat_id, message_id)
+            if not self._handle_account_error(owner, e):
+                logger.error(f"🔀 {chat_id}:{message_id} qayta ishlashda xato: {e}")
+        finally:
+            lifecycle.end()
+    
+    async def _prepare_and_dispatch(self, message):
+        """Arzon filtrlar, so'ng guruh/yuboruvchini olish va pipeline'ga berish"""
+        msg = pipeline.message_fields(message)
+        # Natija kelguncha (worker rejimida - keyinroq) checkpoint shu xabardan oshmaydi
+        lifecycle.track(msg["chat_id"], msg["message_id"])
+        
+        # Stiker, media, uzunlik, emoji - get_chat/get_sender so'rovlarisiz tushiriladi
+        # (decide shu filtrda tugaydi: faqat hisoblagichlar va jurnal)
+        if pipeline.content_filter(msg):
+            await self._handle_result(msg, await pipeline.decide(msg))
+            return
+        
+        await pipeline.resolve_entities(msg, message)
+        await self._dispatch(msg)
+    
+    async def _dispatch(self, msg: dict):
+        """Normalizatsiya qilingan xabarni pipeline'ga berish"""
+        # Worker rejimi - filtrlash va klassifikatsiya alohida process'larda
+        if self.workers:
+            self.workers.submit(msg)
+            return
+        
+        result = await pipeline.decide(msg)
+        await self._handle_result(msg, result)
+    
+    async def _catch_up(self, started_at: float):
+        """Checkpoint'dan keyingi, shu ishga tushirishdan oldin kelgan xabarlarni qayta ishlash
+        
+        Takror zakaz bo'lmaydi: outbox manba xabar kaliti bo'yicha noyob.
+        """
+        checkpoints = lifecycle.load(Config.CATCHUP_MAX_AGE)
+        if not checkpoints:
+            return
+        
+        source_groups = set(db.get_active_group_ids())
+        total = 0
+        for chat_id, last_id in checkpoints.items():
+            if chat_id not in source_groups:
+                continue
+            account = self.pool.owner(chat_id)
+            client = self.pool.clients.get(account)
+            if not client:
+                continue
+            try:
+                # Eskisidan boshlab: limitdan ko'p bo'lsa checkpoint'ga yaqinlari qayta ishlanadi
+                messages = await client.get_messages(
+                    chat_id, min_id=last_id, limit=Config.CATCHUP_LIMIT, reverse=True
+                )
+            except Exception as e:
+                if not self._handle_account_error(account, e):
+                    logger.warning(f"⏪ {chat_id}: o'tkazib yuborilgan xabarlarni olishda xato: {e}")
+                continue
+            if len(messages) >= Config.CATCHUP_LIMIT:
+                logger.warning(
+                    f"⏪ {chat_id}: CATCHUP_LIMIT ({Config.CATCHUP_LIMIT}) ga yetdi - "
+                    f"{messages[-1].id} dan keyingi o'tkazib yuborilgan xabarlar qayta ishlanmaydi"
+                )
+            
+            for message in messages:
+                # Ishga tushgandan keyingilarini handler qayta ishlaydi
+                if message.date and message.date.timestamp() >= started_at:
+                    break
+                if not lifecycle.begin():
+                    return
+                try:
+                    await self._prepare_and_dispatch(message)
+                    total += 1
+                except Exception as e:
+                    lifecycle.checkpoint(chat_id, message.id)
+                    logger.error(f"⏪ {chat_id}:{message.id} qayta ishlashda xato: {e}")
+                finally:
+                    lifecycle.end()
+        
+        if total:
+            logger.info(f"⏪ Checkpoint'dan keyin {total} ta o'tkazib yuborilgan xabar qayta ishlandi")
+    
+    async def _handle_result(self, msg: dict, result: dict):
+        """Pipeline qarorini bajarish (worker'lardan ham shu yerga keladi)"""
+        if result.get("processed"):
+            self.processed_count += 1
+        lifecycle.checkpoint(msg["chat_id"], msg["message_id"])
+        if result["reason"] == "error":
+            alerts.report(result.get("error", "Worker xatosi"), "worker", msg["chat_title"])
+        
+        delivery = order_id = None
+        if result["action"] == pipeline.FORWARD:
+            delivery, order_id = await self._forward_order(msg, result)
+        event_log.message(msg, result, delivery, order_id)
     
-    async def _forward_order(self, event, order_data, order_type, chat_title, sender_name):
-        """Buyurtmani yuborish - Bot token orqali inline tugmalar bilan"""
+    async def _forward_order(self, msg: dict, result: dict) -> tuple[str, int | None]:
+        """Buyurtmani saqlash va barcha target guruhlarga yuborish navbatiga qo'yish
+        
+        Returns:
+            (natija, zakaz ID): "queued" | "no_targets" | "no_bot" | "not_queued" (takror yoki DB xatosi)
+        """
         
         target_groups = db.get_target_groups()
         if not target_groups:
             logger.warning("Target guruhlar sozlanmagan!")
-            return
+            return "no_targets", None
         
         if not self.admin_bot:
             logger.error("Admin bot sozlanmagan!")
-            return
+            return "no_bot", None
+        
+        # Zakaz va (zakaz, target) juftliklari bitta tranzaksiyada saqlanadi -
+        # yuborish OutboxSender'da, xato yoki qayta ishga tushishda ham yo'qolmaydi
+        order_id = db.enqueue_order(
+            source_key=f"{msg['chat_id']}:{msg['message_id']}",
+            message=result["formatted"],
+            target_ids=target_groups,
+            user_id=msg["sender_id"],
+            user_name=msg["sender_name"],
+            phone=result["phone"],
+            message_text=msg["text"],
+            chat_id=msg["chat_id"],
+            chat_title=msg["chat_title"],
+            fields=extract_order_fields(result.get("order_data"), result.get("order_type"))
+        )
+        if order_id is None:
+            return "not_queued", None
         
+        self.outbox.notify()
+        self.forwarded_count += 1
+        db.update_stats(forwarded=1)
+        yield_tracker.record(msg["chat_id"], forwarded=1)
+        logger.info("✅ Navbatga qo'yildi (#%s): %.40s", order_id, msg['text'])
+        return "queued", order_id
+    
+    async def _send_to_target(self, target_id: int, message: str):
+        """Bitta target guruhga yuborish (akkaunt orqali) - OutboxSender uchun"""
+        client = self.client
+        if not client:
+            raise RuntimeError("Userbot ulanmagan")
         try:
-            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-            import re
-            
-            message = event.message
-            original_text = message.text or ""
-            chat = await event.get_chat()
-            sender = await event.get_sender()
-            
-            # Bot nomi
-            bot_name = "Taksichi Brat"
-            
-            # Foydalanuvchi nomi
-            user_name = sender_name
-            
-            # Xabar matni (qisqa)
-            short_text = original_text[:100] if len(original_text) > 100 else original_text
-            
-            # Vaqt
-            from datetime import datetime
-            time_str = datetime.now().strftime("%I:%M:%S %p") + " Uzbekistan Standard Time"
-            
-            # Telefon raqamini topish
-            phone = None
-            if order_data and order_data.get("phone"):
-                phone = order_data["phone"]
-            
-            # Agar AI topilmagansa, regex orqali izlash
-            if not phone:
-                # Xabardan telefon izlash - turli formatlarni qo'llab-quvvatlash
-                # +998901234567, 998901234567, 901234567, +9 98 90 123 45 67 va h.k.
-                phone_patterns = [
-                    r'\+998\s*\d{2}\s*\d{3}\s*\d{2}\s*\d{2}',  # +998 90 123 45 67
-                    r'\+998\d{9}',  # +998901234567
-                    r'998\d{9}',    # 998901234567
-                    r'(?<!\d)\d{9}(?!\d)',  # 901234567 (9 raqam)
-                ]
-                
-                for pattern in phone_patterns:
-                    phone_match = re.search(pattern, original_text.replace(" ", ""))
-                    if phone_match:
-                        phone = phone_match.group()
-                        break
-            
-            # Telefon raqamini formatlash
-            if phone:
-                phone_clean = re.sub(r'[^\d+]', '', phone)
-                if not phone_clean.startswith('+'):
-                    if phone_clean.startswith('998'):
-                        phone_clean = '+' + phone_clean
-                    elif len(phone_clean) == 9:
-                        phone_clean = '+998' + phone_clean
-            else:
-                phone_clean = None
-            
-            # Sender link
-            user_link = user_name
-            if sender:
-                if hasattr(sender, 'username') and sender.username:
-                    user_link = f"[{user_name}](https://t.me/{sender.username})"
-                elif hasattr(sender, 'id'):
-                    user_link = f"[{user_name}](tg://user?id={sender.id})"
-
-            # Xabar formatlash - Rasmda ko'rsatilgan format
-            if sender_id:
-                user_link = f"tg://user?id={sender_id}"
-                formatted = f"👤 [{user_name}]({user_link})"
-            else:
-                formatted = f"👤 {user_name}"
-                
-            if sender and hasattr(sender, 'username') and sender.username:
-                formatted += f" (@{sender.username})"
-            
-            formatted += f"\n\n💬 {short_text}\n\n"
-            
-            if phone_clean:
-                formatted += f"📞 {phone_clean}"
-            # Raqam yo'q bo'lsa, hech qanday yozuv chiqmaydi
-            
-            # Barcha target guruhlarga yuborish (Endi akkaunt orqali)
-            for target_group in target_groups:
-                try:
-                    await self.client.send_message(
-                        entity=target_group,
-                        message=formatted,
-                        parse_mode='md'  # Markdown linklar ishlashi uchun
-                    )
-                except Exception as e:
-                    logger.error(f"Guruhga yuborishda xato ({target_group}): {e}")
-            
-            self.forwarded_count += 1
-            db.update_stats(forwarded=1)
-            logger.info(f"✅ Akkaunt orqali yuborildi: {truncate_text(original_text, 40)}")
-            
+            await client.send_message(
+                entity=target_id,
+                message=message,
+                parse_mode='md'  # Markdown linklar ishlashi uchun
+            )
         except Exception as e:
-            logger.error(f"Yuborishda xato: {e}", exc_info=True)
+            # FloodWait/ban - boshqa mavjud akkaunt orqali qayta urinish
+            if self._handle_account_error(self._account_of(client), e) and self.client not in (None, client):
+                return await self._send_to_target(target_id, message)
+            raise
     
     def _get_sender_name(self, sender):
         if not sender:
@@ -411,22 +473,15 @@ class TaxiUserbot:
             # if sender_id and not db.check_user_daily_limit(sender_id):
             #     return
             
-            # Kalit so'zlar bilan tekshirish
-            text_lower = text.lower()
+            # Kalit so'zlar bilan tekshirish (lotin/kirill farqisiz)
+            text_norm = normalize(text)
             
             # 1. Haydovchi so'zlari (IGNORE)
-            driver_keywords = db.get_keywords('driver')
-            for k in driver_keywords:
-                if k['word'] in text_lower:
-                    return
+            if find_keyword(text_norm, db.get_keyword_words('driver')):
+                return
             
             # 2. Yo'lovchi so'zlari (FORCE ORDER)
-            passenger_keywords = db.get_keywords('passenger')
-            is_forced_order = False
-            for k in passenger_keywords:
-                if k['word'] in text_lower:
-                    is_forced_order = True
-                    break
+            is_forced_order = bool(find_keyword(text_norm, db.get_keyword_words('passenger')))
             
             chat_title = getattr(chat, 'title', 'Unknown')
             sender_name = self._get_sender_name(sender)
@@ -435,11 +490,11 @@ class TaxiUserbot:
             if is_forced_order:
                 is_ord = True
                 order_type = "passenger_order"
-                _, _, order_data = await classifier.is_order(text)
+                _, _, order_data = await classifier.is_order(text, message.chat_id)
                 if not order_data:
                     order_data = {}
             else:
-                is_ord, order_type, order_data = await classifier.is_order(text)
+                is_ord, order_type, order_data = await classifier.is_order(text, message.chat_id)
             
             if is_ord:
                 if sender_id:
@@ -450,6 +505,7 @@ class TaxiUserbot:
             
         except Exception as e:
             logger.error(f"Polled xabar xatosi: {e}")
+            alerts.report(e, "polling")
     
     async def _forward_polled_order(self, message, order_data, order_type, chat_title, sender_name):
         """Polling orqali olingan zakazni yuborish"""
@@ -526,21 +582,53 @@ class TaxiUserbot:
             
             self.forwarded_count += 1
             db.update_stats(forwarded=1)
-            logger.info(f"✅ Polling (Akkaunt): {truncate_text(original_text, 40)}")
+            logger.info("✅ Polling (Akkaunt): %.40s", original_text)
             
         except Exception as e:
             logger.error(f"Polling yuborish xatosi: {e}")
+            alerts.report(e, "polling_send")
+    
+    async def shutdown(self, timeout: float):
+        """Muloyim to'xtatish: navbatni tugatish, yuborishni to'xtatish, holatni saqlash"""
+        deadline = time.monotonic() + timeout
+        lifecycle.accepting = False
+        
+        # Ishlanayotgan (va worker navbatidagi) xabarlar - muddat ichida
+        drained = await lifecycle.drain(lambda: self.workers.pending if self.workers else 0, timeout)
+        for task in (self.catch_up_task, self.resolve_task, *self._handoff_tasks):
+            if task:
+                task.cancel()
+        if self.workers:
+            await self.workers.stop(max(deadline - time.monotonic(), 1))
+        
+        # Yuborilmagan xabarlar outbox'da qoladi - keyingi ishga tushishda davom etadi
+        if self.outbox_task:
+            self.outbox.stop()
+            done, _ = await asyncio.wait([self.outbox_task], timeout=max(deadline - time.monotonic(), 1))
+            if not done:
+                self.outbox_task.cancel()
+        
+        lifecycle.flush()
+        yield_tracker.flush()
+        for client in self.pool.clients.values():
+            await client.disconnect()
+        logger.info(f"💾 Holat saqlandi ({'navbat tugatildi' if drained else 'muddat tugadi'})")
     
     async def run_forever(self):
         """Doimiy ishlash"""
-        if self.client:
+        if self.pool.clients:
             # Polling o'chirildi - faqat event handler ishlatiladi
-            await self.client.run_until_disconnected()
+            await asyncio.gather(*(
+                client.run_until_disconnected() for client in self.pool.clients.values()
+            ))
 
 
 async def run_admin_bot(bot, userbot=None):
     """Admin panel bot"""
     
+    # Adminlar keshini yuklash
+    db.load_admins_cache()
+    
     dp = Dispatcher(storage=MemoryStorage())
     # Userbot clientni handlerlarga o'tkazish
     dp["userbot"] = userbot
@@ -568,6 +656,9 @@ async def main():
     logger.info("🚕 Telegram Taxi Bot ishga tushirilmoqda...")
     logger.info("=" * 50)
     
+    # SIGTERM/SIGINT - muloyim to'xtatish (navbat tugatiladi, holat saqlanadi)
+    lifecycle.install_signal_handlers()
+    
     # Bot yaratish
     bot = None
     try:
@@ -597,16 +688,44 @@ async def main():
         logger.error("❌ Hech qanday xizmat ishga tushmadi!")
         return
     
+    # Database texnik xizmati (arxivlash, ANALYZE/VACUUM) - fonda
+    maintenance_task = asyncio.create_task(maintenance_loop())
+    # Checkpoint'lar, AI sarfi va guruh hisoblagichlari - fonda, alohida thread'da DB ga
+    checkpoint_task = asyncio.create_task(lifecycle.run())
+    usage_task = asyncio.create_task(usage_tracker.run())
+    yield_task = asyncio.create_task(yield_tracker.run())
+    
+    # Xatolar adminlarga yig'ma xabar bilan (ALERT_INTERVAL ichida ko'pi bilan bitta)
+    alerts_task = asyncio.create_task(alerts.run(bot)) if bot else None
+    
     logger.info("\n" + "=" * 50)
     logger.info("🟢 Barcha xizmatlar ishlamoqda!")
     logger.info("Admin botga /start yuboring")
-    logger.info("To'xtatish: Ctrl+C")
+    logger.info("To'xtatish: Ctrl+C yoki bash stop.sh")
     logger.info("=" * 50 + "\n")
     
     try:
-        await asyncio.gather(*tasks)
+        await lifecycle.wait(tasks)
     except asyncio.CancelledError:
         pass
+    finally:
+        # Ikkinchi signal (main task bekor qilinadi) - kutmasdan chiqish
+        await userbot.shutdown(Config.SHUTDOWN_TIMEOUT)
+        maintenance_task.cancel()
+        checkpoint_task.cancel()
+        usage_task.cancel()
+        yield_task.cancel()
+        for task in tasks:
+            task.cancel()
+        for result in await asyncio.gather(*tasks, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Xizmat xato bilan tugadi: {result}")
+        usage_tracker.flush()
+        event_log.close()
+        if alerts_task:
+            alerts.stop()
+            await asyncio.wait([alerts_task], timeout=AlertManager.SEND_TIMEOUT)
+        logger.info("👋 Bot to'xtatildi")
 
 
 if __name__ == "__main__":
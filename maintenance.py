@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Telegram Taxi Bot - Database Maintenance
+Eski zakazlarni arxivlash, outbox'ni tozalash, ANALYZE va VACUUM.
+
+Bot ichida kuniga bir marta fonda ishlaydi (VACUUM'siz); qo'lda ham ishga tushirish mumkin:
+    python maintenance.py [--vacuum]
+VACUUM butun database'ni qulflaydi (yozuvlar "database is locked" bilan yo'qoladi) -
+faqat bot to'xtatilganda.
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+from config import Config
+import database as db
+from alerts import alerts
+
+logger = logging.getLogger("taxi_bot.maintenance")
+
+MAINTENANCE_INTERVAL = 24 * 3600
+
+
+def run_maintenance(vacuum: bool = False) -> dict:
+    """Bir martalik texnik xizmat"""
+    start = time.perf_counter()
+    archived = 0
+    if Config.ORDERS_RETENTION_DAYS > 0:
+        archived = db.archive_old_orders(
+            Config.ORDERS_RETENTION_DAYS,
+            delete_only=Config.ORDERS_RETENTION_MODE == "delete"
+        )
+    outbox = db.cleanup_outbox()
+    db.optimize_database(vacuum=vacuum)
+
+    result = {
+        "archived": archived,
+        "outbox_cleaned": outbox,
+        "vacuum": vacuum,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+    logger.info(f"🧹 Texnik xizmat: {result}")
+    return result
+
+
+def next_run_delay(now: float = None) -> float:
+    """Keyingi texnik xizmatgacha qolgan vaqt (s); muddati o'tgan bo'lsa - 0"""
+    now = time.time() if now is None else now
+    last = float(db.get_setting("maintenance_last_at", "0") or 0)
+    return max(0.0, last + MAINTENANCE_INTERVAL - now)
+
+
+def run_scheduled() -> dict:
+    """Navbatdagi texnik xizmat (VACUUM'siz); vaqti settings'da saqlanadi (qayta ishga tushishda yo'qolmaydi)"""
+    result = run_maintenance()
+    db.set_setting("maintenance_last_at", str(int(time.time())))
+    return result
+
+
+async def maintenance_loop():
+    """Fonda kuniga bir marta texnik xizmat (VACUUM - faqat qo'lda, bot to'xtatilganda)
+
+    Muddati o'tgan bo'lsa (bot tez-tez qayta ishga tushirilgan) - darhol,
+    aks holda keyingi muddatgacha kutadi.
+    """
+    while True:
+        await asyncio.sleep(next_run_delay())
+        try:
+            await asyncio.to_thread(run_scheduled)
+        except Exception as e:
+            logger.error(f"Texnik xizmat xatosi: {e}", exc_info=True)
+            alerts.report(e, "maintenance")
+            # Xato takrorlanmasin - keyingi urinish bir soatdan keyin
+            await asyncio.sleep(3600)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Database texnik xizmati")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM ham bajarish (bot to'xtatilganda)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)-8s | %(message)s")
+    run_maintenance(vacuum=args.vacuum)
@@ -0,0 +1,197 @@
+"""
+Telegram Taxi Bot - Outbox Sender
+Yuborish navbatini (database `outbox` jadvali) target guruhlarga yetkazish.
+Xabar faqat yuborilgandan keyin `sent` deb belgilanadi (at-least-once),
+qayta ishga tushganda kutilayotgan xabarlar davom ettiriladi.
+Target bosim ostida bo'lsa (FloodWait yoki katta navbat), buyurtmalar
+bitta digest xabarga birlashtiriladi.
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+
+from telethon.errors import FloodWaitError
+
+from config import Config
+import database as db
+from alerts import alerts
+from event_log import event_log
+
+logger = logging.getLogger("taxi_bot.outbox")
+
+# Telegram xabar uzunligi chegarasi
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n➖➖➖➖➖\n\n"
+
+
+class OutboxSender:
+    """Navbatdagi xabarlarni retry va backoff bilan yuborish"""
+
+    POLL_INTERVAL = 2      # navbat bo'sh bo'lsa tekshirish oralig'i (s)
+    BATCH_SIZE = 200       # bitta target'dan bir marta olinadigan xabarlar
+    RETRY_BASE = 5         # birinchi qayta urinish (s), keyin 2x
+    RETRY_MAX = 600
+
+    def __init__(self, send):
+        """
+        Args:
+            send: `async def send(target_id, message)` - xato bo'lsa exception
+        """
+        self.send = send
+        self.max_attempts = Config.OUTBOX_MAX_ATTEMPTS
+        self._wakeup = asyncio.Event()
+        self._sent_times = deque()   # so'nggi daqiqada yuborilganlar
+        self._pressure_until = {}    # target -> digest rejimi tugash vaqti (monotonic)
+        self._target_sends = {}      # target -> so'nggi daqiqadagi yuborishlar (rate limit)
+        self.digests_sent = 0
+        self._running = False
+
+    def notify(self):
+        """Navbatga yangi xabar qo'shildi"""
+        self._wakeup.set()
+
+    def sent_per_minute(self) -> int:
+        """So'nggi 60 soniyada yuborilgan xabarlar"""
+        cutoff = time.monotonic() - 60
+        while self._sent_times and self._sent_times[0] < cutoff:
+            self._sent_times.popleft()
+        return len(self._sent_times)
+
+    def retry_delay(self, attempts: int) -> float:
+        """Qayta urinish kutish vaqti (exponential backoff)"""
+        return min(self.RETRY_BASE * 2 ** attempts, self.RETRY_MAX)
+
+    async def run(self):
+        """Navbatni doimiy yuborish"""
+        self._running = True
+        db.cleanup_outbox()
+        stats = db.get_outbox_stats()
+        if stats["pending"]:
+            logger.info(f"📤 Navbatda {stats['pending']} ta yuborilmagan xabar - davom ettirilmoqda")
+
+        while self._running:
+            try:
+                sent = await self.drain()
+            except Exception as e:
+                logger.error(f"Navbatni yuborishda xato: {e}", exc_info=True)
+                sent = 0
+
+            if not sent:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    def stop(self):
+        self._running = False
+        self._wakeup.set()
+
+    def allowance(self, target_id: int, rate_limit: int) -> int:
+        """Target'ga hozir yana nechta xabar yuborish mumkin (rate_limit - daqiqada)"""
+        if not rate_limit:
+            return self.BATCH_SIZE
+        sends = self._target_sends.get(target_id)
+        if not sends:
+            return rate_limit
+        cutoff = time.monotonic() - 60
+        while sends and sends[0] < cutoff:
+            sends.popleft()
+        return max(rate_limit - len(sends), 0)
+
+    def limit_wait(self, target_id: int) -> float:
+        """Rate limit bo'shashigacha qolgan vaqt (s)"""
+        sends = self._target_sends.get(target_id)
+        if not sends:
+            return 0.0
+        return max(sends[0] + 60 - time.monotonic(), 0.0)
+
+    def in_digest_mode(self, target_id: int, backlog: int) -> bool:
+        """Target bosim ostidami: yaqinda FloodWait bo'lgan yoki navbati katta"""
+        if backlog >= Config.DIGEST_THRESHOLD:
+            return True
+        return self._pressure_until.get(target_id, 0) > time.monotonic()
+
+    async def drain(self) -> int:
+        """Vaqti kelgan xabarlarni bir marta yuborish, yuborilganlar sonini qaytaradi"""
+        rows = db.get_due_outbox(self.BATCH_SIZE)
+        by_target = {}
+        for row in rows:
+            by_target.setdefault(row["target_id"], []).append(row)
+
+        # Target sozlamalari: yuqori ustuvorlikdagilar birinchi yuboriladi
+        settings = {t["group_id"]: t for t in db.get_target_groups_info()}
+        order = sorted(by_target, key=lambda t: -(settings[t]["priority"] if t in settings else 0))
+
+        sent = 0
+        for target_id in order:
+            target_rows = by_target[target_id]
+            allowance = self.allowance(target_id, settings.get(target_id, {}).get("rate_limit") or 0)
+            if allowance == 0:
+                # Limit bo'shaguncha bu target'ning navbati "vaqti kelgan"lar qatoridan chiqadi
+                db.postpone_outbox_target(target_id, self.limit_wait(target_id))
+                continue
+
+            # Limitga sig'magan navbat ham digest bilan yuboriladi
+            if self.in_digest_mode(target_id, len(target_rows)) or len(target_rows) > allowance:
+                chunks = build_digests(target_rows)
+            else:
+                chunks = [[row] for row in target_rows]
+
+            for chunk in chunks[:allowance]:
+                text = DIGEST_SEPARATOR.join(row["message"] for row in chunk)
+                try:
+                    await self.send(target_id, text)
+                except FloodWaitError as e:
+                    # Shu target'ning qolgan xabarlari keyinga suriladi va birlashtiriladi
+                    self._pressure_until[target_id] = time.monotonic() + e.seconds + Config.DIGEST_COOLDOWN
+                    db.postpone_outbox_target(target_id, e.seconds)
+                    for row in chunk:
+                        event_log.delivery(row, "flood", str(e))
+                    logger.warning(f"⏳ {target_id}: FloodWait {e.seconds}s - navbat keyinga surildi")
+                    break
+                except Exception as e:
+                    for row in chunk:
+                        delay = self.retry_delay(row["attempts"])
+                        db.mark_outbox_retry(row["id"], str(e), delay, self.max_attempts)
+                        failed = row["attempts"] + 1 >= self.max_attempts
+                        event_log.delivery(row, "failed" if failed else "retry", str(e))
+                    if chunk[0]["attempts"] + 1 >= self.max_attempts:
+                        logger.error(f"❌ {target_id}: yuborilmadi ({chunk[0]['attempts'] + 1} urinish): {e}")
+                        alerts.report(e, "outbox", f"target {target_id}: {len(chunk)} ta zakaz yuborilmadi")
+                    else:
+                        logger.warning(f"Guruhga yuborishda xato ({target_id}), {delay:.0f}s dan keyin qayta: {e}")
+                    continue
+
+                db.mark_outbox_sent([row["id"] for row in chunk])
+                for row in chunk:
+                    event_log.delivery(row, "sent")
+                now = time.monotonic()
+                self._sent_times.extend([now] * len(chunk))
+                self._target_sends.setdefault(target_id, deque()).append(now)
+                if len(chunk) > 1:
+                    self.digests_sent += 1
+                    logger.info(f"📦 {target_id}: {len(chunk)} ta buyurtma bitta xabarda yuborildi")
+                sent += len(chunk)
+
+        return sent
+
+
+def build_digests(rows: list, limit: int = MESSAGE_LIMIT) -> list:
+    """Xabarlarni Telegram limitiga sig'adigan guruhlarga bo'lish (tartib saqlanadi)"""
+    chunks = []
+    current, size = [], 0
+    for row in rows:
+        length = len(row["message"])
+        extra = length + (len(DIGEST_SEPARATOR) if current else 0)
+        if current and size + extra > limit:
+            chunks.append(current)
+            current, size = [], 0
+            extra = length
+        current.append(row)
+        size += extra
+    if current:
+        chunks.append(current)
+    return chunks
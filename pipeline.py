@@ -0,0 +1,333 @@
+"""
+Telegram Taxi Bot - Message Pipeline
+Xabarni filtrlash, klassifikatsiya qilish va formatlash.
+Telethon'ga bog'liq emas - oddiy dict ustida ishlaydi, shuning uchun
+alohida worker process'larda ham bajariladi.
+"""
+
+import logging
+import re
+import time
+from collections import OrderedDict
+
+from config import Config
+import database as db
+from ai_classifier import classifier as default_classifier
+from ai_usage import usage_tracker
+from group_yield import yield_tracker, MODE_NORMAL
+from locations import extract_route, is_complete, apply_route
+from textnorm import normalize, find_keyword
+
+logger = logging.getLogger("taxi_bot.pipeline")
+
+
+# Qaror turlari
+FORWARD = "forward"
+DROP = "drop"
+
+# Faqat emoji bo'lsa o'tkazib yuborish uchun
+EMOJI_RE = re.compile(r'[\U0001F600-\U0001F64F\U0001F300-\U0001F5FF\U0001F680-\U0001F6FF\U0001F1E0-\U0001F1FF\U00002702-\U000027B0\U0001F900-\U0001F9FF\s]+')
+
+# Telefon raqamlari - turli formatlarni qo'llab-quvvatlash
+# +998901234567, 998901234567, 901234567, +9 98 90 123 45 67 va h.k.
+PHONE_PATTERNS = [
+    re.compile(r'\+998\s*\d{2}\s*\d{3}\s*\d{2}\s*\d{2}'),  # +998 90 123 45 67
+    re.compile(r'\+998\d{9}'),  # +998901234567
+    re.compile(r'998\d{9}'),    # 998901234567
+    re.compile(r'(?<!\d)\d{9}(?!\d)'),  # 901234567 (9 raqam)
+]
+
+
+def get_sender_name(sender) -> str:
+    """Yuboruvchi ismi (username siz)"""
+    if not sender:
+        return "Noma'lum"
+
+    parts = []
+    if hasattr(sender, 'first_name') and sender.first_name:
+        parts.append(sender.first_name)
+    if hasattr(sender, 'last_name') and sender.last_name:
+        parts.append(sender.last_name)
+
+    return " ".join(parts) if parts else "Foydalanuvchi"
+
+
+async def normalize_event(event) -> dict:
+    """Telethon event'ni oddiy dict'ga aylantirish (process'lar orasida uzatish uchun)"""
+    return await normalize_message(event.message)
+
+
+async def normalize_message(message) -> dict:
+    """Telethon Message'ni oddiy dict'ga aylantirish (event yoki get_messages natijasi)"""
+    msg = message_fields(message)
+    await resolve_entities(msg, message)
+    return msg
+
+
+def message_fields(message) -> dict:
+    """Xabarning o'zidagi maydonlar - tarmoq so'rovisiz (guruh nomi va yuboruvchi hali yo'q)"""
+    return {
+        "chat_id": message.chat_id,
+        "message_id": message.id,
+        "chat_title": "Unknown",
+        "sender_id": message.sender_id or 0,
+        "sender_name": "Noma'lum",
+        "sender_username": None,
+        "sender_phone": None,
+        "text": message.text or message.message or "",
+        "has_sticker": bool(message.sticker),
+        "media_only": bool(message.media) and not message.text,
+    }
+
+
+async def resolve_entities(msg: dict, message):
+    """Guruh nomi va yuboruvchi ma'lumotlarini qo'shish (get_chat/get_sender)"""
+    chat = await message.get_chat()
+    sender = await message.get_sender()
+    msg.update(
+        chat_title=getattr(chat, 'title', 'Unknown'),
+        sender_id=sender.id if sender else 0,
+        sender_name=get_sender_name(sender),
+        sender_username=getattr(sender, 'username', None) if sender else None,
+        sender_phone=getattr(sender, 'phone', None) if sender else None,
+    )
+
+
+# (yuboruvchi, normallashtirilgan matn) -> oxirgi ko'rilgan vaqt
+_recent_messages = OrderedDict()
+
+
+def is_duplicate(sender_id: int, text_norm: str) -> bool:
+    """Shu foydalanuvchi shu matnni DUPLICATE_WINDOW ichida yuborganmi"""
+    window = Config.DUPLICATE_WINDOW
+    if not window or not sender_id:
+        return False
+    now = time.monotonic()
+    while _recent_messages and next(iter(_recent_messages.values())) < now - window:
+        _recent_messages.popitem(last=False)
+
+    key = (sender_id, text_norm)
+    duplicate = key in _recent_messages
+    _recent_messages[key] = now
+    _recent_messages.move_to_end(key)
+    return duplicate
+
+
+def _drop(reason: str, **extra) -> dict:
+    return {"action": DROP, "reason": reason, **extra}
+
+
+def content_filter(msg: dict) -> str | None:
+    """Arzon filtrlar (faqat xabar matni va turi bo'yicha): tushirish sababi yoki None"""
+    # Stiker bo'lsa o'tkazib yuborish
+    if msg["has_sticker"]:
+        return "sticker"
+
+    # Media bo'lsa va matn yo'q bo'lsa o'tkazib yuborish
+    if msg["media_only"]:
+        return "media"
+
+    text = msg["text"]
+
+    if not text or len(text) < 10:
+        return "too_short"
+
+    # 50 belgidan ko'p bo'lsa o'tkazib yuborish (OpenAI tejash)
+    if len(text) > 50:
+        return "too_long"
+
+    # Faqat emoji bo'lsa o'tkazib yuborish
+    if len(EMOJI_RE.sub('', text)) < 5:
+        return "emoji"
+    return None
+
+
+async def decide(msg: dict, classifier=None) -> dict:
+    """
+    Xabar bo'yicha qaror qabul qilish
+
+    Returns:
+        dict: {
+            "action": "forward" | "drop",
+            "reason": qaror sababi (filtr yoki "ai"/"local"/"forced"),
+            "verdict", "confidence", "cached": AI javobi (chaqirilgan bo'lsa),
+            "timings": bosqichlar vaqti (ms),
+            "order_type", "order_data", "formatted", "phone" (forward bo'lsa)
+        }
+    """
+    start = time.perf_counter()
+    timings = {}
+    result = await _decide(msg, classifier or default_classifier, timings, start)
+    timings["total"] = time.perf_counter() - start
+    result["timings"] = {stage: round(seconds * 1000, 3) for stage, seconds in timings.items()}
+    return result
+
+
+async def _decide(msg: dict, classifier, timings: dict, start: float) -> dict:
+    chat_id = msg["chat_id"]
+
+    # Cheklangan (o'lik) guruh - har N-xabardan faqat bittasi; o'tkazilganlari
+    # ulushga kirmaydi (aks holda guruh cheklovdan hech qachon chiqmaydi)
+    if not yield_tracker.should_process(chat_id):
+        yield_tracker.record(chat_id, skipped=1)
+        return _drop("throttled")
+
+    # Guruh samaradorligi: tekshirilgan xabar
+    yield_tracker.record(chat_id, seen=1)
+
+    # Stiker, media, uzunlik, emoji
+    reason = content_filter(msg)
+    if reason:
+        yield_tracker.record(chat_id, filtered=1)
+        return _drop(reason)
+
+    text = msg["text"]
+
+    # Bloklangan foydalanuvchini tekshirish
+    sender_id = msg["sender_id"]
+    if sender_id and db.is_blocked(sender_id):
+        logger.debug("Bloklangan: %s", sender_id)
+        yield_tracker.record(chat_id, filtered=1)
+        return _drop("blocked")
+    mark = time.perf_counter()
+    timings["filter"] = mark - start
+
+    # Kalit so'zlar bilan tekshirish (lotin/kirill farqisiz)
+    text_norm = normalize(text)
+
+    # Boshqa guruhlarga ham yuborilgan bir xil xabar (lotin/kirill farqisiz)
+    if is_duplicate(sender_id, text_norm):
+        yield_tracker.record(chat_id, filtered=1)
+        return _drop("duplicate")
+
+    # 1. Haydovchi so'zlari (IGNORE)
+    if find_keyword(text_norm, db.get_keyword_words('driver')):
+        yield_tracker.record(chat_id, filtered=1)
+        return _drop("driver_keyword")
+
+    # 2. Yo'lovchi so'zlari (FORCE ORDER)
+    is_forced_order = bool(find_keyword(text_norm, db.get_keyword_words('passenger')))
+
+    # Past samarali guruh yoki AI byudjeti tugagan - AI chaqirilmaydi, faqat kalit so'zlar
+    keyword_only = yield_tracker.mode(chat_id) != MODE_NORMAL
+    over_budget = not keyword_only and usage_tracker.over_budget(chat_id)
+    keyword_only = keyword_only or over_budget
+
+    # Yo'nalish lokal gazetteer orqali (AI'dan oldin, mikrosekundlarda)
+    route = extract_route(text_norm)
+    now = time.perf_counter()
+    timings["match"], mark = now - mark, now
+
+    # AI klassifikatsiya yoki Keyword orqali
+    ai = {}
+    if is_forced_order:
+        is_ord = True
+        order_type = classifier.PASSENGER_ORDER
+        order_data = {}
+        # Kalit so'z tasdiqlagan va yo'nalish to'liq topilgan - AI kerak emas
+        if not keyword_only and not is_complete(route):
+            # AI dan faqat ma'lumot olish uchun foydalanamiz, lekin order aniqligi 100%
+            yield_tracker.record(chat_id, ai_calls=1)
+            _, _, order_data = await classifier.is_order(text, chat_id, details=ai)
+            if not order_data:
+                order_data = {}
+    elif keyword_only:
+        is_ord, order_type, order_data = False, classifier.OTHER, None
+    else:
+        yield_tracker.record(chat_id, ai_calls=1)
+        is_ord, order_type, order_data = await classifier.is_order(text, chat_id, details=ai)
+    if ai:
+        now = time.perf_counter()
+        timings["ai"], mark = now - mark, now
+
+    db.update_stats(processed=1)
+
+    if not is_ord:
+        yield_tracker.record(chat_id, filtered=1)
+        logger.debug("Boshqa xabar: %.40s", text)
+        reason = "budget" if over_budget else "keyword_only" if keyword_only else "not_order"
+        return _drop(reason, processed=True, **ai)
+
+    order_data = apply_route(order_data, route)
+
+    # Zakaz sonini oshirish
+    if sender_id:
+        db.increment_user_order_count(sender_id)
+
+    if not is_forced_order:
+        reason = "ai"
+    elif not keyword_only and is_complete(route):
+        reason = "local"
+    else:
+        reason = "forced"
+
+    formatted, phone = format_order(msg, order_data)
+    timings["post"] = time.perf_counter() - mark  # statistika (DB) va formatlash
+    return {
+        "action": FORWARD,
+        "reason": reason,
+        "processed": True,
+        **ai,
+        "order_type": order_type,
+        "order_data": order_data,
+        "formatted": formatted,
+        "phone": phone,
+    }
+
+
+def find_phone(text: str, order_data: dict = None):
+    """Telefon raqamini topish (AI natijasi yoki regex) va formatlash"""
+    phone = None
+    if order_data and order_data.get("phone"):
+        phone = order_data["phone"]
+
+    # Agar AI topilmagansa, regex orqali izlash
+    if not phone:
+        compact = text.replace(" ", "")
+        for pattern in PHONE_PATTERNS:
+            phone_match = pattern.search(compact)
+            if phone_match:
+                phone = phone_match.group()
+                break
+
+    if not phone:
+        return None
+
+    # Telefon raqamini formatlash
+    phone_clean = re.sub(r'[^\d+]', '', phone)
+    if not phone_clean.startswith('+'):
+        if phone_clean.startswith('998'):
+            phone_clean = '+' + phone_clean
+        elif len(phone_clean) == 9:
+            phone_clean = '+998' + phone_clean
+    return phone_clean
+
+
+def format_order(msg: dict, order_data: dict = None) -> tuple[str, str | None]:
+    """Target guruhlarga yuboriladigan xabar (Markdown) va telefon raqami"""
+    original_text = msg["text"]
+    user_name = msg["sender_name"]
+    sender_id = msg["sender_id"]
+
+    # Xabar matni (qisqa)
+    short_text = original_text[:100] if len(original_text) > 100 else original_text
+
+    phone_clean = find_phone(original_text, order_data)
+
+    # Xabar formatlash - Rasmda ko'rsatilgan format
+    if sender_id:
+        user_link = f"tg://user?id={sender_id}"
+        formatted = f"👤 [{user_name}]({user_link})"
+    else:
+        formatted = f"👤 {user_name}"
+
+    if msg.get("sender_username"):
+        formatted += f" (@{msg['sender_username']})"
+
+    formatted += f"\n\n💬 {short_text}\n\n"
+
+    if phone_clean:
+        formatted += f"📞 {phone_clean}"
+    # Raqam yo'q bo'lsa, hech qanday yozuv chiqmaydi
+
+    return formatted, phone_clean
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Telegram Taxi Bot - Classifier Replay
+Saqlangan zakazlarni (turi va yo'nalishi ma'lum) AI bosqichlaridan qayta
+o'tkazib, har bir bosqichning aniqligi, kechikishi va narxini solishtirish:
+    python replay.py [--limit 200] [--days 30] [--tiers fast,full,tiered]
+
+Diqqat: haqiqiy OpenAI so'rovlari yuboriladi (sarf ai_usage'da -1 guruh sifatida).
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+
+import database as db
+from ai_classifier import classifier
+from ai_usage import usage_tracker
+from textnorm import normalize
+
+logger = logging.getLogger("taxi_bot.replay")
+
+REPLAY_GROUP_ID = -1  # replay sarfi shu "guruh"ga yoziladi
+TIERS = ("fast", "full", "tiered")
+
+
+def same_location(predicted, expected) -> bool:
+    return bool(predicted) and normalize(str(predicted)) == normalize(expected)
+
+
+async def replay_tier(tier: str, orders: list, concurrency: int = 8) -> dict:
+    """Bitta bosqichni zakazlar ustida ishga tushirish"""
+    classify = {
+        "fast": classifier.classify_fast,
+        "full": classifier.classify_full,
+        "tiered": classifier.classify_tiered,
+    }[tier]
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, results = [], []
+
+    async def one(order):
+        async with semaphore:
+            start = time.perf_counter()
+            result = await classify(order["message_text"], REPLAY_GROUP_ID)
+            latencies.append(time.perf_counter() - start)
+            results.append((order, result or {}))
+
+    escalated = classifier.tier_stats["fast"]["escalated"]
+    cost = usage_tracker.spent(REPLAY_GROUP_ID)
+    await asyncio.gather(*(one(order) for order in orders))
+
+    type_ok = sum(1 for order, r in results if r.get("type") == order["order_type"])
+    routed = [(order, r) for order, r in results if order["from_location"] and order["to_location"]]
+    route_ok = sum(
+        1 for order, r in routed
+        if same_location((r.get("data") or {}).get("from_location"), order["from_location"])
+        and same_location((r.get("data") or {}).get("to_location"), order["to_location"])
+    )
+    latencies.sort()
+    return {
+        "tier": tier,
+        "orders": len(results),
+        "type_accuracy": type_ok / max(len(results), 1),
+        "route_accuracy": route_ok / len(routed) if routed else None,
+        "avg_ms": sum(latencies) * 1000 / max(len(latencies), 1),
+        "p95_ms": latencies[int(len(latencies) * 0.95)] * 1000 if latencies else 0,
+        "cost": usage_tracker.spent(REPLAY_GROUP_ID) - cost,
+        "escalated": classifier.tier_stats["fast"]["escalated"] - escalated if tier == "tiered" else None,
+    }
+
+
+async def replay(limit: int, days: int, tiers) -> list:
+    orders = db.get_labeled_orders(limit=limit, days=days)
+    if not orders:
+        print("Turi aniqlangan zakazlar yo'q")
+        return []
+
+    print(f"{len(orders)} ta zakaz | arzon model: {classifier.fast_model or '—'}, asosiy: {classifier.model}")
+    labels = ["bosqich", "tur", "yo'nalish", "o'rtacha", "p95", "narx", "o'tkazildi"]
+    widths = [8, 6, 9, 9, 8, 9, 10]
+    print(" ".join(label.rjust(width) for label, width in zip(labels, widths)))
+    reports = []
+    for tier in tiers:
+        r = await replay_tier(tier, orders)
+        reports.append(r)
+        route = f"{r['route_accuracy']:.0%}" if r['route_accuracy'] is not None else "—"
+        escalated = f"{r['escalated'] / max(r['orders'], 1):.0%}" if r['escalated'] is not None else "—"
+        print(f"{tier:>8} {r['type_accuracy']:>6.0%} {route:>9} {r['avg_ms']:>7.0f}ms "
+              f"{r['p95_ms']:>6.0f}ms ${r['cost']:>8.4f} {escalated:>10}")
+    usage_tracker.flush()
+    return reports
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI bosqichlarini saqlangan zakazlarda solishtirish")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--tiers", default=",".join(TIERS))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s | %(levelname)-8s | %(message)s")
+    tiers = [t for t in args.tiers.split(",") if t in TIERS]
+    if not classifier.fast_model and "fast" in tiers:
+        # OPENAI_FAST_MODEL bo'sh - bo'sh model nomi bilan so'rov yuborilmasin
+        print("OPENAI_FAST_MODEL o'rnatilmagan - 'fast' bosqichi o'tkazib yuboriladi")
+        tiers.remove("fast")
+    asyncio.run(replay(args.limit, args.days, tiers))
@@ -0,0 +1,217 @@
+"""
+Telegram Taxi Bot - Semantic Cache
+Deyarli bir xil xabarlar uchun AI natijasini (turi va ishonchi) qayta ishlatish.
+Xabar - shablon so'zlari to'plamidan (tartibsiz) hash qilingan vektor (tashqi
+embedding API'siz); vektorlar NumPy matritsasida, qidiruv - kosinus o'xshashlik.
+Joy nomlari va raqamlar niqoblanadi: "Toshkentdan Samarqandga 2 kishi" va
+"Samarqandga Toshkentdan 2ta odam bor" bir xil yo'nalish shabloni hisoblanadi.
+Savol ("...bormi?") va inkor ("emas", "yo'q") alohida, og'ir belgilar. Niyat
+so'zlari (kerak / bor / olaman / ketadi) va savol/inkor belgilari to'plami aniq
+mos kelishi shart - "taksi kerak" natijasi "taksi bor" yoki "taksi kerakmi"ga
+berilmaydi, qolgan so'zlar qancha ko'p bo'lsa ham.
+
+Chegara belgilangan juftliklarda tanlangan (eval/semantic_pairs.jsonl):
+    python benchmark.py semantic --pairs eval/semantic_pairs.jsonl
+va kalibrlashda ishlatilmagan juftliklarda tekshiriladi (eval/semantic_pairs_holdout.jsonl).
+"""
+
+import re
+import zlib
+
+import numpy as np
+
+from locations import find_locations
+from textnorm import normalize
+
+_DIGITS_RE = re.compile(r"\d+")
+_WORD_RE = re.compile(r"[a-z0-9']+|\?")
+# "2ta", "3 kishi", "1 nafar odam" - yo'lovchilar soni bitta belgi
+_COUNT_RE = re.compile(r"\b0(?: ?(?:ta|tа|kishi|odam|nafar|jon|chel|человек))+\b")
+
+QUESTION = "?"
+NEGATION = "!"
+MARKERS = (QUESTION, NEGATION)
+MARKER_WEIGHT = 3.0     # savol/inkor farqi boshqa so'zlardan kuchliroq
+QUESTION_SUFFIXES = ("mi", "mu")
+NOT_QUESTIONS = {"assalomu"}  # "-mu" bilan tugaydi, lekin savol emas
+NEGATION_WORDS = {"emas", "yo'q", "yoq", "ne", "net"}
+# Niyat so'zlari -> kanonik so'z (yo'lovchi yoki haydovchi e'lonini ajratadi)
+INTENT_WORDS = {
+    # yo'lovchi: "taksi kerak", "Samarqandga boraman"
+    "kerak": "kerak", "kere": "kerak", "kerek": "kerak", "kk": "kerak", "nujen": "kerak",
+    "nujna": "kerak", "nado": "kerak", "izlayman": "kerak", "qidiryapman": "kerak",
+    "boraman": "boraman", "boramiz": "boraman", "ketaman": "boraman", "ketamiz": "boraman",
+    "ketyapman": "boraman", "ketyapmiz": "boraman", "yuraman": "boraman", "yuramiz": "boraman",
+    "chiqaman": "boraman", "chiqamiz": "boraman", "edu": "boraman", "yedu": "boraman",
+    # haydovchi: "cobalt ketadi", "pochta olaman"
+    "ketadi": "ketadi", "ketyapti": "ketadi", "boradi": "ketadi", "yuradi": "ketadi",
+    "chiqadi": "ketadi", "jo'naydi": "ketadi",
+    "olaman": "olaman", "olamiz": "olaman", "olib": "olaman", "olvolaman": "olaman", "vozmu": "olaman",
+    # ikkalasi ham: "pochta bor", "joy bor"
+    "bor": "bor", "est": "bor",
+}
+INTENTS = set(INTENT_WORDS.values())
+
+
+def template_words(text: str) -> list:
+    """Xabar shabloni so'zlari: joy nomi -> loc + qo'shimcha, raqam -> 0, soni -> 0pax,
+    savol yuklamasi ("bormi", "kerakmi", "?") -> so'z + "?", inkor ("emas", "yo'q") -> "!",
+    niyat so'zi ("olamiz", "ketaman") -> kanonik ("olaman", "ketadi") """
+    text = normalize(text)
+    parts, last = [], 0
+    for start, end, _, suffix in find_locations(text):
+        parts.append(text[last:start])
+        parts.append(f" loc{suffix} ")
+        last = end
+    parts.append(text[last:])
+    text = _DIGITS_RE.sub(" 0 ", "".join(parts))
+    text = _COUNT_RE.sub(" 0pax ", " ".join(text.split()))
+
+    words = []
+    for word in _WORD_RE.findall(text):
+        if word == QUESTION:
+            words.append(QUESTION)
+        elif word in NEGATION_WORDS:
+            words.append(NEGATION)
+        elif word == "kerakmas":
+            words += ["kerak", NEGATION]
+        elif len(word) > 3 and word.endswith(QUESTION_SUFFIXES) and word not in NOT_QUESTIONS:
+            words += [INTENT_WORDS.get(word[:-2], word[:-2]), QUESTION]
+        else:
+            words.append(INTENT_WORDS.get(word, word))
+    return words
+
+
+def intent_of(words) -> str:
+    """Niyat kaliti: niyat so'zlari va savol/inkor belgilari (tartibsiz)"""
+    return " ".join(sorted({word for word in words if word in INTENTS or word in MARKERS}))
+
+
+def calibrate(scores: list) -> float | None:
+    """Belgilangan juftliklar bo'yicha chegara: [(o'xshashlik, bir xilmi), ...]
+
+    Bir xil bo'lmagan juftliklarning eng yuqorisi va bir xillarning eng pasti
+    o'rtasi (ajralmasa - noto'g'ri hit bo'lmaydigan eng past chegara).
+    """
+    same = [score for score, is_same in scores if is_same]
+    different = [score for score, is_same in scores if not is_same]
+    if not same or not different:
+        return None
+    if min(same) > max(different):
+        return round((min(same) + max(different)) / 2, 3)
+    return round(max(different) + 0.001, 3)
+
+
+class SemanticCache:
+    """Cheklangan hajmli (LRU) n-gram vektor keshi
+
+    Bir xil shablon (so'zlar to'plami) bitta qatorni egallaydi va matritsasiz
+    (dict orqali) topiladi; qolganlari - niyati bir xil qatorlar orasidan
+    kosinus o'xshashlik bo'yicha.
+    """
+
+    def __init__(self, capacity: int = 20000, threshold: float = 0.78, dim: int = 512):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.dim = dim
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._values = [None] * capacity
+        self._keys = [None] * capacity
+        self._intents = np.zeros(capacity, dtype=np.int64)
+        self._intent_ids = {}  # niyat kaliti -> raqam
+        self._slots = {}  # shablon kaliti -> qator
+        self._size = 0
+        self._clock = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return self._size
+
+    def encode(self, text: str) -> tuple:
+        """(shablon kaliti, vektor, niyat kaliti): vektor - shablon so'zlari to'plami
+        (tartibsiz), birlik uzunlikda"""
+        words = set(template_words(text))
+        indices, weights = [], []
+        for word in words:
+            if word in MARKERS:
+                # Savol/inkor - o'z (oxirgi) ustunlarida, boshqa so'zlar bilan to'qnashmaydi
+                indices.append(self.dim - 1 - MARKERS.index(word))
+                weights.append(MARKER_WEIGHT)
+                continue
+            h = zlib.crc32(word.encode())
+            indices.append(h % (self.dim - len(MARKERS)))
+            weights.append(1.0 if h & 0x80000000 else -1.0)
+
+        vector = np.bincount(indices, weights=weights, minlength=self.dim).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector /= norm
+        return " ".join(sorted(words)), vector, intent_of(words)
+
+    def similarity(self, a: str, b: str) -> float:
+        """Ikki xabar o'xshashligi (kosinus; niyati boshqa bo'lsa - 0)"""
+        _, vector_a, intent_a = self.encode(a)
+        _, vector_b, intent_b = self.encode(b)
+        if intent_a != intent_b:
+            return 0.0
+        return float(vector_a @ vector_b)
+
+    def _intent_id(self, intent: str) -> int:
+        return self._intent_ids.setdefault(intent, len(self._intent_ids))
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def lookup(self, text: str, encoded: tuple = None):
+        """Eng o'xshash yozuv: (qiymat, o'xshashlik) yoki (None, eng yuqori o'xshashlik)"""
+        if not self._size:
+            self.misses += 1
+            return None, 0.0
+        key, vector, intent = encoded or self.encode(text)
+
+        best = self._slots.get(key)
+        if best is not None:
+            score = 1.0
+        else:
+            scores = self._vectors[:self._size] @ vector
+            # Niyati boshqa qatorlar hisobga olinmaydi
+            scores[self._intents[:self._size] != self._intent_id(intent)] = -1.0
+            best = int(np.argmax(scores))
+            score = float(scores[best])
+            if score < self.threshold:
+                self.misses += 1
+                return None, score
+        self._last_used[best] = self._tick()
+        self.hits += 1
+        return self._values[best], score
+
+    def add(self, text: str, value, encoded: tuple = None):
+        """Yozuv qo'shish; kesh to'la bo'lsa eng uzoq ishlatilmagani o'rniga"""
+        if not self.capacity:
+            return
+        key, vector, intent = encoded or self.encode(text)
+        if not vector.any():
+            return
+        slot = self._slots.get(key)
+        if slot is None:
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(np.argmin(self._last_used))
+                del self._slots[self._keys[slot]]
+            self._slots[key] = slot
+            self._keys[slot] = key
+            self._vectors[slot] = vector
+            self._intents[slot] = self._intent_id(intent)
+        self._values[slot] = value
+        self._last_used[slot] = self._tick()
+
+    def clear(self):
+        self._size = 0
+        self._values = [None] * self.capacity
+        self._keys = [None] * self.capacity
+        self._slots.clear()
@@ -0,0 +1,135 @@
+"""
+Telegram Taxi Bot - Session Pool
+Bir nechta Telethon akkauntlari o'rtasida guruhlarni taqsimlash (consistent hashing)
+"""
+
+import bisect
+import hashlib
+import logging
+import time
+
+logger = logging.getLogger("taxi_bot.pool")
+
+
+class HashRing:
+    """Consistent hashing halqasi (virtual tugunlar bilan)"""
+
+    def __init__(self, nodes=(), replicas: int = 100):
+        self.replicas = replicas
+        self._keys = []   # tartiblangan hash'lar
+        self._nodes = {}  # hash -> tugun nomi
+        for node in nodes:
+            self.add(node)
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def add(self, node: str):
+        """Tugun qo'shish"""
+        for i in range(self.replicas):
+            key = self._hash(f"{node}#{i}")
+            if key in self._nodes:
+                continue
+            bisect.insort(self._keys, key)
+            self._nodes[key] = node
+
+    def remove(self, node: str):
+        """Tugunni olib tashlash"""
+        self._keys = [k for k in self._keys if self._nodes[k] != node]
+        self._nodes = {k: n for k, n in self._nodes.items() if n != node}
+
+    def owner(self, key, is_available=None):
+        """Kalit egasi - halqada soat yo'nalishi bo'yicha birinchi mavjud tugun
+
+        Egasi mavjud bo'lmasa, kalit keyingi tugunga o'tadi - boshqa kalitlar
+        o'z egasida qoladi (minimal qayta taqsimlash).
+        """
+        if not self._keys:
+            return None
+
+        start = bisect.bisect(self._keys, self._hash(str(key)))
+        seen = set()
+        for i in range(len(self._keys)):
+            node = self._nodes[self._keys[(start + i) % len(self._keys)]]
+            if node in seen:
+                continue
+            seen.add(node)
+            if is_available is None or is_available(node):
+                return node
+        return None
+
+
+class SessionPool:
+    """Akkauntlar puli: guruh -> akkaunt taqsimoti va akkaunt holati"""
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.clients = {}          # nom -> TelegramClient
+        self._limited_until = {}   # nom -> monotonic vaqt (FloodWait tugashi)
+        self._banned = set()
+        self._members = {}         # nom -> akkaunt a'zo bo'lgan guruhlar
+        self._ring = HashRing(self.names)
+
+    def add_client(self, name: str, client):
+        """Ulangan akkauntni qo'shish"""
+        self.clients[name] = client
+
+    def add_member(self, name: str, chat_id: int):
+        """Akkaunt guruhga a'zo ekanini belgilash"""
+        self._members.setdefault(name, set()).add(chat_id)
+
+    def is_available(self, name: str) -> bool:
+        """Akkaunt ulangan, bloklanmagan va FloodWait'da emasmi"""
+        if name not in self.clients or name in self._banned:
+            return False
+        until = self._limited_until.get(name)
+        if until and time.monotonic() < until:
+            return False
+        return True
+
+    def owner(self, chat_id: int):
+        """Guruhni qaysi akkaunt qayta ishlaydi (avval guruhga a'zo akkauntlar orasidan)"""
+        owner = self._ring.owner(
+            chat_id,
+            lambda name: self.is_available(name) and chat_id in self._members.get(name, ())
+        )
+        return owner or self._ring.owner(chat_id, self.is_available)
+
+    def owns(self, name: str, chat_id: int) -> bool:
+        """Akkaunt shu guruh egasimi"""
+        return self.owner(chat_id) == name
+
+    def mark_flood(self, name: str, seconds: int):
+        """Akkauntni FloodWait davomida chetlatish (guruhlari boshqalarga o'tadi)"""
+        self._limited_until[name] = time.monotonic() + seconds
+        logger.warning(f"⏳ {name}: FloodWait {seconds}s - guruhlari boshqa akkauntlarga o'tkazildi")
+
+    def mark_banned(self, name: str):
+        """Akkauntni butunlay chetlatish (ban yoki sessiya bekor qilingan)"""
+        self._banned.add(name)
+        self._ring.remove(name)
+        logger.error(f"⛔ {name}: akkaunt ishlamayapti - guruhlari qayta taqsimlandi")
+
+    def primary(self):
+        """Yuborish uchun birinchi mavjud akkaunt (client)"""
+        for name in self.names:
+            if self.is_available(name):
+                return self.clients[name]
+        # Hammasi cheklangan bo'lsa - birinchi ulangan akkaunt
+        return next(iter(self.clients.values()), None)
+
+    def status(self) -> dict:
+        """Akkauntlar holati (admin panel uchun)"""
+        now = time.monotonic()
+        result = {}
+        for name in self.names:
+            if name in self._banned:
+                result[name] = "banned"
+            elif name not in self.clients:
+                result[name] = "offline"
+            elif self._limited_until.get(name, 0) > now:
+                result[name] = f"flood:{int(self._limited_until[name] - now)}"
+            else:
+                result[name] = "active"
+        return result
@@ -3,14 +3,9 @@
 # Venv activate
 source venv/bin/activate
 
-# Old processes kill if exists
+# Old processes: SIGTERM va navbat tugashini kutish (holat saqlanadi)
 echo "🛑 Eski processlar to'xtatilmoqda..."
-pkill -f "python.*main.py"
-pkill -f "python.*bot.py"
-pkill -f "python.*userbot.py"
-
-# Wait a bit
-sleep 2
+bash "$(dirname "$0")/stop.sh" > /dev/null
 
 # Start main (bot + userbot together)
 echo "🚕 Taxi Bot ishga tushirilmoqda..."
@@ -30,4 +25,4 @@ echo "📋 Loglarni ko'rish:"
 echo "   tail -f nohup_bot.out"
 echo ""
 echo "🛑 Botni to'xtatish:"
-echo "   pkill -f 'python.*main.py'"
+echo "   bash stop.sh"
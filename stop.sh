@@ -1,51 +1,41 @@
 #!/bin/bash
 
+# SIGTERM - bot yangi xabarlarni olmaydi, navbatni tugatadi va holatni
+# (statistika, checkpoint'lar) saqlaydi; shundan keyingina majburiy to'xtatiladi
+WAIT_SECONDS=${WAIT_SECONDS:-40}   # SHUTDOWN_TIMEOUT dan katta bo'lsin
+
 echo "🛑 Botlarni to'xtatish..."
 
-# Bot processlarini topish va to'xtatish
-BOT_PIDS=$(ps aux | grep -E 'python.*bot\.py' | grep -v grep | awk '{print $2}')
-USERBOT_PIDS=$(ps aux | grep -E 'python.*userbot\.py' | grep -v grep | awk '{print $2}')
+find_pids() {
+    pgrep -f "python.*(main|bot|userbot)\.py"
+}
+
+PIDS=$(find_pids)
 
-if [ -z "$BOT_PIDS" ] && [ -z "$USERBOT_PIDS" ]; then
+if [ -z "$PIDS" ]; then
     echo "❌ Hech qanday bot jarayoni topilmadi"
     exit 0
 fi
 
-# Bot'ni to'xtatish
-if [ ! -z "$BOT_PIDS" ]; then
-    echo "🤖 Admin panel to'xtatilmoqda..."
-    for pid in $BOT_PIDS; do
-        kill $pid 2>/dev/null
-        echo "   ✓ Bot process $pid to'xtatildi"
-    done
-fi
-
-# Userbot'ni to'xtatish
-if [ ! -z "$USERBOT_PIDS" ]; then
-    echo "🚕 Userbot to'xtatilmoqda..."
-    for pid in $USERBOT_PIDS; do
-        kill $pid 2>/dev/null
-        echo "   ✓ Userbot process $pid to'xtatildi"
-    done
-fi
+for pid in $PIDS; do
+    kill -TERM $pid 2>/dev/null
+    echo "   ✓ Process $pid ga SIGTERM yuborildi"
+done
 
-# Bir oz kutish
-sleep 1
+# Navbat tugatilishini kutish
+echo "⏳ Navbat tugatilmoqda (ko'pi bilan ${WAIT_SECONDS}s)..."
+for ((i = 0; i < WAIT_SECONDS; i++)); do
+    if [ -z "$(find_pids)" ]; then
+        break
+    fi
+    sleep 1
+done
 
 # Agar hali ham ishlayotgan bo'lsa, majburiy to'xtatish
-BOT_PIDS=$(ps aux | grep -E 'python.*bot\.py' | grep -v grep | awk '{print $2}')
-USERBOT_PIDS=$(ps aux | grep -E 'python.*userbot\.py' | grep -v grep | awk '{print $2}')
-
-if [ ! -z "$BOT_PIDS" ]; then
+PIDS=$(find_pids)
+if [ ! -z "$PIDS" ]; then
     echo "⚠️  Bot hali ham ishlayapti, majburiy to'xtatish..."
-    for pid in $BOT_PIDS; do
-        kill -9 $pid 2>/dev/null
-    done
-fi
-
-if [ ! -z "$USERBOT_PIDS" ]; then
-    echo "⚠️  Userbot hali ham ishlayapti, majburiy to'xtatish..."
-    for pid in $USERBOT_PIDS; do
+    for pid in $PIDS; do
         kill -9 $pid 2>/dev/null
     done
 fi
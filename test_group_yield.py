@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Guruh samaradorligi siyosati testlari: rejim chegaralari va sinovga qaytish
+"""
+
+import os
+import tempfile
+
+# Testlar alohida (vaqtinchalik) database bilan ishlaydi
+if "DATABASE_PATH" not in os.environ:
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="taxi_test_"), "test.db")
+
+from config import Config
+from group_yield import GroupYieldTracker, MODE_NORMAL, MODE_KEYWORD_ONLY, MODE_THROTTLED
+
+policy_mode = GroupYieldTracker.policy_mode
+probation_due = GroupYieldTracker.probation_due
+
+
+def test_too_few_samples_stay_normal():
+    assert policy_mode(Config.YIELD_MIN_SAMPLES - 1, 0) == MODE_NORMAL
+
+
+def test_modes_by_ratio():
+    seen = 10_000
+    assert policy_mode(seen, seen * Config.YIELD_KEYWORD_ONLY_BELOW) == MODE_NORMAL
+    assert policy_mode(seen, seen * Config.YIELD_KEYWORD_ONLY_BELOW * 0.9) == MODE_KEYWORD_ONLY
+    assert policy_mode(seen, seen * Config.YIELD_THROTTLE_BELOW * 0.9) == MODE_THROTTLED
+    assert policy_mode(seen, 0) == MODE_THROTTLED
+
+
+def test_probation_after_configured_hours():
+    now = 1_000_000.0
+    hours = Config.YIELD_PROBATION_HOURS
+    assert not probation_due(now - hours * 3600 + 60, now)
+    assert probation_due(now - hours * 3600, now)
+    # Rejim vaqti noma'lum (eski yozuv) - darhol sinovga
+    assert probation_due(0, now)
+
+
+def test_skipped_messages_not_counted_as_seen():
+    tracker = GroupYieldTracker()
+    tracker._modes = {-1: MODE_THROTTLED}
+    for _ in range(Config.YIELD_THROTTLE_EVERY * 4):
+        if tracker.should_process(-1):
+            tracker.record(-1, seen=1)
+        else:
+            tracker.record(-1, skipped=1)
+    seen, _, _, _, skipped = tracker._pending[-1]
+    assert seen == 4
+    assert skipped == Config.YIELD_THROTTLE_EVERY * 4 - 4
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Lokal yo'nalish ajratish testlari (gazetteer, qo'shimchalar, ajratgichlar)
+"""
+
+from locations import extract_route, is_complete, is_same_place, apply_route
+
+ROUTES = [
+    ("Samarqanddan Toshkentga 2 kishi", ("Samarqand", "Toshkent", "2")),
+    ("Toshkent-Samarqand 3ta odam bor", ("Toshkent", "Samarqand", "3")),
+    ("Toshkent → Buxoro", ("Toshkent", "Buxoro", None)),
+    ("Chilonzor 9 dan Sergeli ga", ("Chilonzor", "Sergeli", None)),
+    ("Yunusobod dan Qoyliq ga 3 kishi", ("Yunusobod", "Qo'yliq", "3")),
+    ("Самарқанддан Тошкентга 1 киши", ("Samarqand", "Toshkent", "1")),
+    ("Tashkentga Samarkanddan", ("Samarqand", "Toshkent", None)),
+    ("Samarqanddan Toshkent", ("Samarqand", "Toshkent", None)),
+    ("Toshkentlik haydovchi kerak", (None, None, None)),
+    ("Toshkentga", (None, "Toshkent", None)),
+    ("", (None, None, None)),
+]
+
+
+def test_extract_route():
+    for text, (from_location, to_location, passengers) in ROUTES:
+        route = extract_route(text)
+        assert route == {
+            "from_location": from_location,
+            "to_location": to_location,
+            "passengers": passengers,
+        }, text
+
+
+def test_is_complete():
+    assert is_complete(extract_route("Samarqanddan Toshkentga"))
+    assert not is_complete(extract_route("Toshkentga"))
+    assert not is_complete({})
+    assert not is_complete(None)
+
+
+def test_is_same_place():
+    assert is_same_place("Tashkent", "Toshkent")
+    assert is_same_place("Toshkentdan", "Toshkent")
+    assert not is_same_place("Chilonzor 9", "Chilonzor")
+    assert not is_same_place("Toshkent, Chorsu", "Toshkent")
+    assert not is_same_place(None, "Toshkent")
+
+
+def test_apply_route_keeps_specific_ai_values():
+    route = {"from_location": "Chilonzor", "to_location": "Toshkent", "passengers": "2"}
+    order = apply_route({"from_location": "Chilonzor 9", "to_location": "Tashkent", "passengers": "3"}, route)
+    assert order == {"from_location": "Chilonzor 9", "to_location": "Toshkent", "passengers": "3"}
+    assert apply_route(None, route) == route
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
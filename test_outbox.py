@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Outbox testlari: digest'larga bo'lish va target rate limit
+"""
+
+import os
+import tempfile
+import time
+from collections import deque
+
+import pytest
+
+# Testlar alohida (vaqtinchalik) database bilan ishlaydi
+if "DATABASE_PATH" not in os.environ:
+    os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="taxi_test_"), "test.db")
+
+pytest.importorskip("telethon")
+
+from outbox import OutboxSender, build_digests, DIGEST_SEPARATOR
+
+
+def _rows(*lengths):
+    return [{"id": i, "message": "x" * n} for i, n in enumerate(lengths)]
+
+
+def test_digests_fit_limit_and_keep_order():
+    rows = _rows(40, 40, 40, 40, 40)
+    chunks = build_digests(rows, limit=100)
+    assert [row["id"] for chunk in chunks for row in chunk] == [0, 1, 2, 3, 4]
+    for chunk in chunks:
+        text = DIGEST_SEPARATOR.join(row["message"] for row in chunk)
+        assert len(text) <= 100
+
+
+def test_oversized_message_gets_own_chunk():
+    chunks = build_digests(_rows(10, 500, 10), limit=100)
+    assert [[row["id"] for row in chunk] for chunk in chunks] == [[0], [1], [2]]
+    assert build_digests([]) == []
+
+
+def test_allowance_counts_last_minute():
+    sender = OutboxSender(send=None)
+    assert sender.allowance(1, 0) == OutboxSender.BATCH_SIZE
+    assert sender.allowance(1, 5) == 5
+    now = time.monotonic()
+    sender._target_sends[1] = deque([now - 120, now - 1, now])
+    assert sender.allowance(1, 5) == 3
+    assert sender.allowance(1, 2) == 0
+    assert 0 < sender.limit_wait(1) <= 60
+    assert sender.limit_wait(2) == 0.0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Semantik kesh testlari: parafraz topiladi, savol/inkor va qarama-qarshi
+ma'nodagi (niyat so'zi boshqa) xabarlar topilmaydi. Chegara kalibrlashda
+ishlatilmagan juftliklarda tekshiriladi (eval/semantic_pairs_holdout.jsonl)
+"""
+
+import json
+import os
+
+from config import Config
+from semantic_cache import SemanticCache
+
+# Kalibrlash (benchmark.py semantic --pairs) bu faylni ko'rmaydi
+HOLDOUT_FILE = os.path.join(os.path.dirname(__file__), "eval", "semantic_pairs_holdout.jsonl")
+ORDER = {"type": "passenger_order", "confidence": 0.9}
+
+
+def cache_with(text: str) -> SemanticCache:
+    cache = SemanticCache(capacity=10, threshold=Config.SEMANTIC_CACHE_THRESHOLD)
+    cache.add(text, ORDER)
+    return cache
+
+
+def test_paraphrase_hits():
+    # So'z tartibi, "2 kishi" / "2ta odam" va qo'shimcha so'z farqi
+    cache = cache_with("Toshkentdan Samarqandga 2 kishi bor")
+    for text in ("Samarqandga Toshkentdan 2ta odam bor", "Samarqandga Toshkentdan 2ta odam bor srochno"):
+        value, score = cache.lookup(text)
+        assert value == ORDER, (text, score)
+
+
+def test_greeting_is_not_question():
+    cache = cache_with("Andijondan Toshkentga 3 kishi kerak")
+    value, score = cache.lookup("Assalomu alaykum, Andijondan Toshkentga 3 kishi kerak")
+    assert value == ORDER, score
+
+
+def test_question_misses():
+    cache = cache_with("Toshkentdan Samarqandga 2 kishi bor")
+    for text in ("Toshkentdan Samarqandga 2 kishi bormi", "Toshkentdan Samarqandga 2 kishi bor?"):
+        value, score = cache.lookup(text)
+        assert value is None, (text, score)
+
+
+def test_opposite_meaning_misses():
+    cache = cache_with("Toshkentdan Samarqandga 2 kishi kerak")
+    for text in ("Toshkentdan Samarqandga 2 kishi olaman", "Toshkentdan Samarqandga 2 kishi kerak emas",
+                 "Toshkentdan Samarqandga 2 kishi kerakmas"):
+        value, score = cache.lookup(text)
+        assert value is None, (text, score)
+
+
+# Shablon so'zlari ko'p, faqat niyat so'zi boshqa (kosinus bo'yicha 0.8 dan yuqori)
+HARD_OPPOSITES = [
+    ("Toshkentdan Samarqandga 2 kishi kerak srochno", "Toshkentdan Samarqandga 2 kishi olaman srochno"),
+    ("Chilonzordan Sergeliga taksi kerak hozir", "Chilonzordan Sergeliga taksi bor hozir"),
+    ("Samarqanddan Toshkentga cobalt ketadi 3 joy bor", "Samarqanddan Toshkentga cobalt kerak 3 joy bor"),
+    ("Buxorodan Toshkentga ertaga pochta bor srochno", "Buxorodan Toshkentga ertaga pochta olaman srochno"),
+    ("Samarqanddan Toshkentga 2 kishi boraman bugun", "Samarqanddan Toshkentga 2 kishi olaman bugun"),
+]
+
+
+def test_long_opposite_pairs_miss():
+    for cached, text in HARD_OPPOSITES:
+        for a, b in ((cached, text), (text, cached)):
+            value, score = cache_with(a).lookup(b)
+            assert value is None, (a, b, score)
+
+
+def test_threshold_on_holdout_pairs():
+    cache = SemanticCache(capacity=1)
+    with open(HOLDOUT_FILE, encoding="utf-8") as f:
+        pairs = [json.loads(line) for line in f if line.strip()]
+    wrong = [
+        (pair["a"], pair["b"], round(score, 3)) for pair in pairs
+        if ((score := cache.similarity(pair["a"], pair["b"])) >= Config.SEMANTIC_CACHE_THRESHOLD) != pair["same"]
+    ]
+    assert not wrong, wrong
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Session pool testlari: consistent hashing va akkaunt holatiga qarab taqsimlash
+"""
+
+from session_pool import HashRing, SessionPool
+
+NODES = ["acc1", "acc2", "acc3"]
+KEYS = range(-1000, -500)
+
+
+def test_ring_is_deterministic():
+    a, b = HashRing(NODES), HashRing(reversed(NODES))
+    assert all(a.owner(key) == b.owner(key) for key in KEYS)
+    assert {a.owner(key) for key in KEYS} == set(NODES)
+
+
+def test_remove_moves_only_its_keys():
+    ring = HashRing(NODES)
+    before = {key: ring.owner(key) for key in KEYS}
+    ring.remove("acc2")
+    for key, owner in before.items():
+        if owner != "acc2":
+            assert ring.owner(key) == owner
+        else:
+            assert ring.owner(key) in ("acc1", "acc3")
+
+
+def test_unavailable_owner_falls_to_next():
+    ring = HashRing(NODES)
+    for key in KEYS:
+        owner = ring.owner(key)
+        fallback = ring.owner(key, lambda name: name != owner)
+        assert fallback not in (None, owner)
+    assert ring.owner(1, lambda name: False) is None
+    assert HashRing().owner(1) is None
+
+
+def _pool():
+    pool = SessionPool(NODES)
+    for name in NODES:
+        pool.add_client(name, object())
+    return pool
+
+
+def test_member_account_preferred():
+    pool = _pool()
+    for key in KEYS:
+        member = next(name for name in NODES if name != pool.owner(key))
+        pool.add_member(member, key)
+        assert pool.owner(key) == member
+        assert pool.owns(member, key)
+
+
+def test_flood_and_ban_reassign():
+    pool = _pool()
+    key = -100
+    owner = pool.owner(key)
+    pool.mark_flood(owner, 60)
+    assert not pool.is_available(owner)
+    assert pool.owner(key) not in (None, owner)
+
+    pool = _pool()
+    pool.mark_banned(owner)
+    assert pool.owner(key) not in (None, owner)
+    assert pool.status()[owner] == "banned"
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
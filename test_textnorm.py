@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Matn normalizatsiyasi va kalit so'z qidirish testlari
+"""
+
+from textnorm import normalize, find_keyword
+
+
+def test_cyrillic_to_latin():
+    assert normalize("Тошкентдан Ўзбекистонга") == "toshkentdan o'zbekistonga"
+    assert normalize("ҚАРШИ ҒИЖДУВОН Ҳаёт") == "qarshi g'ijduvon hayot"
+    assert normalize("Щука подъезд") == "shuka pod'ezd"
+
+
+def test_apostrophes_and_spaces():
+    for text in ("Qo‘qon", "Qoʻqon", "Qo`qon", "Qo’qon", "Qo'qon"):
+        assert normalize(text) == "qo'qon", text
+    assert normalize("  Toshkent \n\t ga  ") == "toshkent ga"
+    assert normalize("") == ""
+    assert normalize(None) == ""
+
+
+def test_mixed_script_matches_latin():
+    assert normalize("Тошкент") == normalize("toshkent")
+
+
+def test_find_keyword():
+    text = normalize("Тошкентга ЙЎЛОВЧИ керак")
+    assert find_keyword(text, ["pochta", "Yo‘lovchi"]) == "yo'lovchi"
+    assert find_keyword(text, ["ПОЧТА", "kerak"]) == "kerak"
+    assert find_keyword(text, ["", "pochta"]) is None
+    assert find_keyword(text, []) is None
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
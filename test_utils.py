@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Narx va yo'lovchilar sonini ajratish testlari
+"""
+
+from utils import parse_count, parse_price
+
+PRICES = [
+    ("150000", 150000),
+    ("150 000", 150000),
+    ("150 ming", 150000),
+    ("150ming so'm", 150000),
+    ("1.2 mln", 1200000),
+    ("1,5 млн", 1500000),
+    ("80k", 80000),
+    ("50-60 ming", 60000),
+    ("50 000 - 60 000", 60000),
+    ("50 000-60 000 so'm", 60000),
+    (120000, 120000),
+    (0, None),
+    ("kelishamiz", None),
+    ("", None),
+    (None, None),
+]
+
+COUNTS = [
+    ("2ta", 2),
+    ("3 kishi", 3),
+    (4, 4),
+    ("1,0", 1),
+    ("0", None),
+    (150, None),
+    ("bor", None),
+    (None, None),
+]
+
+
+def test_parse_price():
+    for value, expected in PRICES:
+        assert parse_price(value) == expected, value
+
+
+def test_parse_count():
+    for value, expected in COUNTS:
+        assert parse_count(value) == expected, value
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"✅ {name}")
@@ -0,0 +1,49 @@
+"""
+Telegram Taxi Bot - Text Normalization
+Lotin, kirill va aralash yozuvdagi matnni bitta kanonik ko'rinishga keltirish:
+kichik harf, kirill -> o'zbek lotin, apostroflarni (o‘, oʻ, o`) bittaga birlashtirish.
+Kalit so'zlarni tekshirish, takrorlarni aniqlash va AI keshi shu ko'rinishdan foydalanadi.
+"""
+
+import re
+from functools import lru_cache
+
+# Apostrof turlari -> '
+APOSTROPHES = "‘’ʻʼ`´ʹ′"
+
+# Kirill (o'zbek va rus) -> o'zbek lotin
+CYRILLIC = {
+    "а": "a", "б": "b", "в": "v", "г": "g", "д": "d", "е": "e", "ё": "yo",
+    "ж": "j", "з": "z", "и": "i", "й": "y", "к": "k", "л": "l", "м": "m",
+    "н": "n", "о": "o", "п": "p", "р": "r", "с": "s", "т": "t", "у": "u",
+    "ф": "f", "х": "x", "ц": "ts", "ч": "ch", "ш": "sh", "щ": "sh", "ъ": "'",
+    "ы": "i", "ь": "", "э": "e", "ю": "yu", "я": "ya",
+    "ў": "o'", "қ": "q", "ғ": "g'", "ҳ": "h",
+}
+
+_TABLE = str.maketrans({
+    **{c: "'" for c in APOSTROPHES},
+    **CYRILLIC,
+    **{c.upper(): v for c, v in CYRILLIC.items()},
+})
+_SPACES_RE = re.compile(r"\s+")
+
+
+def normalize(text: str) -> str:
+    """Matnning kanonik ko'rinishi ("Тошкентдан Ўзбекистонга" -> "toshkentdan o'zbekistonga")"""
+    if not text:
+        return ""
+    return _SPACES_RE.sub(" ", text.translate(_TABLE).lower()).strip()
+
+
+# Kalit so'zlar kam va takrorlanadi - natija keshlanadi
+normalize_word = lru_cache(maxsize=4096)(normalize)
+
+
+def find_keyword(text: str, words) -> str | None:
+    """Normallashtirilgan matndagi birinchi kalit so'z (`text` - normalize() natijasi)"""
+    for word in words:
+        word = normalize_word(word)
+        if word and word in text:
+            return word
+    return None
@@ -15,7 +15,13 @@ from aiogram.enums import ParseMode
 from config import Config
 import database as db
 from ai_classifier import classifier
-from utils import setup_logging, format_order_message, truncate_text
+from ai_usage import usage_tracker
+from alerts import alerts
+from group_yield import yield_tracker, MODE_NORMAL
+from entity_cache import entity_resolver, import_dialogs
+from locations import extract_route, is_complete, apply_route
+from textnorm import normalize, find_keyword
+from utils import setup_logging, format_order_message, truncate_text, extract_order_fields
 
 # Logging
 logger = setup_logging()
@@ -31,18 +37,10 @@ class TaxiUserbot:
         self.forwarded_count = 0
         self.filtered_count = 0
         self.user_last_order = {}  # User ID -> timestamp (flood oldini olish)
-    
-    async def notify_admins(self, message: str):
-        """Adminlarga xabar yuborish"""
-        try:
-            admins = db.get_all_admins()
-            for admin in admins:
-                try:
-                    await self.bot.send_message(admin['user_id'], message)
-                except Exception as e:
-                    logger.debug(f"Admin {admin['user_id']}ga xabar yuborib bo'lmadi: {e}")
-        except Exception as e:
-            logger.error(f"Adminlarga xabar yuborishda xato: {e}")
+        self.resolve_task = None
+        self.alerts_task = None
+        self.usage_task = None
+        self.yield_task = None
     
     async def start(self):
         """Userbot'ni ishga tushirish"""
@@ -62,6 +60,11 @@ class TaxiUserbot:
         # Bot yaratish (zakazlarni yuborish uchun)
         self.bot = Bot(token=Config.BOT_TOKEN)
         logger.info("✅ Bot yaratildi (zakazlarni yuborish uchun)")
+        # Xatolar adminlarga yig'ma xabar bilan (ALERT_INTERVAL ichida ko'pi bilan bitta)
+        self.alerts_task = asyncio.create_task(alerts.run(self.bot))
+        # AI sarfi va guruh hisoblagichlari - fonda, alohida thread'da DB ga
+        self.usage_task = asyncio.create_task(usage_tracker.run())
+        self.yield_task = asyncio.create_task(yield_tracker.run())
         
         # Client yaratish (xabarlarni kuzatish uchun)
         self.client = TelegramClient(
@@ -93,7 +96,13 @@ class TaxiUserbot:
         logger.info("=" * 50 + "\n")
         
         # Ishga tushirish
-        await self.client.run_until_disconnected()
+        try:
+            await self.client.run_until_disconnected()
+        finally:
+            self.usage_task.cancel()
+            self.yield_task.cancel()
+            usage_tracker.flush()
+            yield_tracker.flush()
     
     def _setup_handlers(self):
         """Handler'larni sozlash"""
@@ -106,12 +115,7 @@ class TaxiUserbot:
         logger.info("✅ Handler'lar sozlandi")
     
     async def _check_groups(self):
-        """Guruhlarni tekshirish"""
-        
-        # Agar IMPORT_JOINED_GROUPS yoqilgan bo'lsa, barcha guruhlarni import qilish
-        if Config.IMPORT_JOINED_GROUPS:
-            logger.info("\n📥 Akauntdagi barcha guruhlar import qilinmoqda...")
-            await self._import_all_groups()
+        """Guruhlarni tekshirish - keshdan darhol, import va Telegram'dan aniqlash fonda"""
         
         source_groups = db.get_active_group_ids()
         target_groups = db.get_target_groups()
@@ -119,55 +123,40 @@ class TaxiUserbot:
         
         logger.info(f"\n📋 Kuzatiladigan guruhlar (source): {len(source_groups)}")
         
-        for group_id in source_groups:
-            try:
-                entity = await self.client.get_entity(group_id)
-                title = getattr(entity, 'title', str(group_id))
-                logger.info(f"   ✓ {title}")
-                # DB ni yangilash
-                db.add_source_group(group_id, title)
-            except Exception as e:
-                logger.warning(f"   ✗ {group_id} - {e}")
-        
         logger.info(f"\n📤 Target guruhlar (buyurtmalar): {len(target_groups)}")
         for target_group in target_groups:
-            try:
-                entity = await self.client.get_entity(target_group)
-                title = getattr(entity, 'title', str(target_group))
-                logger.info(f"   ✓ {title}")
-            except Exception as e:
-                logger.error(f"   ✗ {target_group} - {e}")
+            logger.info(f"   • {entity_resolver.title(target_group, str(target_group))}")
         
         if not target_groups:
             logger.warning("⚠️ Target guruhlar sozlanmagan! Admin paneldan sozlang.")
         
         logger.info(f"\n👁️ Qo'shimcha kuzatilayotgan guruhlar: {len(monitored_groups)}")
-        for group_id in monitored_groups:
-            try:
-                entity = await self.client.get_entity(group_id)
-                title = getattr(entity, 'title', str(group_id))
-                logger.info(f"   ✓ {title}")
-            except Exception as e:
-                logger.warning(f"   ✗ {group_id} - {e}")
+        
+        self.resolve_task = asyncio.create_task(
+            self._resolve_groups(source_groups + target_groups + monitored_groups)
+        )
+    
+    async def _resolve_groups(self, group_ids: list):
+        """Guruhlarni import qilish va nomlarini yangilash (fon vazifasi)"""
+        try:
+            # Agar IMPORT_JOINED_GROUPS yoqilgan bo'lsa, barcha guruhlarni import qilish
+            if Config.IMPORT_JOINED_GROUPS:
+                logger.info("\n📥 Akauntdagi barcha guruhlar import qilinmoqda...")
+                await self._import_all_groups()
+            
+            result = await entity_resolver.resolve(self.client, group_ids)
+            logger.info(
+                f"✅ Guruhlar tekshirildi: {result['resolved']} yangilandi, "
+                f"{result['cached']} keshdan, {result['failed']} xato"
+            )
+        except Exception as e:
+            logger.error(f"Guruhlarni tekshirishda xato: {e}")
     
     async def _import_all_groups(self):
-        """Akauntdagi barcha guruhlarni import qilish"""
+        """Akauntdagi barcha guruhlarni import qilish (oqim bilan, partiyalab)"""
         try:
-            dialogs = await self.client.get_dialogs()
-            imported_count = 0
-            
-            for dialog in dialogs:
-                # Faqat guruhlar va kanallar
-                if dialog.is_group or dialog.is_channel:
-                    group_id = dialog.id
-                    title = dialog.title
-                    
-                    # DB ga qo'shish
-                    if db.add_source_group(group_id, title):
-                        imported_count += 1
-                        logger.debug(f"   ✓ {title} ({group_id})")
-            
-            logger.info(f"✅ {imported_count} ta guruh import qilindi")
+            result = await import_dialogs(self.client)
+            logger.info(f"✅ {result['imported']} ta guruh import qilindi ({result['groups']} ta guruh)")
             
         except Exception as e:
             logger.error(f"❌ Guruhlarni import qilishda xato: {e}")
@@ -192,6 +181,15 @@ class TaxiUserbot:
             if chat_id not in all_source_groups:
                 return
             
+            # Cheklangan (o'lik) guruh - har N-xabardan faqat bittasi; o'tkazilganlari
+            # ulushga kirmaydi (aks holda guruh cheklovdan hech qachon chiqmaydi)
+            if not yield_tracker.should_process(chat_id):
+                yield_tracker.record(chat_id, skipped=1)
+                return
+            
+            # Guruh samaradorligi: tekshirilgan xabar
+            yield_tracker.record(chat_id, seen=1)
+            
             message = event.message
             
             # Faqat bizning botimizdan kelgan xabarlarni ignore qilish (loop oldini olish)
@@ -200,14 +198,14 @@ class TaxiUserbot:
             # O'z userbot'dan kelgan xabarlarni ignore qilish
             me = await self.client.get_me()
             if sender and sender.id == me.id:
-                logger.debug(f"🔄 O'z xabarimiz ignore qilindi")
+                logger.debug("🔄 O'z xabarimiz ignore qilindi")
                 return
             
             if sender and getattr(sender, 'bot', False):
                 # Bizning bot ID'si
                 our_bot_id = (await self.bot.get_me()).id
                 if sender.id == our_bot_id:
-                    logger.debug(f"🤖 O'z botimiz xabari ignore qilindi")
+                    logger.debug("🤖 O'z botimiz xabari ignore qilindi")
                     return
                 # Boshqa botlardan kelgan xabarlarni qabul qilamiz
             
@@ -215,7 +213,7 @@ class TaxiUserbot:
             
             # Stiker yoki emoji bo'lsa, o'tkazib yuborish
             if message.sticker or message.photo or message.video or message.document:
-                logger.debug(f"🚫 Stiker/rasm/video filtrlandi")
+                logger.debug("🚫 Stiker/rasm/video filtrlandi")
                 return
             
             if not text:
@@ -223,9 +221,10 @@ class TaxiUserbot:
             
             # Juda uzun xabarlarni filtrlash (60 belgidan ko'p)
             if len(text.strip()) > 60:
-                logger.debug(f"🚫 Juda uzun xabar filtrlandi ({len(text)} belgi): {truncate_text(text, 40)}")
+                logger.debug("🚫 Juda uzun xabar filtrlandi (%d belgi): %.40s", len(text), text)
                 self.filtered_count += 1
                 db.update_stats(filtered=1)
+                yield_tracker.record(chat_id, filtered=1)
                 return
             
             # Emoji va maxsus belgilarni tekshirish
@@ -245,9 +244,10 @@ class TaxiUserbot:
             
             # Agar emoji 3 tadan ko'p bo'lsa filtrlash
             if emoji_count > 3:
-                logger.debug(f"🚫 Emoji ko'p xabar filtrlandi ({emoji_count} emoji): {truncate_text(text, 40)}")
+                logger.debug("🚫 Emoji ko'p xabar filtrlandi (%d emoji): %.40s", emoji_count, text)
                 self.filtered_count += 1
                 db.update_stats(filtered=1)
+                yield_tracker.record(chat_id, filtered=1)
                 return
             
             self.processed_count += 1
@@ -259,39 +259,56 @@ class TaxiUserbot:
             chat_title = getattr(chat, 'title', 'Unknown')
             sender_name = self._get_sender_name(sender)
             
-            logger.debug(f"[{chat_title}] {sender_name}: {truncate_text(text, 50)}")
+            logger.debug("[%s] %s: %.50s", chat_title, sender_name, text)
             
             # Bloklangan foydalanuvchini tekshirish
             user_id = sender.id if sender else 0
             if db.is_blocked(user_id):
-                logger.debug(f"🚫 Bloklangan foydalanuvchi: {sender_name} ({user_id})")
+                logger.debug("🚫 Bloklangan foydalanuvchi: %s (%s)", sender_name, user_id)
                 self.filtered_count += 1
                 db.update_stats(filtered=1)
+                yield_tracker.record(chat_id, filtered=1)
                 return
             
-            # Kalit so'zlarni tekshirish
-            driver_keywords = db.get_keywords('driver')
-            passenger_keywords = db.get_keywords('passenger')
-            text_lower = text.lower()
+            # Kalit so'zlarni tekshirish (lotin/kirill farqisiz)
+            text_norm = normalize(text)
             
             # Haydovchi kalit so'zlarini tekshirish (filtrlash)
-            for kw in driver_keywords:
-                if kw['word'].lower() in text_lower:
-                    logger.debug(f"🚫 Haydovchi kalit so'zi topildi: '{kw['word']}' - {truncate_text(text, 40)}")
-                    self.filtered_count += 1
-                    db.update_stats(filtered=1)
-                    return
+            keyword = find_keyword(text_norm, db.get_keyword_words('driver'))
+            if keyword:
+                logger.debug("🚫 Haydovchi kalit so'zi topildi: '%s' - %.40s", keyword, text)
+                self.filtered_count += 1
+                db.update_stats(filtered=1)
+                yield_tracker.record(chat_id, filtered=1)
+                return
             
             # Yo'lovchi kalit so'zlarini tekshirish (majburiy qabul qilish)
-            force_accept = False
-            for kw in passenger_keywords:
-                if kw['word'].lower() in text_lower:
-                    logger.debug(f"✅ Yo'lovchi kalit so'zi topildi: '{kw['word']}' - majburiy qabul qilish")
-                    force_accept = True
-                    break
+            keyword = find_keyword(text_norm, db.get_keyword_words('passenger'))
+            force_accept = bool(keyword)
+            if force_accept:
+                logger.debug("✅ Yo'lovchi kalit so'zi topildi: '%s' - majburiy qabul qilish", keyword)
             
-            # AI klassifikatsiya
-            is_order, order_data = await classifier.is_passenger_order(text)
+            # Yo'nalish lokal gazetteer orqali (AI'dan oldin)
+            route = extract_route(text_norm)
+            
+            # Past samarali guruh yoki AI byudjeti tugagan - AI chaqirilmaydi, faqat kalit so'zlar
+            mode = yield_tracker.mode(chat_id)
+            if mode != MODE_NORMAL or usage_tracker.over_budget(chat_id):
+                if not force_accept:
+                    logger.debug("🚫 Kalit so'zsiz xabar (guruh rejimi: %s): %.40s", mode, text)
+                    self.filtered_count += 1
+                    db.update_stats(filtered=1)
+                    yield_tracker.record(chat_id, filtered=1)
+                    return
+                is_order, order_data = True, {}
+            elif force_accept and is_complete(route):
+                # Kalit so'z tasdiqlagan va yo'nalish lokal topilgan - AI kerak emas
+                logger.debug("📍 Yo'nalish lokal aniqlandi: %s → %s", route['from_location'], route['to_location'])
+                is_order, order_data = True, {}
+            else:
+                # AI klassifikatsiya
+                yield_tracker.record(chat_id, ai_calls=1)
+                is_order, order_data = await classifier.is_passenger_order(text, chat_id)
             
             # Yo'lovchi kalit so'zi bo'lsa, majburiy qabul qilish
             if force_accept:
@@ -299,14 +316,17 @@ class TaxiUserbot:
                 if not order_data:
                     order_data = {}
             
+            if is_order:
+                order_data = apply_route(order_data, route)
+            
             # Agar AI telefon topa olmasa, regex bilan qidirish
-            if is_order and order_data:
+            if is_order:
                 if not order_data.get("phone"):
                     from utils import extract_phone_from_text
                     phone = extract_phone_from_text(text)
                     if phone:
                         order_data["phone"] = phone
-                        logger.debug(f"📞 Telefon regex bilan topildi: {phone}")
+                        logger.debug("📞 Telefon regex bilan topildi: %s", phone)
             
             if is_order:
                 # Flood oldini olish - bir foydalanuvchidan 30 soniya ichida faqat 1 zakaz
@@ -319,19 +339,21 @@ class TaxiUserbot:
                     time_diff = current_time - last_order_time
                     
                     if time_diff < 30:  # 30 soniya ichida
-                        logger.debug(f"🚫 Flood: {sender_name} - {int(30 - time_diff)} soniya kutish kerak")
+                        logger.debug("🚫 Flood: %s - %d soniya kutish kerak", sender_name, 30 - time_diff)
                         self.filtered_count += 1
                         db.update_stats(filtered=1)
+                        yield_tracker.record(chat_id, filtered=1)
                         return
                 
                 # Zakazni yuborish
-                await self._forward_order(event, order_data, chat_title, sender_name)
+                await self._forward_order(event, order_data, chat_title, sender_name, classifier.PASSENGER_ORDER)
                 
                 # Vaqtni saqlash
                 self.user_last_order[user_id] = current_time
             else:
                 # Haydovchi zakazi tekshirish
-                is_driver, driver_data = await classifier.is_driver_order(text)
+                yield_tracker.record(chat_id, ai_calls=1)
+                is_driver, driver_data = await classifier.is_driver_order(text, chat_id)
                 
                 # Agar AI telefon topa olmasa, regex bilan qidirish
                 if is_driver and driver_data:
@@ -340,7 +362,7 @@ class TaxiUserbot:
                         phone = extract_phone_from_text(text)
                         if phone:
                             driver_data["phone"] = phone
-                            logger.debug(f"📞 Telefon regex bilan topildi: {phone}")
+                            logger.debug("📞 Telefon regex bilan topildi: %s", phone)
                 
                 if is_driver:
                     # Flood oldini olish
@@ -353,13 +375,14 @@ class TaxiUserbot:
                         time_diff = current_time - last_order_time
                         
                         if time_diff < 30:  # 30 soniya ichida
-                            logger.debug(f"🚫 Flood: {sender_name} - {int(30 - time_diff)} soniya kutish kerak")
+                            logger.debug("🚫 Flood: %s - %d soniya kutish kerak", sender_name, 30 - time_diff)
                             self.filtered_count += 1
                             db.update_stats(filtered=1)
+                            yield_tracker.record(chat_id, filtered=1)
                             return
                     
                     # Haydovchi zakazi ham yuborish
-                    await self._forward_order(event, driver_data, chat_title, sender_name)
+                    await self._forward_order(event, driver_data, chat_title, sender_name, classifier.DRIVER_ORDER)
                     
                     # Vaqtni saqlash
                     self.user_last_order[user_id] = current_time
@@ -367,20 +390,21 @@ class TaxiUserbot:
                     # Boshqa xabar - filtrlash
                     self.filtered_count += 1
                     db.update_stats(filtered=1)
-                    logger.debug(f"🚫 Boshqa xabar filtrlandi: {truncate_text(text, 40)}")
+                    yield_tracker.record(chat_id, filtered=1)
+                    logger.debug("🚫 Boshqa xabar filtrlandi: %.40s", text)
             
             db.update_stats(processed=1)
             
         except Exception as e:
             logger.error(f"Xato: {e}", exc_info=True)
-            # Adminlarga xabar yuborish
-            error_msg = f"❌ **Xatolik yuz berdi!**\n\n"
-            error_msg += f"**Xato:** {str(e)}\n"
-            error_msg += f"**Guruh:** {chat_title if 'chat_title' in locals() else 'Noma\'lum'}\n"
-            error_msg += f"**Xabar:** {truncate_text(text, 100) if 'text' in locals() else 'Noma\'lum'}"
-            await self.notify_admins(error_msg)
+            # Adminlarga - yig'ma xabar (digest) orqali
+            context = locals().get("chat_title")
+            if "text" in locals():
+                context = f"{context or ''} | {truncate_text(text, 100)}"
+            alerts.report(e, "process_message", context)
     
-    async def _forward_order(self, event, order_data: dict, chat_title: str, sender_name: str):
+    async def _forward_order(self, event, order_data: dict, chat_title: str, sender_name: str,
+                             order_type: str = None):
         """Buyurtmani barcha target guruhlarga yuborish (Akkaunt orqali)"""
         
         target_groups = db.get_target_groups()
@@ -435,7 +459,7 @@ class TaxiUserbot:
                         parse_mode='md'
                     )
                     success_count += 1
-                    logger.debug(f"   ✓ Guruh {target_group}ga yuborildi")
+                    logger.debug("   ✓ Guruh %sga yuborildi", target_group)
                     
                     if success_count < len(target_groups):
                         await asyncio.sleep(0.5)
@@ -445,7 +469,8 @@ class TaxiUserbot:
             
             self.forwarded_count += 1
             db.update_stats(forwarded=1)
-            logger.info(f"✅ Akkaunt orqali yuborildi: {truncate_text(original_text, 40)}")
+            yield_tracker.record(event.chat_id, forwarded=1)
+            logger.info("✅ Akkaunt orqali yuborildi: %.40s", original_text)
             
             # Zakazni database'ga saqlash
             db.add_order(
@@ -454,7 +479,8 @@ class TaxiUserbot:
                 phone=phone_clean,
                 message_text=original_text,
                 chat_id=event.chat_id,
-                chat_title=chat_title
+                chat_title=chat_title,
+                fields=extract_order_fields(order_data, order_type)
             )
             
         except Exception as e:
@@ -3,35 +3,105 @@ Telegram Taxi Userbot - Utility Functions
 Yordamchi funksiyalar va logging
 """
 
+import atexit
+import gzip
 import logging
+import os
+import queue
+import re
+import shutil
 import sys
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
 
+from config import Config
+
+LOG_FORMAT = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# Fon thread'da yozadigan handler'lar va ularning listener'lari
+_log_handlers = []
+_log_listeners = []
+
+
+def _gzip_namer(name: str) -> str:
+    return name + ".gz"
+
+
+def _gzip_rotator(source: str, dest: str):
+    """Aylantirilgan log faylini siqish (listener thread'ida bajariladi)"""
+    with open(source, "rb") as src, gzip.open(dest, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    os.remove(source)
+
+
+def rotating_file_handler(filename: str):
+    """Aylanadigan fayl: LOG_ROTATE_WHEN berilsa - vaqt, aks holda hajm bo'yicha"""
+    if Config.LOG_ROTATE_WHEN:
+        handler = TimedRotatingFileHandler(
+            filename, when=Config.LOG_ROTATE_WHEN,
+            backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+    else:
+        handler = RotatingFileHandler(
+            filename, maxBytes=Config.LOG_MAX_BYTES,
+            backupCount=Config.LOG_BACKUP_COUNT, encoding="utf-8",
+        )
+    if Config.LOG_COMPRESS:
+        handler.namer = _gzip_namer
+        handler.rotator = _gzip_rotator
+    return handler
+
+
+def setup_logging(level=None, log_queue=None):
+    """Logging sozlash
+
+    Root logger faqat navbatga yozadi (QueueHandler); konsol va faylga fon
+    thread (QueueListener) yozadi - event loop fayl I/O kutmaydi.
+    Takroriy chaqiruvlar (main.py + userbot.py importi) hech narsa o'zgartirmaydi.
+
+    Args:
+        level: log darajasi (standart - Config.LOG_LEVEL)
+        log_queue: worker process'da - asosiy process'ning log navbati
+    """
+    root = logging.getLogger()
+    if log_queue is not None:
+        # Spawn qilingan worker main.py'ni qayta import qiladi - o'z fayl handler'i bo'lmasin
+        stop_logging()
+        root.handlers[:] = [QueueHandler(log_queue)]
+    elif not any(isinstance(h, QueueHandler) for h in root.handlers):
+        formatter = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+        _log_handlers[:] = [logging.StreamHandler(sys.stdout), rotating_file_handler(Config.LOG_FILE)]
+        for handler in _log_handlers:
+            handler.setFormatter(formatter)
+        log_queue = queue.SimpleQueue()
+        _log_listeners.append(listen_log_queue(log_queue))
+        atexit.register(stop_logging)
+        root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(level or Config.LOG_LEVEL)
 
-def setup_logging(level=logging.INFO):
-    """Logging sozlash"""
-    
-    # Log format
-    log_format = "%(asctime)s | %(levelname)-8s | %(name)s | %(message)s"
-    date_format = "%Y-%m-%d %H:%M:%S"
-    
-    # Root logger sozlash
-    logging.basicConfig(
-        level=level,
-        format=log_format,
-        datefmt=date_format,
-        handlers=[
-            logging.StreamHandler(sys.stdout),
-            logging.FileHandler("taxi_bot.log", encoding="utf-8")
-        ]
-    )
-    
     # Telethon loglarini kamaytirish
     logging.getLogger("telethon").setLevel(logging.WARNING)
     
     return logging.getLogger("taxi_bot")
 
 
+def listen_log_queue(log_queue) -> QueueListener:
+    """Navbatdagi yozuvlarni (masalan, worker process'lardan) fon thread'da yozish"""
+    listener = QueueListener(log_queue, *_log_handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def stop_logging():
+    """Navbatdagi yozuvlarni yozib, listener'larni to'xtatish"""
+    while _log_listeners:
+        _log_listeners.pop().stop()
+    for handler in _log_handlers:
+        handler.close()
+    _log_handlers.clear()
+
+
 def format_order_message(order_data: dict, original_message: str = None, 
                          type_emoji: str = "🚕", type_text: str = "BUYURTMA",
                          message_link: str = None, sender_name: str = None, sender_id: int = None) -> str:
@@ -148,3 +218,72 @@ def truncate_text(text: str, max_length: int = 100) -> str:
         return text
     
     return text[:max_length - 3] + "..."
+
+
+# Narx ko'paytuvchilari ("150 ming", "1.2 mln", "150k")
+PRICE_MULTIPLIERS = {
+    "ming": 1000, "минг": 1000, "тыс": 1000, "k": 1000, "к": 1000,
+    "mln": 1000000, "млн": 1000000, "million": 1000000, "миллион": 1000000,
+}
+_NUMBER_RE = re.compile(r'\d+(?:[.,]\d+)?')
+# Narx yoki oraliq ("50-60 ming" - ko'paytuvchi ikkala chegaraga tegishli)
+_PRICE_RE = re.compile(r'(\d[\d\s.,]*)(?:[-–—]\s*(\d[\d\s.,]*))?\s*([a-zа-яё]+)?', re.IGNORECASE)
+
+
+def parse_count(value) -> int | None:
+    """Yo'lovchilar sonini ajratish: "2ta", "3 kishi", 4 -> int"""
+    if value is None:
+        return None
+    if isinstance(value, int):
+        return value if 0 < value < 100 else None
+    match = _NUMBER_RE.search(str(value))
+    if not match:
+        return None
+    count = int(float(match.group().replace(",", ".")))
+    return count if 0 < count < 100 else None
+
+
+def parse_price(value) -> int | None:
+    """Narxni so'mda ajratish: "150 ming", "150000", "1.2 mln" -> int
+
+    Oraliqdan ("50-60 ming", "50 000 - 60 000") yuqori chegara olinadi.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value) if value > 0 else None
+    match = _PRICE_RE.search(str(value).lower())
+    if not match:
+        return None
+    digits = (match.group(2) or match.group(1)).strip().replace(" ", "")
+    unit = PRICE_MULTIPLIERS.get((match.group(3) or "").lower())
+    try:
+        if unit:
+            amount = float(digits.replace(",", "."))
+            return int(amount * unit)
+        return int(re.sub(r'[.,]', '', digits)) or None
+    except ValueError:
+        return None
+
+
+def normalize_location(value) -> str | None:
+    """Manzil nomini guruhlash uchun bir xil ko'rinishga keltirish"""
+    if not value or not isinstance(value, str):
+        return None
+    value = clean_text(value).strip(" .,-")
+    if not value:
+        return None
+    return value[:1].upper() + value[1:]
+
+
+def extract_order_fields(order_data: dict = None, order_type: str = None) -> dict:
+    """AI ma'lumotlaridan zakazning tuzilgan ustunlari (orders jadvali uchun)"""
+    order_data = order_data or {}
+    return {
+        "order_type": order_type,
+        "from_location": normalize_location(order_data.get("from_location")),
+        "to_location": normalize_location(order_data.get("to_location")),
+        "travel_time": clean_text(str(order_data["time"]))[:50] if order_data.get("time") else None,
+        "passengers": parse_count(order_data.get("passengers")),
+        "price": parse_price(order_data.get("price")),
+    }
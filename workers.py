@@ -0,0 +1,159 @@
+"""
+Telegram Taxi Bot - Worker Processes
+Xabarlarni filtrlash va klassifikatsiyani alohida process'larda bajarish.
+Telethon faqat asosiy process'da ishlaydi: u normalizatsiya qilingan xabarlarni
+navbatga qo'yadi, worker'lar `pipeline.decide` natijasini qaytaradi.
+"""
+
+import asyncio
+import importlib
+import logging
+import multiprocessing as mp
+import signal
+
+from utils import setup_logging, listen_log_queue
+
+logger = logging.getLogger("taxi_bot.workers")
+
+DEFAULT_CLASSIFIER = "ai_classifier:classifier"
+
+
+def load_object(spec: str):
+    """"module:attribute" ko'rinishidagi obyektni yuklash"""
+    module_name, _, attr = spec.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _worker_main(in_queue, out_queue, log_queue, classifier_spec: str, concurrency: int):
+    """Worker process kirish nuqtasi"""
+    # Ctrl+C butun guruhga boradi - to'xtatishni asosiy process boshqaradi (navbat oxirida None)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # Loglar asosiy process'ga yuboriladi - faylga faqat u yozadi
+    setup_logging(log_queue=log_queue)
+    try:
+        asyncio.run(_worker_loop(in_queue, out_queue, classifier_spec, concurrency))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _worker_loop(in_queue, out_queue, classifier_spec: str, concurrency: int):
+    """Navbatdan xabarlarni olib, parallel (AI kutish vaqtida) qayta ishlash"""
+    import pipeline
+    from ai_usage import usage_tracker
+    from group_yield import yield_tracker
+
+    classifier = load_object(classifier_spec)
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = set()
+    usage_task = asyncio.create_task(usage_tracker.run())
+    yield_task = asyncio.create_task(yield_tracker.run())
+
+    async def handle(msg):
+        try:
+            result = await pipeline.decide(msg, classifier)
+        except Exception as e:
+            logger.error("Worker xatosi: %s", e, exc_info=True)
+            result = {"action": pipeline.DROP, "reason": "error", "error": str(e)}
+        finally:
+            semaphore.release()
+        out_queue.put((msg, result))
+
+    while True:
+        await semaphore.acquire()
+        msg = await loop.run_in_executor(None, in_queue.get)
+        if msg is None:
+            semaphore.release()
+            break
+        task = asyncio.create_task(handle(msg))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    usage_task.cancel()
+    yield_task.cancel()
+    yield_tracker.flush()
+    usage_tracker.flush()
+
+
+class WorkerPool:
+    """Worker process'lar puli"""
+
+    def __init__(self, processes: int, on_result, classifier_spec: str = DEFAULT_CLASSIFIER,
+                 concurrency: int = 16):
+        """
+        Args:
+            processes: worker process'lar soni
+            on_result: `async def on_result(msg, result)` - asosiy process'da chaqiriladi
+            classifier_spec: worker'larda ishlatiladigan klassifikator ("module:attribute")
+            concurrency: har bir worker'da bir vaqtda qayta ishlanadigan xabarlar
+        """
+        self.processes = processes
+        self.on_result = on_result
+        self.classifier_spec = classifier_spec
+        self.concurrency = concurrency
+        self._ctx = mp.get_context("spawn")
+        self._in_queue = self._ctx.Queue()
+        self._out_queue = self._ctx.Queue()
+        self._log_queue = self._ctx.Queue()
+        self._log_listener = None
+        self._procs = []
+        self._collector = None
+        self.pending = 0
+
+    def start(self):
+        """Worker'larni ishga tushirish"""
+        self._log_listener = listen_log_queue(self._log_queue)
+        for i in range(self.processes):
+            proc = self._ctx.Process(
+                target=_worker_main,
+                args=(self._in_queue, self._out_queue, self._log_queue, self.classifier_spec, self.concurrency),
+                name=f"taxi-worker-{i}",
+                daemon=True,
+            )
+            proc.start()
+            self._procs.append(proc)
+
+        self._collector = asyncio.create_task(self._collect())
+        logger.info(f"⚙️ {self.processes} ta worker process ishga tushirildi")
+
+    def submit(self, msg: dict):
+        """Xabarni worker'larga yuborish"""
+        self.pending += 1
+        self._in_queue.put(msg)
+
+    async def _collect(self):
+        """Worker natijalarini olib, asosiy process'da qayta ishlash"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await loop.run_in_executor(None, self._out_queue.get)
+            if item is None:
+                break
+            self.pending -= 1
+            msg, result = item
+            try:
+                await self.on_result(msg, result)
+            except Exception as e:
+                logger.error(f"Worker natijasini qayta ishlashda xato: {e}", exc_info=True)
+
+    async def stop(self, timeout: float = 10):
+        """Navbatdagi xabarlarni tugatib, worker'larni to'xtatish"""
+        for _ in self._procs:
+            self._in_queue.put(None)
+
+        loop = asyncio.get_running_loop()
+        for proc in self._procs:
+            await loop.run_in_executor(None, proc.join, timeout)
+            if proc.is_alive():
+                proc.terminate()
+        self._procs = []
+
+        if self._collector:
+            self._out_queue.put(None)
+            await self._collector
+            self._collector = None
+
+        if self._log_listener:
+            self._log_listener.stop()
+            self._log_listener = None